@@ -0,0 +1,207 @@
+import argparse
+import copy
+import json
+import os
+
+import numpy as np
+import plotly.graph_objs as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+
+from array_cache import BoundedCache
+from decimation import decimate
+from encoding import display_values
+from figures import MIN_CURVE_POINTS, shear_box_template, shear_box_frame, style_height_change, style_stress_strain
+from shear_model import (
+    MARKER_EVENTS, MODELS, curve_events, discover_models, events_between, get_curve_table, model_version,
+    shear_displacement, shear_strain,
+)
+
+# Colors used for successive normal stresses when none are given
+DEFAULT_COLORS = ('blue', 'green', 'red', 'orange', 'purple', 'brown')
+# Every frame repeats the curves drawn so far, so the page grows with curves x points x steps: beyond this many
+# curves the normal stresses are thinned evenly, and beyond the point budget the curves are LTTB-decimated
+MAX_EXPORT_CURVES = int(os.environ.get('DIRECT_SHEAR_EXPORT_CURVES', 60))
+EXPORT_POINT_BUDGET = int(os.environ.get('DIRECT_SHEAR_EXPORT_POINTS', 4000))
+# Bytes of exported figures (JSON, without plotly.js) kept in memory per process
+EXPORT_CACHE_BYTES = int(os.environ.get('DIRECT_SHEAR_EXPORT_CACHE_BYTES', 32 * 2 ** 20))
+
+
+def _empty_marker():
+    # "P"/"CS" marker trace that the frames fill in once the point is reached
+    return go.Scatter(x=[], y=[], mode='markers+text', marker=dict(color='black', size=10), text=[],
+                      textposition='top center', showlegend=False, hoverinfo='none')
+
+
+def export_levels(n_soil_types, n_stresses, max_curves=MAX_EXPORT_CURVES):
+    """Indices of the normal stresses kept in an export, evenly spread so at most ``max_curves`` curves remain."""
+    count = max(max_curves // max(n_soil_types, 1), 1)
+    if n_stresses <= count:
+        return np.arange(n_stresses)
+    return np.unique(np.round(np.linspace(0, n_stresses - 1, count)).astype(int))
+
+
+def export_indices(curves, budget=EXPORT_POINT_BUDGET):
+    """Strain indices drawn for each curve of a ``CurveBatch``, LTTB-decimated to share ``budget`` points."""
+    n_curves, n_points = curves.peak_index.size, len(shear_strain)
+    if n_curves * n_points <= budget:
+        return [np.arange(n_points)] * n_curves
+    shape = (n_curves, n_points)
+    return decimate(shear_strain, [curves.shear_stress.reshape(shape), curves.height_change.reshape(shape)],
+                    max(budget // n_curves, MIN_CURVE_POINTS), keep=curves.peak_index.reshape(-1))
+
+
+def animation_figure(soil_types, normal_stresses, names=None, colors=None):
+    """Whole shear test as one Plotly figure dict with ``frames`` and a play slider.
+
+    The figure holds the shear box, stress-strain and height-change panels and
+    animates in the browser without a server. ``names`` and ``colors`` label
+    the normal stresses; they default to the stress value and a color cycle.
+    Curves and events come from the precomputed curve table, like the app.
+    At most ``MAX_EXPORT_CURVES`` curves are drawn, decimated to
+    ``EXPORT_POINT_BUDGET`` points in total.
+    """
+    normal_stresses = list(normal_stresses)
+    names = names or [f'σ<sub>n</sub> = {normal_stress:g} kPa' for normal_stress in normal_stresses]
+    colors = colors or [DEFAULT_COLORS[j % len(DEFAULT_COLORS)] for j in range(len(normal_stresses))]
+    kept = export_levels(len(soil_types), len(normal_stresses))
+    normal_stresses, names, colors = ([values[j] for j in kept] for values in (normal_stresses, names, colors))
+    curves = get_curve_table(shear_strain).select(soil_types, normal_stresses)
+    events = curve_events(curves, shear_strain)
+    indices = export_indices(curves)
+    max_steps = len(shear_strain)
+    box_template = shear_box_template()
+
+    fig = make_subplots(rows=1, cols=3, column_widths=[0.34, 0.33, 0.33], horizontal_spacing=0.05)
+
+    # Shear box in the first panel, frames only move its lower half
+    for trace in box_template['figure']['data']:
+        fig.add_trace(go.Scatter(trace), row=1, col=1)
+    box_traces = sorted(box_template['moving']['traces'])
+    box_layout = box_template['figure']['layout']
+    for shape in box_layout['shapes']:
+        fig.add_shape(shape, xref='x', yref='y')
+    for annotation in box_layout['annotations']:
+        fig.add_annotation(annotation, xref='x', yref='y', axref='x', ayref='y')
+    fig.update_xaxes(box_layout['xaxis'], row=1, col=1)
+    fig.update_yaxes(box_layout['yaxis'], row=1, col=1)
+
+    # Per curve: stress-strain line, height-change line, then their markers (P, then CS)
+    curve_traces = []
+    for i, soil_type in enumerate(soil_types):
+        for j, (name, color) in enumerate(zip(names, colors)):
+            line = dict(width=3, dash=MODELS[soil_type].dash, color=color)
+            first = len(fig.data)
+            fig.add_trace(go.Scatter(x=[], y=[], mode='lines', line=line, name=f'{name} ({soil_type})',
+                                     hoverinfo='none'), row=1, col=2)
+            fig.add_trace(go.Scatter(x=[], y=[], mode='lines', line=line, name=f'{name} ({soil_type})',
+                                     hoverinfo='none', showlegend=False), row=1, col=3)
+            for _ in MARKER_EVENTS:
+                fig.add_trace(_empty_marker(), row=1, col=2)
+                fig.add_trace(_empty_marker(), row=1, col=3)
+            curve_traces.append((i, j, first))
+
+    stress_strain_fig = go.Figure()
+    style_stress_strain(stress_strain_fig)
+    height_change_fig = go.Figure()
+    style_height_change(height_change_fig)
+    for fig_layout, col in ((stress_strain_fig.layout, 2), (height_change_fig.layout, 3)):
+        fig.update_xaxes(fig_layout.xaxis, row=1, col=col)
+        fig.update_yaxes(fig_layout.yaxis, row=1, col=col)
+
+    # Frames stay plain dicts: validating thousands of frame traces as graph objects would dominate the export
+    layout = fig.layout.to_plotly_json()
+    frames = []
+    for step in range(max_steps):
+        data, traces = [], []
+        reached = events_between(events, -1, step)
+        for k, (i, j, first) in enumerate(curve_traces):
+            drawn = indices[k][indices[k] < step]
+            data += [
+                dict(x=display_values(shear_strain[drawn]), y=display_values(curves.shear_stress[i, j, drawn])),
+                dict(x=display_values(shear_strain[drawn]), y=display_values(curves.height_change[i, j, drawn])),
+            ]
+            # One stress-strain and one height-change marker trace per event, filled once it is reached
+            for name in MARKER_EVENTS:
+                event = events[name]
+                shown = reached[name][i, j]
+                data += [
+                    dict(x=[event.strain[i, j]] if shown else [], y=[event.shear_stress[i, j]] if shown else [],
+                         text=[event.label] if shown else []),
+                    dict(x=[event.strain[i, j]] if shown else [], y=[event.height_change[i, j]] if shown else [],
+                         text=[event.label] if shown else []),
+                ]
+            traces += list(range(first, first + 2 + 2 * len(MARKER_EVENTS)))
+
+        box_frame = shear_box_frame(shear_displacement[step] * 0.1)
+        data += [dict(x=box_frame['traces'][index]) for index in box_traces]
+        traces += box_traces
+        shapes = copy.deepcopy(layout['shapes'])
+        for index, (x0, x1) in box_frame['shapes'].items():
+            shapes[index].update(x0=x0, x1=x1)
+        annotations = copy.deepcopy(layout['annotations'])
+        for index, (x, ax) in box_frame['annotations'].items():
+            annotations[index].update(x=x, ax=ax)
+        frames.append(dict(name=str(step), data=data, traces=traces,
+                           layout=dict(shapes=shapes, annotations=annotations)))
+
+    frame_args = dict(mode='immediate', frame=dict(duration=100, redraw=True), transition=dict(duration=0))
+    fig.update_layout(
+        title='Direct Shear Test',
+        plot_bgcolor='white',
+        font=dict(family="Times New Roman, Arial, sans-serif", size=12, color="black", weight="bold"),
+        margin=dict(l=40, r=40, t=60, b=40),
+        updatemenus=[dict(
+            type='buttons', direction='left', x=0, y=-0.08, xanchor='left', yanchor='top', showactive=False,
+            buttons=[
+                dict(label='Play', method='animate', args=[None, dict(frame_args, fromcurrent=True)]),
+                dict(label='Pause', method='animate',
+                     args=[[None], dict(mode='immediate', frame=dict(duration=0, redraw=False))]),
+            ],
+        )],
+        sliders=[dict(
+            x=0.12, y=-0.05, len=0.88, currentvalue=dict(prefix='Step: '),
+            steps=[dict(label=str(step), method='animate',
+                        args=[[str(step)], dict(frame_args, frame=dict(duration=0, redraw=True))])
+                   for step in range(max_steps)],
+        )],
+    )
+    return dict(fig.to_dict(), frames=frames)
+
+
+# Figure JSON per parameter set and model version; pages add plotly.js, which would dominate cached pages
+_figures = BoundedCache(EXPORT_CACHE_BYTES)
+
+
+def animation_json(soil_types, normal_stresses, names=None, colors=None):
+    """``animation_figure`` as JSON, cached per parameter set and model version."""
+    key = (tuple(soil_types), tuple(float(stress) for stress in normal_stresses), tuple(names or ()),
+           tuple(colors or ()), model_version(soil_types))
+    figure = _figures.get(key)
+    if figure is None:
+        figure = pio.to_json(animation_figure(soil_types, normal_stresses, names, colors), validate=False)
+        _figures.put(key, figure)
+    return figure
+
+
+def animation_html(soil_types, normal_stresses, names=None, colors=None):
+    """Self-contained HTML page of ``animation_figure``, with plotly.js inlined for offline use."""
+    figure = json.loads(animation_json(soil_types, normal_stresses, names, colors))
+    return pio.to_html(figure, include_plotlyjs=True, full_html=True, auto_play=False, validate=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the direct shear animation as a standalone HTML file.')
+    discover_models()
+    parser.add_argument('--soil', nargs='+', default=['dense'], choices=list(MODELS), help='soil types')
+    parser.add_argument('--stress', nargs='+', type=float, default=[50, 100, 200], help='normal stresses in kPa')
+    parser.add_argument('-o', '--output', default='direct_shear_animation.html', help='output HTML file')
+    args = parser.parse_args(argv)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(animation_html(args.soil, args.stress))
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import hashlib
+import io
+import json
+import os
+import sys
+
+import numpy as np
+from flask import Response, request
+
+from array_cache import BoundedCache, cache_key, source_version
+from encoding import encode_array
+from metrics import instrument
+from shear_model import (
+    CURVE_TABLE_FORMAT, MODELS, TABLE_STRESSES, curve_events, get_curve_table, model_version, shear_strain,
+)
+
+# Bytes of response bodies kept in memory per process, by query, format, model version and RESPONSE_KEY
+API_CACHE_BYTES = int(os.environ.get('DIRECT_SHEAR_API_CACHE_BYTES', 64 * 2 ** 20))
+# Seconds browsers and proxies may reuse a response before revalidating it with its ETag
+API_MAX_AGE = int(os.environ.get('DIRECT_SHEAR_API_MAX_AGE', 3600))
+# Largest number of (soil type, normal stress) queries per request
+MAX_QUERIES = 10000
+# Largest number of distinct queries per request that are not rows of the curve tables (fractional or beyond
+# 300 kPa) and so are computed on request, and the largest normal stress accepted (kPa)
+MAX_COMPUTED_QUERIES = 200
+MAX_NORMAL_STRESS = 1000
+# Response formats: plain JSON, JSON with base64 float32 arrays, or a NumPy .npz archive
+FORMATS = {'json': 'application/json', 'typed': 'application/json', 'npz': 'application/octet-stream'}
+EVENT_FIELDS = ('step', 'strain', 'shear_stress', 'height_change')
+# Everything besides the queries, format and model version that shapes a response: the app's strain grid
+# (DIRECT_SHEAR_RESOLUTION), the code computing tables and events, and the encoding in this module
+RESPONSE_KEY = cache_key(np.asarray(shear_strain), CURVE_TABLE_FORMAT, source_version(sys.modules[__name__]))
+TABLE_STRESSES_SET = frozenset(TABLE_STRESSES.tolist())
+
+
+def _split(values):
+    # Repeated and comma-separated query string values
+    return [item.strip() for value in values for item in value.split(',') if item.strip()]
+
+
+def parse_queries(args, body=None):
+    """``(soil_type, normal_stress)`` pairs of a request, raising ``ValueError`` for invalid ones.
+
+    ``body`` may list the pairs (``{"queries": [["dense", 50], ...]}``) or
+    give ``soil_types`` and ``normal_stresses``, which like the ``soil`` and
+    ``stress`` query parameters select every soil type at every stress.
+    """
+    body = body or {}
+    if not isinstance(body, dict):
+        raise ValueError('Request body must be a JSON object')
+    if 'queries' in body:
+        if not isinstance(body['queries'], list):
+            raise ValueError('"queries" must be a list of [soil_type, normal_stress] pairs')
+        pairs = [tuple(query) if isinstance(query, (list, tuple)) else (query,) for query in body['queries']]
+    else:
+        soil_types = body.get('soil_types') or _split(args.getlist('soil'))
+        stresses = body.get('normal_stresses') or _split(args.getlist('stress'))
+        if not isinstance(soil_types, list) or not isinstance(stresses, list):
+            raise ValueError('"soil_types" and "normal_stresses" must be lists')
+        pairs = [(soil_type, stress) for soil_type in soil_types for stress in stresses]
+    if not pairs:
+        raise ValueError('No queries: give soil types and normal stresses')
+    if len(pairs) > MAX_QUERIES:
+        raise ValueError(f'At most {MAX_QUERIES} queries per request')
+
+    queries = []
+    for pair in pairs:
+        if len(pair) != 2:
+            raise ValueError(f'Query {list(pair)} is not [soil_type, normal_stress]')
+        soil_type, stress = pair
+        if not isinstance(soil_type, str) or soil_type not in MODELS:
+            raise ValueError(f'Unknown soil type {soil_type!r}, expected one of {list(MODELS)}')
+        try:
+            stress = float(stress)
+        except (TypeError, ValueError):
+            raise ValueError(f'Normal stress {stress!r} is not a number') from None
+        if not np.isfinite(stress) or not 0 <= stress <= MAX_NORMAL_STRESS:
+            raise ValueError(f'Normal stress {stress:g} must be between 0 and {MAX_NORMAL_STRESS} kPa')
+        queries.append((soil_type, stress))
+
+    computed = {query for query in queries if query[1] not in TABLE_STRESSES_SET}
+    if len(computed) > MAX_COMPUTED_QUERIES:
+        raise ValueError(f'At most {MAX_COMPUTED_QUERIES} distinct queries per request off the precomputed '
+                         f'whole-kPa stresses from 0 to {TABLE_STRESSES[-1]:g} kPa, got {len(computed)}')
+    return tuple(queries)
+
+
+def curve_payload(queries):
+    """Curves and event indices of ``queries``, one row per query.
+
+    Shear stress is in units of 100 kPa like the model tables; events hold
+    the step that shows them and their strain, shear stress and height change.
+    """
+    soil_types = np.array([soil_type for soil_type, _ in queries])
+    stresses = np.array([stress for _, stress in queries])
+    table = get_curve_table(shear_strain)
+    shear_stress = np.empty((len(queries), len(shear_strain)))
+    height_change = np.empty_like(shear_stress)
+    events = {}
+
+    # One table lookup per soil type, scattered back into query order
+    for soil_type in dict.fromkeys(soil_types.tolist()):
+        rows = np.flatnonzero(soil_types == soil_type)
+        curves = table.select([soil_type], stresses[rows])
+        shear_stress[rows], height_change[rows] = curves.shear_stress[0], curves.height_change[0]
+        for name, event in curve_events(curves, shear_strain).items():
+            fields = events.setdefault(name, {'label': event.label, **{
+                field: np.empty(len(queries), dtype=int if field == 'step' else float) for field in EVENT_FIELDS
+            }})
+            for field in EVENT_FIELDS:
+                fields[field][rows] = getattr(event, field)[0]
+    return {
+        'soil_type': soil_types, 'normal_stress': stresses, 'strain': np.asarray(shear_strain),
+        'shear_stress': shear_stress, 'height_change': height_change, 'events': events,
+    }
+
+
+def _json_values(array):
+    # NaN is not JSON; send null instead
+    array = np.asarray(array)
+    if array.dtype.kind == 'f':
+        return np.where(np.isnan(array), None, array.astype(object)).tolist()
+    return array.tolist()
+
+
+def _typed_values(array):
+    array = np.asarray(array)
+    if array.dtype.kind not in 'fiu':
+        return array.tolist()
+    spec = encode_array(array.reshape(-1), 'f4' if array.dtype.kind == 'f' else 'i4')
+    return {**spec, 'shape': ','.join(map(str, array.shape))}
+
+
+def encode_payload(payload, fmt, version):
+    """Response body of ``curve_payload`` in ``fmt`` (one of ``FORMATS``)."""
+    if fmt == 'npz':
+        arrays = {key: value for key, value in payload.items() if key != 'events'}
+        for name, fields in payload['events'].items():
+            arrays.update({f'{name}_{field}': fields[field] for field in EVENT_FIELDS})
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, version=version, **arrays)
+        return buffer.getvalue()
+
+    values = _typed_values if fmt == 'typed' else _json_values
+    body = {key: values(value) for key, value in payload.items() if key != 'events'}
+    body['events'] = {
+        name: {'label': fields['label'], **{field: values(fields[field]) for field in EVENT_FIELDS}}
+        for name, fields in payload['events'].items()
+    }
+    body['version'] = version
+    return json.dumps(body, separators=(',', ':')).encode()
+
+
+def etag(queries, fmt, version, key=RESPONSE_KEY):
+    """Strong ETag of a response: the body is fully determined by the queries, format, model version and ``key``."""
+    return hashlib.sha1(repr((queries, fmt, version, key)).encode()).hexdigest()
+
+
+# Encoded response bodies, least recently used dropped first
+_responses = BoundedCache(API_CACHE_BYTES)
+
+
+def _response_body(queries, fmt, version):
+    key = (queries, fmt, version, RESPONSE_KEY)
+    body = _responses.get(key)
+    if body is None:
+        body = encode_payload(curve_payload(queries), fmt, version)
+        _responses.put(key, body)
+    return body
+
+
+def _error(message, status=400):
+    return Response(json.dumps({'error': message}), status=status, mimetype='application/json')
+
+
+@instrument
+def curves_endpoint():
+    """``GET/POST /api/curves``: model curves and events for a batch of (soil type, normal stress) queries."""
+    fmt = request.args.get('format', 'json')
+    if fmt not in FORMATS:
+        return _error(f'Unknown format {fmt!r}, expected one of {list(FORMATS)}')
+    try:
+        body = request.get_json(silent=True) if request.method == 'POST' else None
+        queries = parse_queries(request.args, body)
+    except ValueError as error:
+        return _error(str(error))
+
+    version = model_version(list(dict.fromkeys(soil_type for soil_type, _ in queries)))
+    tag = etag(queries, fmt, version)
+    headers = {'Cache-Control': f'public, max-age={API_MAX_AGE}'}
+    # A matching ETag answers without touching the curves
+    if request.if_none_match.contains(tag):
+        response = Response(status=304, headers=headers)
+    else:
+        response = Response(_response_body(queries, fmt, version), mimetype=FORMATS[fmt], headers=headers)
+    response.set_etag(tag)
+    return response
+
+
+def register_api(server, prefix='/api'):
+    """Add the curve endpoint to the Flask ``server`` under ``prefix``."""
+    server.add_url_rule(f'{prefix}/curves', 'curves', curves_endpoint, methods=['GET', 'POST'])
+    return server
@@ -0,0 +1,122 @@
+import glob
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Parsed datasets and curve tables are kept here as memory-mappable .npy files
+CACHE_DIR = os.environ.get('DIRECT_SHEAR_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+# Curve tables are shared through CACHE_DIR unless DIRECT_SHEAR_SHARED_CACHE=0
+SHARED_CACHE = os.environ.get('DIRECT_SHEAR_SHARED_CACHE', '1') != '0'
+KEY_LENGTH = 16
+
+
+def cache_key(*parts):
+    """Hex digest of ``parts`` (strings, numbers, tuples or arrays), e.g. naming one version of cached arrays."""
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part).tobytes()
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+    return digest.hexdigest()[:KEY_LENGTH]
+
+
+def source_version(*modules):
+    """Digest of the source files of ``modules``, for keys of arrays computed by their code."""
+    sources = []
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            sources.append(f.read())
+    return cache_key(*sources)
+
+
+class BoundedCache:
+    """Least recently used bytes or strings up to ``max_bytes`` of length in total; larger values are not kept."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.values = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.values.get(key)
+            if value is not None:
+                self.values.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.values:
+                return
+            self.values[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self.size -= len(self.values.popitem(last=False)[1])
+
+
+def _write_arrays(directory, arrays):
+    # Fill a private directory and rename it into place, so other processes see all files or none
+    temporary = f'{directory}.tmp-{os.getpid()}'
+    try:
+        os.makedirs(temporary, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, f'{name}.npy'), np.asarray(array), allow_pickle=False)
+        os.rename(temporary, directory)
+    except OSError:
+        shutil.rmtree(temporary, ignore_errors=True)
+        # Another process won the race; its arrays are the same
+        if not os.path.isdir(directory):
+            raise
+
+
+def _remove_stale(name, directory):
+    # Drop other versions of ``name`` (never entries of other names, e.g. other grids); processes still
+    # mapping them keep their pages until they unmap
+    for stale in glob.glob(os.path.join(CACHE_DIR, f'{glob.escape(name)}-' + '[0-9a-f]' * KEY_LENGTH)):
+        if stale != directory:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def _load_arrays(directory):
+    # Plain ndarray views on the mapped files, so results of slicing them are ordinary arrays
+    return {
+        os.path.splitext(filename)[0]: np.asarray(np.load(os.path.join(directory, filename), mmap_mode='r'))
+        for filename in os.listdir(directory) if filename.endswith('.npy')
+    }
+
+
+def cached_arrays(name, key, compute):
+    """Read-only arrays stored as ``name`` version ``key``, calling ``compute()`` only when they are missing.
+
+    ``compute`` returns a dict of arrays, written once to ``CACHE_DIR`` and
+    then memory-mapped, so every process using the cache (gunicorn workers,
+    including ones started later) shares the same pages instead of holding
+    and warming its own copy. ``name`` identifies what is cached (e.g. one
+    model on one grid) and ``key`` its version, which should cover the
+    code and the format producing the arrays: writing a new ``key``
+    removes the older versions of ``name``. Without the shared cache, or
+    when it cannot be written, the computed arrays are returned directly.
+    """
+    if not SHARED_CACHE:
+        return compute()
+    directory = os.path.join(CACHE_DIR, f'{name}-{key}')
+    try:
+        return _load_arrays(directory)
+    except FileNotFoundError:
+        pass
+    arrays = compute()
+    try:
+        _write_arrays(directory, arrays)
+        _remove_stale(name, directory)
+        return _load_arrays(directory)
+    except OSError:
+        # Not writable, or removed again by a process with another version
+        return arrays
+
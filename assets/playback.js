@@ -0,0 +1,163 @@
+// Clientside playback: the server sends the full curves once per parameter change
+// and the browser advances and draws every animation frame locally.
+
+// Typed arrays the server sends as {dtype, bdata} (base64, little-endian), by Plotly dtype code
+const TYPED_ARRAYS = {
+    f4: Float32Array, f8: Float64Array, i1: Int8Array, u1: Uint8Array,
+    i2: Int16Array, u2: Uint16Array, i4: Int32Array, u4: Uint32Array
+};
+
+function decodeArray(value) {
+    if (!value || value.bdata === undefined) {
+        return value;
+    }
+    const binary = atob(value.bdata);
+    const bytes = new Uint8Array(binary.length);
+    for (let k = 0; k < binary.length; k++) {
+        bytes[k] = binary.charCodeAt(k);
+    }
+    return new TYPED_ARRAYS[value.dtype](bytes.buffer);
+}
+
+// Decoded curve data, kept per store value so every frame reuses the same arrays
+const decodedCurveData = new WeakMap();
+
+function decodeCurveData(curve_data) {
+    if (!curve_data) {
+        return {curves: [], measured: [], webgl: false};
+    }
+    if (!decodedCurveData.has(curve_data)) {
+        const decodeFields = function (curve, fields) {
+            const decoded = Object.assign({}, curve);
+            fields.forEach(function (field) { decoded[field] = decodeArray(curve[field]); });
+            return decoded;
+        };
+        decodedCurveData.set(curve_data, {
+            curves: curve_data.curves.map(function (curve) {
+                return decodeFields(curve, ['shear_stress', 'height_change', 'indices']);
+            }),
+            measured: (curve_data.measured || []).map(function (curve) {
+                return decodeFields(curve, ['strain', 'shear_stress', 'height_change']);
+            }),
+            webgl: curve_data.webgl
+        });
+    }
+    return decodedCurveData.get(curve_data);
+}
+
+function playbackMarker(x, y, text, type) {
+    return {
+        type: type,
+        x: [x],
+        y: [y],
+        mode: 'markers+text',
+        marker: {color: 'black', size: 10},
+        text: [text],
+        textposition: 'top center',
+        showlegend: false,
+        hoverinfo: 'none'
+    };
+}
+
+function playbackCurve(x, y, curve, type) {
+    return {
+        type: type,
+        x: x,
+        y: y,
+        mode: 'lines',
+        line: {width: 3, dash: curve.dash, color: curve.color},
+        name: curve.name,
+        hoverinfo: 'none'
+    };
+}
+
+// Copy the shear box template and move the lower half by the given displacement
+function playbackShearBox(template, displacement) {
+    const figure = JSON.parse(JSON.stringify(template.figure));
+    Object.keys(template.moving.traces).forEach(function (index) {
+        const mask = template.moving.traces[index];
+        const trace = figure.data[index];
+        trace.x = trace.x.map(function (x, k) { return mask[k] ? x + displacement : x; });
+    });
+    template.moving.shapes.forEach(function (index) {
+        figure.layout.shapes[index].x0 += displacement;
+        figure.layout.shapes[index].x1 += displacement;
+    });
+    template.moving.annotations.forEach(function (index) {
+        figure.layout.annotations[index].x += displacement;
+        figure.layout.annotations[index].ax += displacement;
+    });
+    return figure;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    playback: {
+        // Start/pause/reset and interval ticks update the per-session animation state without a server round trip
+        control: function (n_intervals, start_clicks, pause_clicks, reset_clicks, state, templates) {
+            const triggered = window.dash_clientside.callback_context.triggered.map(function (t) {
+                return t.prop_id.split('.')[0];
+            });
+            const last = templates.max_steps - 1;
+            let running = state ? state.running : false;
+            let step = state ? state.step : 0;
+
+            if (triggered.indexOf('reset-button') !== -1) {
+                return [{running: false, step: 0}, true];
+            }
+            if (triggered.indexOf('pause-button') !== -1) {
+                running = false;
+            }
+            if (triggered.indexOf('start-button') !== -1) {
+                running = true;
+            }
+            if (running) {
+                step = Math.min(step + 1, last);
+            }
+            return [{running: running, step: step}, !running || step === last];
+        },
+
+        // Slice the curves up to the current step and place the markers reached so far
+        render: function (state, curve_data, templates) {
+            const step = state ? state.step : 0;
+            const strain = templates.strain.slice(0, step);
+            const data = decodeCurveData(curve_data);
+            const type = data.webgl ? 'scattergl' : 'scatter';
+            const stressTraces = [];
+            const heightTraces = [];
+
+            data.curves.forEach(function (curve) {
+                // Decimated curves list the strain index of each point
+                let x = strain;
+                let count = step;
+                if (curve.indices) {
+                    count = curve.indices.filter(function (index) { return index < step; }).length;
+                    x = Array.from(curve.indices.subarray(0, count), function (index) { return templates.strain[index]; });
+                }
+                stressTraces.push(playbackCurve(x, curve.shear_stress.subarray(0, count), curve, type));
+                heightTraces.push(playbackCurve(x, curve.height_change.subarray(0, count), curve, type));
+                // Same rule as shear_model.events_between(events, -1, step)
+                curve.events.forEach(function (event) {
+                    if (event.step <= step) {
+                        stressTraces.push(playbackMarker(event.strain, event.shear_stress, event.label, type));
+                        heightTraces.push(playbackMarker(event.strain, event.height_change, event.label, type));
+                    }
+                });
+            });
+
+            // Measured curves are drawn in full on every frame
+            data.measured.forEach(function (curve) {
+                const line = {width: 2, dash: curve.dash, color: 'grey'};
+                stressTraces.push({type: type, x: curve.strain, y: curve.shear_stress, mode: 'lines',
+                                   line: line, name: curve.name, hoverinfo: 'none'});
+                heightTraces.push({type: type, x: curve.strain, y: curve.height_change, mode: 'lines',
+                                   line: line, name: curve.name, hoverinfo: 'none'});
+            });
+
+            return [
+                {data: stressTraces, layout: JSON.parse(JSON.stringify(templates.stress_strain))},
+                {data: heightTraces, layout: JSON.parse(JSON.stringify(templates.height_change))},
+                playbackShearBox(templates.shear_box, templates.box_displacement[step])
+            ];
+        }
+    }
+});
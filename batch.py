@@ -0,0 +1,123 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from shear_model import MODELS, SOIL_TYPES, adaptive_strain_grid, discover_models, compute_curves, strain_grid, summarize_curves
+
+# Per-curve summary columns written by ``sweep``
+SUMMARY_COLUMNS = (
+    'soil_type', 'normal_stress', 'resolution', 'peak_index', 'peak_stress', 'peak_strain',
+    'peak_height_change', 'critical_stress', 'critical_height_change',
+)
+
+
+def simulate(soil_types, normal_stresses, resolution=81, include_curves=False, adaptive=False):
+    """Run the model for every (soil type, normal stress) pair on a strain grid.
+
+    Returns a dict of 1-D columns (see ``SUMMARY_COLUMNS``), one row per curve,
+    ordered soil type first. With ``include_curves`` the full ``strain``,
+    ``shear_stress`` and ``height_change`` arrays are added as well. Peaks are
+    refined off the grid, so they do not depend on ``resolution``. With
+    ``adaptive`` each normal stress gets its own ``adaptive_strain_grid`` row
+    with a coarse ``resolution``, the ``resolution`` column holds the row
+    length and ``strain`` has one row per curve.
+    """
+    soil_types = list(soil_types)
+    normal_stresses = np.asarray(normal_stresses, dtype=float)
+    strain = adaptive_strain_grid(soil_types, normal_stresses, resolution) if adaptive else strain_grid(resolution)
+    curves = summarize_curves(soil_types, normal_stresses, strain,
+                              *compute_curves(soil_types, normal_stresses, strain))
+
+    shape = curves.peak_index.shape
+    results = {
+        'soil_type': np.repeat(np.array(soil_types, dtype=str), len(normal_stresses)),
+        'normal_stress': np.tile(normal_stresses, len(soil_types)),
+        'resolution': np.full(curves.peak_index.size, strain.shape[-1]),
+        'peak_index': curves.peak_index.reshape(-1),
+        'peak_stress': curves.peak_stress.reshape(-1),
+        'peak_strain': curves.peak_strain.reshape(-1),
+        'peak_height_change': curves.peak_height_change.reshape(-1),
+        'critical_stress': curves.critical_stress.reshape(-1),
+        'critical_height_change': curves.critical_height_change.reshape(-1),
+    }
+    if include_curves:
+        results['strain'] = np.tile(strain, (len(soil_types), 1)) if strain.ndim == 2 else strain
+        results['shear_stress'] = curves.shear_stress.reshape(shape[0] * shape[1], -1)
+        results['height_change'] = curves.height_change.reshape(shape[0] * shape[1], -1)
+    return results
+
+
+def _simulate_task(task):
+    return simulate(*task)
+
+
+def sweep(soil_types, normal_stresses, resolutions=(81,), workers=None, chunk_size=1000, include_curves=False,
+          adaptive=False):
+    """Run ``simulate`` over all combinations, spread over a process pool.
+
+    Stresses are split into chunks of ``chunk_size`` so every task is one
+    vectorized batch. ``workers=1`` runs in-process. Summary columns of all
+    tasks are concatenated; full curves are grouped per resolution under
+    ``strain_<n>``, ``shear_stress_<n>`` and ``height_change_<n>``, in the
+    order of that resolution's summary rows. Adaptive grids differ between
+    chunks, so ``adaptive`` sweeps only return summaries.
+    """
+    if adaptive and include_curves:
+        raise ValueError('adaptive grids differ between chunks; full curves need adaptive=False')
+    normal_stresses = np.asarray(normal_stresses, dtype=float)
+    tasks = [
+        (tuple(soil_types), normal_stresses[start:start + chunk_size], int(resolution), include_curves, adaptive)
+        for resolution in resolutions
+        for start in range(0, len(normal_stresses), chunk_size)
+    ]
+    if workers == 1:
+        parts = [_simulate_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_simulate_task, tasks))
+
+    results = {column: np.concatenate([part[column] for part in parts]) for column in SUMMARY_COLUMNS}
+    if include_curves:
+        for resolution in resolutions:
+            same = [part for task, part in zip(tasks, parts) if task[2] == resolution]
+            results[f'strain_{resolution}'] = strain_grid(resolution)
+            results[f'shear_stress_{resolution}'] = np.concatenate([part['shear_stress'] for part in same])
+            results[f'height_change_{resolution}'] = np.concatenate([part['height_change'] for part in same])
+    return results
+
+
+def save_results(results, path):
+    """Write ``sweep`` results as compressed NPZ, or the summary columns as CSV."""
+    if os.path.splitext(path)[1].lower() == '.csv':
+        import pandas as pd
+        pd.DataFrame({column: results[column] for column in SUMMARY_COLUMNS}).to_csv(path, index=False)
+    else:
+        np.savez_compressed(path, **results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a headless parameter sweep of the direct shear model.')
+    discover_models()
+    parser.add_argument('--soil', nargs='+', default=list(SOIL_TYPES), choices=list(MODELS), help='soil types')
+    parser.add_argument('--stress', nargs=3, type=float, default=[0, 300, 1], metavar=('START', 'STOP', 'STEP'),
+                        help='normal stress range in kPa (stop included)')
+    parser.add_argument('--resolution', nargs='+', type=int, default=[81], help='strain grid points')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='stresses per task')
+    parser.add_argument('--curves', action='store_true', help='also store the full curves (NPZ only)')
+    parser.add_argument('--adaptive', action='store_true', help='refine the grid around peaks and branch switches')
+    parser.add_argument('-o', '--output', default='sweep.npz', help='output .npz or .csv file')
+    args = parser.parse_args(argv)
+
+    start, stop, step = args.stress
+    normal_stresses = np.arange(start, stop + step / 2, step)
+    results = sweep(args.soil, normal_stresses, args.resolution, args.workers, args.chunk_size, args.curves,
+                    args.adaptive)
+    save_results(results, args.output)
+    print(f'Wrote {len(results["soil_type"])} curves to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
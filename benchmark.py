@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Lower is better for every compared metric; a run fails the comparison when one grows by more than the tolerance
+COMPARED_METRICS = ('latency_ms_p50', 'latency_ms_p95', 'bytes_per_tick', 'bytes', 'seconds', 'process_seconds')
+# Parameters that identify a result across runs
+KEY_FIELDS = ('benchmark', 'mode', 'resolution', 'cache', 'curves', 'step', 'model', 'batch')
+
+
+def stress_values(n_levels):
+    """``n_levels`` normal stresses spread over the slider range, as the stress-list text."""
+    return ','.join(f'{stress:g}' for stress in np.linspace(10, 300, n_levels).round(1))
+
+
+def curve_selection(n_curves):
+    # Soil types and stress list giving n_curves curves (two soil types from two curves on)
+    soil_types = ['dense', 'loose'] if n_curves > 1 else ['dense']
+    return soil_types, stress_values(max(n_curves // len(soil_types), 1))
+
+
+def callback_payload(dependency, values, triggered, states=None):
+    """Body of a ``/_dash-update-component`` request for ``dependency`` (an entry of ``/_dash-dependencies``)."""
+    states = states or {}
+    output = dependency['output']
+    specs = [dict(zip(('id', 'property'), item.rsplit('.', 1))) for item in output.strip('.').split('...')]
+    return {
+        'output': output,
+        'outputs': specs if output.startswith('..') else specs[0],
+        'inputs': [dict(item, value=values.get(f'{item["id"]}.{item["property"]}')) for item in dependency['inputs']],
+        'state': [dict(item, value=states.get(f'{item["id"]}.{item["property"]}')) for item in dependency['state']],
+        'changedPropIds': [triggered] if triggered else [],
+    }
+
+
+def server_timing(header):
+    """Phase durations in ms from a ``Server-Timing`` header."""
+    timings = {}
+    for entry in (header or '').split(','):
+        name, _, duration = entry.strip().partition(';dur=')
+        if duration:
+            timings[name] = float(duration)
+    return timings
+
+
+def _summary(latencies, sizes, phases, per_tick=False):
+    # Latency percentiles, request rate, response size and mean Server-Timing phases of one measurement
+    latencies = np.asarray(latencies) * 1000
+    return {
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p95': float(np.percentile(latencies, 95)),
+        'ticks_per_s' if per_tick else 'requests_per_s': float(1000 / latencies.mean()),
+        'bytes_per_tick' if per_tick else 'bytes': float(np.mean(sizes)),
+        'phases_ms': {name: float(np.mean(values)) for name, values in phases.items()},
+    }
+
+
+def bench_callbacks(curve_counts, steps, repeat):
+    """Time the playback callbacks of this process's app through the Flask test client."""
+    import direct_shear
+
+    from shear_model import shear_strain
+
+    server = direct_shear.create_app().server
+    client = server.test_client()
+    dependencies = client.get('/_dash-dependencies').get_json()
+    mode = server.config['PLAYBACK_MODE']
+    results = []
+    for n_curves in curve_counts:
+        soil_types, stress_list = curve_selection(n_curves)
+        values = {
+            'soil-type-checklist.value': soil_types, 'normal-stress-checklist.value': [],
+            'normal-stress-1.value': 50, 'normal-stress-2.value': 100, 'normal-stress-3.value': 200,
+            'normal-stress-list.value': stress_list, 'overlay-checklist.value': [],
+        }
+        common = {'mode': mode, 'resolution': len(shear_strain), 'curves': n_curves}
+
+        if mode == 'client':
+            # Parameter changes are the only requests: one curve-data payload per change
+            dependency = next(item for item in dependencies if item['output'] == 'curve-data.data')
+            latencies, sizes, phases = [], [], {}
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = client.post('/_dash-update-component',
+                                       json=callback_payload(dependency, values, 'normal-stress-1.value'))
+                latencies.append(time.perf_counter() - start)
+                sizes.append(len(response.data))
+                for name, duration in server_timing(response.headers.get('Server-Timing')).items():
+                    phases.setdefault(name, []).append(duration)
+            results.append({'benchmark': 'curve_data', **common, **_summary(latencies, sizes, phases)})
+            continue
+
+        dependency = next(item for item in dependencies if 'extendData' in item['output'])
+        for step in steps:
+            step = min(step, len(shear_strain) - 1)
+            for benchmark in ('render', 'tick'):
+                latencies, sizes, phases = [], [], {}
+                for _ in range(repeat):
+                    values['animation-state.data'] = {'running': True, 'step': step}
+                    if benchmark == 'render':
+                        payload = callback_payload(dependency, values, 'normal-stress-1.value',
+                                                   {'drawn-step.data': None})
+                    else:
+                        payload = callback_payload(dependency, values, 'animation-state.data',
+                                                   {'drawn-step.data': max(step - 1, 0)})
+                    start = time.perf_counter()
+                    response = client.post('/_dash-update-component', json=payload)
+                    latencies.append(time.perf_counter() - start)
+                    sizes.append(len(response.data))
+                    for name, duration in server_timing(response.headers.get('Server-Timing')).items():
+                        phases.setdefault(name, []).append(duration)
+                results.append({'benchmark': benchmark, **common, 'step': step,
+                                **_summary(latencies, sizes, phases, per_tick=benchmark == 'tick')})
+    return results
+
+
+def bench_evaluation(models, batch_sizes, repeat):
+    """Time ``SoilModel.evaluate`` on the app grid for batches of specimens (normal stresses)."""
+    from shear_model import MODELS, shear_strain
+
+    results = []
+    for model in models:
+        for batch in batch_sizes:
+            stresses = np.linspace(1, 300, batch)
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                MODELS[model].evaluate(stresses, shear_strain)
+                times.append(time.perf_counter() - start)
+            seconds = float(np.median(times))
+            results.append({'benchmark': 'evaluate', 'model': model, 'batch': batch,
+                            'resolution': len(shear_strain), 'seconds': seconds,
+                            'specimens_per_s': batch / seconds if seconds else float('inf')})
+    return results
+
+
+def measure_startup():
+    """Seconds of each startup stage in this (fresh) interpreter, from importing the app to its first callback."""
+    stages = {}
+    start = time.perf_counter()
+    import direct_shear
+    stages['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    server = direct_shear.create_app().server
+    stages['create_app'] = time.perf_counter() - start
+
+    # The first page load: index, layout (with the figure templates) and dependencies
+    client = server.test_client()
+    start = time.perf_counter()
+    client.get('/')
+    client.get('/_dash-layout')
+    dependencies = client.get('/_dash-dependencies').get_json()
+    stages['page'] = time.perf_counter() - start
+
+    # The initial call of the curve callback of the playback mode
+    output = 'curve-data.data' if server.config['PLAYBACK_MODE'] == 'client' else 'extendData'
+    dependency = next(item for item in dependencies if output in item['output'])
+    values = {
+        'soil-type-checklist.value': ['dense'], 'normal-stress-checklist.value': ['sigma_n2'],
+        'normal-stress-1.value': 50, 'normal-stress-2.value': 100, 'normal-stress-3.value': 200,
+        'normal-stress-list.value': '', 'overlay-checklist.value': [],
+        'animation-state.data': {'running': False, 'step': 0},
+    }
+    start = time.perf_counter()
+    client.post('/_dash-update-component', json=callback_payload(dependency, values, None))
+    stages['first_callback'] = time.perf_counter() - start
+    return stages
+
+
+def bench_startup(modes, repeat):
+    """Median startup stages over ``repeat`` fresh interpreters, with a cold and a warm array cache."""
+    results = []
+    for mode in modes:
+        for cache in ('cold', 'warm'):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                env = dict(os.environ, DIRECT_SHEAR_PLAYBACK=mode, DIRECT_SHEAR_CACHE=cache_dir)
+                runs = []
+                for k in range(repeat + (cache == 'warm')):
+                    if cache == 'cold':
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+                    start = time.perf_counter()
+                    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--startup-worker'],
+                                            env=env, capture_output=True, text=True, check=True,
+                                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+                    process_seconds = time.perf_counter() - start
+                    # The first warm run only fills the cache
+                    if cache == 'cold' or k > 0:
+                        runs.append({**json.loads(output.strip().splitlines()[-1]), 'process': process_seconds})
+            phases = {name: float(np.median([run[name] for run in runs])) * 1000
+                      for name in runs[0] if name != 'process'}
+            results.append({'benchmark': 'startup', 'mode': mode, 'cache': cache,
+                            'seconds': sum(phases.values()) / 1000,
+                            'process_seconds': float(np.median([run['process'] for run in runs])), 'phases_ms': phases})
+    return results
+
+
+def _run_worker(args, mode, resolution):
+    # Playback mode and grid size are read at import, so each combination runs in a fresh interpreter
+    env = dict(os.environ, DIRECT_SHEAR_PLAYBACK=mode, DIRECT_SHEAR_RESOLUTION=str(resolution))
+    command = [sys.executable, os.path.abspath(__file__), '--worker',
+               '--curves', *map(str, args.curves), '--steps', *map(str, args.steps), '--repeat', str(args.repeat)]
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def result_key(result):
+    return tuple((field, result.get(field)) for field in KEY_FIELDS if result.get(field) is not None)
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each compared metric against ``baseline``, and whether any regressed."""
+    previous = {result_key(result): result for result in baseline['results']}
+    lines, regressed = [], False
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        label = ' '.join(f'{field}={value}' for field, value in result_key(result))
+        for metric in COMPARED_METRICS:
+            if metric not in result or not old.get(metric):
+                continue
+            ratio = result[metric] / old[metric]
+            worse = ratio > 1 + tolerance
+            regressed |= worse
+            lines.append(f'{"REGRESSION" if worse else "ok":10} {label} {metric}: '
+                         f'{old[metric]:.4g} -> {result[metric]:.4g} ({ratio:.2f}x)')
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the playback callbacks and the curve evaluation.')
+    parser.add_argument('--modes', nargs='+', default=['server', 'client'], choices=('server', 'client'))
+    parser.add_argument('--resolution', nargs='+', type=int, default=[81], help='strain grid points')
+    parser.add_argument('--curves', nargs='+', type=int, default=[6, 60, 600], help='selected curves')
+    parser.add_argument('--steps', nargs='+', type=int, default=[1, 40, 80], help='animation steps')
+    parser.add_argument('--models', nargs='+', default=['dense', 'loose'], help='models for the evaluation benchmark')
+    parser.add_argument('--batch', nargs='+', type=int, default=[1, 10, 100, 1000, 10000, 100000],
+                        help='specimens per evaluation')
+    parser.add_argument('--repeat', type=int, default=20, help='requests or evaluations per measurement')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='JSON file for the results')
+    parser.add_argument('--compare', metavar='BASELINE', help='saved results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown or growth')
+    parser.add_argument('--no-startup', dest='startup', action='store_false', help='skip the startup benchmark')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--startup-worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(bench_callbacks(args.curves, args.steps, args.repeat)))
+        return 0
+    if args.startup_worker:
+        print(json.dumps(measure_startup()))
+        return 0
+
+    results = []
+    for resolution in args.resolution:
+        for mode in args.modes:
+            results += _run_worker(args, mode, resolution)
+    results += bench_evaluation(args.models, args.batch, max(args.repeat // 4, 3))
+    if args.startup:
+        results += bench_startup(args.modes, max(args.repeat // 4, 3))
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+
+    for result in results:
+        label = ' '.join(f'{field}={value}' for field, value in result_key(result))
+        if result['benchmark'] == 'evaluate':
+            print(f'{label}: {result["seconds"] * 1000:.2f} ms ({result["specimens_per_s"]:.3g} specimens/s)')
+        elif result['benchmark'] == 'startup':
+            stages = ', '.join(f'{name} {duration:.0f} ms' for name, duration in result['phases_ms'].items())
+            print(f'{label}: {result["seconds"] * 1000:.0f} ms to the first callback ({stages})')
+        else:
+            rate = result.get('ticks_per_s', result.get('requests_per_s'))
+            size = result.get('bytes_per_tick', result.get('bytes'))
+            print(f'{label}: p50 {result["latency_ms_p50"]:.2f} ms, p95 {result["latency_ms_p95"]:.2f} ms, '
+                  f'{rate:.0f}/s, {size:.0f} B')
+    print(f'Wrote {len(results)} results to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            lines, regressed = compare(results, json.load(f), args.tolerance)
+        print('\n'.join(lines))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
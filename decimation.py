@@ -0,0 +1,54 @@
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the Largest-Triangle-Three-Buckets downsample of every curve in ``y``.
+
+    ``y`` is ``(n_curves, n_points)`` and ``x`` either ``(n_points,)`` or the
+    same shape as ``y``. The first and last points are always kept; each
+    bucket in between contributes the point spanning the largest triangle
+    with the previously kept point and the mean of the next bucket. All
+    curves are processed together, one bucket at a time. Returns an int array
+    of shape ``(n_curves, n_out)``.
+    """
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    x = np.broadcast_to(np.asarray(x, dtype=float), y.shape)
+    n_curves, n_points = y.shape
+    if n_out >= n_points or n_out < 3:
+        return np.tile(np.arange(n_points), (n_curves, 1))
+
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(int)
+    rows = np.arange(n_curves)
+    indices = np.empty((n_curves, n_out), dtype=int)
+    indices[:, 0], indices[:, -1] = 0, n_points - 1
+    for k in range(n_out - 2):
+        start, end = edges[k], max(edges[k + 1], edges[k] + 1)
+        next_start, next_end = end, edges[k + 2] if k + 2 < len(edges) else n_points
+        next_x = x[:, next_start:max(next_end, next_start + 1)].mean(axis=1)
+        next_y = y[:, next_start:max(next_end, next_start + 1)].mean(axis=1)
+        previous_x, previous_y = x[rows, indices[:, k]], y[rows, indices[:, k]]
+
+        # Twice the triangle area for every candidate of the bucket, NaNs never win
+        area = np.abs((previous_x - next_x)[:, None] * (y[:, start:end] - previous_y[:, None])
+                      - (previous_x[:, None] - x[:, start:end]) * (next_y - previous_y)[:, None])
+        indices[:, k + 1] = start + np.argmax(np.nan_to_num(area, nan=-1), axis=1)
+    return indices
+
+
+def decimate(x, curves, n_out, keep=None):
+    """Per-curve indices that keep every curve in ``curves`` recognisable with about ``n_out`` points.
+
+    ``curves`` is a list of ``(n_curves, n_points)`` arrays drawn against the
+    same ``x`` (e.g. shear stress and height change); the LTTB picks of each
+    are merged, so one index set serves all of them. ``keep`` optionally adds
+    one index per curve that must survive (e.g. the peak). Returns a list of
+    sorted index arrays, one per curve.
+    """
+    picks = [lttb_indices(x, y, n_out) for y in curves]
+    indices = []
+    for k in range(len(picks[0])):
+        merged = np.unique(np.concatenate([pick[k] for pick in picks]))
+        if keep is not None and 0 <= keep[k] < curves[0].shape[-1]:
+            merged = np.union1d(merged, [keep[k]])
+        indices.append(merged)
+    return indices
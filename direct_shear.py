@@ -1,800 +1,733 @@
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output, State
+from dash import Patch, dcc, html, no_update
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from flask import has_request_context
 import numpy as np
 import plotly.graph_objs as go
-import pandas as pd
+import copy
 import os
 
-app = dash.Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}])
-
-app.title = 'Direct Shear'
-app._favicon = ('assets/favicon.ico')
-
-# Updated layout with sliders on top and layer properties below
-app.layout = html.Div([
-    # Main container
-    html.Div(style={'display': 'flex', 'flexDirection': 'row', 'width': '100%', 'height': '100vh'}, children=[
-        # Control container (sliders)
-        html.Div(id='control-container', style={'width': '25%', 'padding': '2%', 'flexDirection': 'column'}, children=[
-            html.H1('Direct Shear', className='h1'),
-
-        # Animation container
-        html.Div(className='dropdown-container', children=[
-            html.Label('Animation control', className='slider-label'),
-            html.Label('Soil Type:', className='dropdown-label'),
-            dcc.Checklist(
-                id='soil-type-checklist',
-                options=[
-                    {'label': 'Dense Sand / OC Clay', 'value': 'dense'},
-                    {'label': 'Loose Sand / NC Clay', 'value': 'loose'},
-                ],
-                value=['dense'],  # Default selected option
-                # inline=True,  # Display options inline
-            ),
-            html.Label('Normal Stresses:', className='dropdown-label'),
-            dcc.Checklist(
-                id='normal-stress-checklist',
-                options=[
-                    {'label': html.Span(['σ', html.Sub('n-1')]), 'value': 'sigma_n1'},
-                    {'label': html.Span(['σ', html.Sub('n-2')]), 'value': 'sigma_n2'},
-                    {'label': html.Span(['σ', html.Sub('n-3')]), 'value': 'sigma_n3'}
-                ],
-                value=['sigma_n2'],  # Default selected option
-                # inline=True,  # Display options inline
-            ),
-                # Control buttons for animation
-            html.Button('Start', id='start-button'),
-            html.Button('Pause', id='pause-button'),
-            html.Button('Reset', id='reset-button'),  
-        ]),
-
-        # Sliders for each layer
-        html.Div(className='slider-container', children=[
-            # Normal stress1 slider
-            html.Label(children=[
-                "σ" , html.Sub('n-1'), " (kPa)", 
-                        html.Div(className='tooltip', children=[
-                            html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                            html.Span('Normal stress 1', className='tooltiptext')
-                        ])], className='slider-label'),
-            dcc.Slider(
-                id='normal-stress-1', min=0, max=300, step=1, value=50,
-                marks={i: f'{i}' for i in range(0, 301, 100)},
-                className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-            ),
-            # Normal stress 2 slider
-            html.Label(children=[
-                "σ" , html.Sub('n-2'), " (kPa)", 
-                        html.Div(className='tooltip', children=[
-                            html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                            html.Span('Normal stress 2', className='tooltiptext')
-                        ])], className='slider-label'),
-            dcc.Slider(
-                id='normal-stress-2', min=0, max=300, step=1, value=100,
-                marks={i: f'{i}' for i in range(0, 301, 100)},
-                className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-            ),
-            # Normal stress 3 slider
-            html.Label(children=[
-                "σ" , html.Sub('n-3'), " (kPa)", 
-                        html.Div(className='tooltip', children=[
-                            html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                            html.Span('Normal stress 3', className='tooltiptext')
-                        ])], className='slider-label'),
-            dcc.Slider(
-                id='normal-stress-3', min=0, max=300, step=1, value=200,
-                marks={i: f'{i}' for i in range(0, 301, 100)},
-                className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-            ),
-            # Friction angle slider
-            html.Label(children=[
-                "φ (degrees)", 
-                        html.Div(className='tooltip', children=[
-                            html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                            html.Span('Friction Angle', className='tooltiptext')
-                        ])], className='slider-label'),
-            dcc.Slider(
-                id='friction-angle', min=0, max=50, step=1, value=30,
-                marks={i: f'{i}' for i in range(0, 51, 10)},
-                className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-            ),
-            # Cohesion slider
-            html.Label(children=[
-                "c (kPa)", 
-                        html.Div(className='tooltip', children=[
-                            html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
-                            html.Span('Cohesion', className='tooltiptext')
-                        ])], className='slider-label'),
-            dcc.Slider(
-                id='cohesion', min=0, max=300, step=1, value=0,
-                marks={i: f'{i}' for i in range(0, 301, 100)},
-                className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
-            ),
+from functools import lru_cache
+
+from decimation import decimate, lttb_indices
+from encoding import display_values, encode_array, encode_figure
+from metrics import METRICS_ENABLED, instrument, lap
+from mohr_coulomb import model_envelope, monte_carlo_envelope
+from figures import (
+    add_envelope_distribution, add_envelope_fit, curve_trace, level_colors, marker_trace, measured_trace,
+    mohr_coulomb_figure, playback_templates, points_per_curve, shear_box_template, style_height_change,
+    style_stress_strain, translate_shear_box, use_webgl,
+)
+from shear_model import (
+    MARKER_EVENTS, MODELS, curve_events, discover_models, events_between, get_curve_table, model_version,
+    shear_displacement, shear_strain,
+)
+
+# Settings of create_app, each defaulting to its environment variable
+DEFAULT_CONFIG = {
+    # 'client' animates in the browser from curves sent once, 'server' renders every frame on the server
+    'PLAYBACK_MODE': os.environ.get('DIRECT_SHEAR_PLAYBACK', 'client'),
+    # Curves and events over HTTP for notebooks and other scripts (/api/curves)
+    'API': os.environ.get('DIRECT_SHEAR_API', '1') != '0',
+    # Callback timings on /metrics and in Server-Timing headers
+    'METRICS': METRICS_ENABLED,
+    # Measured curves from data.csv as an overlay
+    'MEASURED_DATA': os.environ.get('DIRECT_SHEAR_MEASURED', '1') != '0',
+    # Download of the animation as a standalone HTML page
+    'DOWNLOAD': os.environ.get('DIRECT_SHEAR_DOWNLOAD', '1') != '0',
+    # Build the curve tables when the app is created (in the master with gunicorn's preload), not on first use
+    'WARM_CACHE': os.environ.get('DIRECT_SHEAR_WARM', '1') != '0',
+}
+
+
+def page_layout(config, templates=None):
+    # Sliders on top and layer properties below; optional controls only when their subsystem is enabled
+    return html.Div([
+        # Main container
+        html.Div(style={'display': 'flex', 'flexDirection': 'row', 'width': '100%', 'height': '100vh'}, children=[
+            # Control container (sliders)
+            html.Div(id='control-container', style={'width': '25%', 'padding': '2%', 'flexDirection': 'column'},
+                     children=[
+                html.H1('Direct Shear', className='h1'),
+
+            # Animation container
+            html.Div(className='dropdown-container', children=[
+                html.Label('Animation control', className='slider-label'),
+                html.Label('Soil Type:', className='dropdown-label'),
+                dcc.Checklist(
+                    id='soil-type-checklist',
+                    options=[{'label': model.label, 'value': soil_type} for soil_type, model in MODELS.items()],
+                    value=['dense'],  # Default selected option
+                    # inline=True,  # Display options inline
+                ),
+                dcc.Checklist(
+                    id='overlay-checklist',
+                    options=[{'label': 'Measured data', 'value': 'measured'}] if config['MEASURED_DATA'] else [],
+                    value=[],
+                ),
+                html.Label('Normal Stresses:', className='dropdown-label'),
+                dcc.Checklist(
+                    id='normal-stress-checklist',
+                    options=[
+                        {'label': html.Span(['σ', html.Sub('n-1')]), 'value': 'sigma_n1'},
+                        {'label': html.Span(['σ', html.Sub('n-2')]), 'value': 'sigma_n2'},
+                        {'label': html.Span(['σ', html.Sub('n-3')]), 'value': 'sigma_n3'}
+                    ],
+                    value=['sigma_n2'],  # Default selected option
+                    # inline=True,  # Display options inline
+                ),
+                    # Control buttons for animation
+                html.Button('Start', id='start-button'),
+                html.Button('Pause', id='pause-button'),
+                html.Button('Reset', id='reset-button'),
+                *([html.Button('Download animation', id='download-button'), dcc.Download(id='download-animation')]
+                  if config['DOWNLOAD'] else []),
+            ]),
+
+            # Sliders for each layer
+            html.Div(className='slider-container', children=[
+                # Normal stress1 slider
+                html.Label(children=[
+                    "σ" , html.Sub('n-1'), " (kPa)", 
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
+                                html.Span('Normal stress 1', className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Slider(
+                    id='normal-stress-1', min=0, max=300, step=1, value=50,
+                    marks={i: f'{i}' for i in range(0, 301, 100)},
+                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+                ),
+                # Normal stress 2 slider
+                html.Label(children=[
+                    "σ" , html.Sub('n-2'), " (kPa)", 
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
+                                html.Span('Normal stress 2', className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Slider(
+                    id='normal-stress-2', min=0, max=300, step=1, value=100,
+                    marks={i: f'{i}' for i in range(0, 301, 100)},
+                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+                ),
+                # Normal stress 3 slider
+                html.Label(children=[
+                    "σ" , html.Sub('n-3'), " (kPa)", 
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
+                                html.Span('Normal stress 3', className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Slider(
+                    id='normal-stress-3', min=0, max=300, step=1, value=200,
+                    marks={i: f'{i}' for i in range(0, 301, 100)},
+                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+                ),
+                # Any number of further normal stresses, e.g. for comparison plots in lab reports
+                html.Label(children=[
+                    "More σ" , html.Sub('n'), " (kPa)",
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'),
+                                html.Span('Comma-separated values or ranges start:stop:step, rounded to whole kPa',
+                                          className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Input(
+                    id='normal-stress-list', type='text', value='', debounce=True,
+                    placeholder='e.g. 25, 150, 0:300:20'
+                ),
+                # Friction angle slider
+                html.Label(children=[
+                    "φ (degrees)", 
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
+                                html.Span('Friction Angle', className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Slider(
+                    id='friction-angle', min=0, max=50, step=1, value=30,
+                    marks={i: f'{i}' for i in range(0, 51, 10)},
+                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+                ),
+                # Cohesion slider
+                html.Label(children=[
+                    "c (kPa)", 
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'), 
+                                html.Span('Cohesion', className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Slider(
+                    id='cohesion', min=0, max=300, step=1, value=0,
+                    marks={i: f'{i}' for i in range(0, 301, 100)},
+                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+                ),
+                # Standard deviations used by the Monte Carlo mode
+                html.Label(children=[
+                    "Std. dev. of φ (°)",
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'),
+                                html.Span('Friction angle uncertainty (Monte Carlo mode)', className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Slider(
+                    id='friction-angle-std', min=0, max=10, step=0.5, value=2,
+                    marks={i: f'{i}' for i in range(0, 11, 2)},
+                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+                ),
+                html.Label(children=[
+                    "Std. dev. of c (kPa)",
+                            html.Div(className='tooltip', children=[
+                                html.Img(src='/assets/info-icon.png', className='info-icon', alt='Info'),
+                                html.Span('Cohesion uncertainty (Monte Carlo mode)', className='tooltiptext')
+                            ])], className='slider-label'),
+                dcc.Slider(
+                    id='cohesion-std', min=0, max=50, step=1, value=5,
+                    marks={i: f'{i}' for i in range(0, 51, 10)},
+                    className='slider', tooltip={'placement': 'bottom', 'always_visible': True}
+                ),
+                dcc.Checklist(
+                    id='uncertainty-checklist',
+                    options=[{'label': 'Monte Carlo uncertainty', 'value': 'monte_carlo'}],
+                    value=[],
+                ),
+                html.Label('Envelope fit to the model tests:', className='dropdown-label'),
+                dcc.Checklist(
+                    id='envelope-checklist',
+                    options=[
+                        {'label': 'Peak', 'value': 'peak'},
+                        {'label': 'Critical state', 'value': 'critical'}
+                    ],
+                    value=[],
+                ),
             
-        ]),
-
-    ]),  # End of control container
-
-    # Right-side: Graphs and shear box animation
-    html.Div(
-        className='graph-container', 
-        style={'display': 'flex', 'flexDirection': 'column', 'height': '100vh', 'width': '75%'}, 
-        children=[
-            # First row: Shear box and Stress-Strain Graph
-            html.Div(
-                style={'display': 'flex', 'width': '100%', 'height': '50%'}, 
-                children=[
-                    html.Div(
-                        style={'width': '50%', 'height': '100%'}, 
-                        children=[
-                            dcc.Graph(id='shear-box-graph', style={'height': '100%', 'width': '100%'})
-                        ]
-                    ),
-                    html.Div(
-                        style={'width': '50%', 'height': '100%'}, 
-                        children=[
-                            dcc.Graph(id='stress-strain-graph', style={'height': '100%', 'width': '100%'})
-                        ]
-                    ),
-                ]
-            ),
-            # Second row: Height Change and Mohr-Coulomb Graph
-            html.Div(
-                style={'display': 'flex', 'width': '100%', 'height': '50%'}, 
-                children=[
-                    html.Div(
-                        style={'width': '50%', 'height': '100%'}, 
-                        children=[
-                            dcc.Graph(id='mohr-coulomb-graph', style={'height': '100%', 'width': '100%'})
-                        ]
-                    ),
-                    html.Div(
-                        style={'width': '50%', 'height': '100%'}, 
-                        children=[
-                            dcc.Graph(id='height-change-graph', style={'height': '100%', 'width': '100%'})
-                        ]
-                    ),
-                ]
-            ),
-        ]
-    ),
-
-
-    # Interval component for animation
-    dcc.Interval(id='interval-component', interval=100, n_intervals=0, disabled=True),
-
-    # Add the logo image to the top left corner
-    html.Img(
-        src='/assets/logo.png', className='logo',
-        style={
-            'position': 'absolute',
-            'width': '15%',  # Adjust size as needed
-            'height': 'auto',
-            'z-index': '1000',  # Ensure it's on top of other elements
-        }
-    ),
-    ])  # End of main container
-])
+            ]),
+
+        ]),  # End of control container
+
+        # Right-side: Graphs and shear box animation
+        html.Div(
+            className='graph-container', 
+            style={'display': 'flex', 'flexDirection': 'column', 'height': '100vh', 'width': '75%'}, 
+            children=[
+                # First row: Shear box and Stress-Strain Graph
+                html.Div(
+                    style={'display': 'flex', 'width': '100%', 'height': '50%'}, 
+                    children=[
+                        html.Div(
+                            style={'width': '50%', 'height': '100%'}, 
+                            children=[
+                                dcc.Graph(id='shear-box-graph', style={'height': '100%', 'width': '100%'})
+                            ]
+                        ),
+                        html.Div(
+                            style={'width': '50%', 'height': '100%'}, 
+                            children=[
+                                dcc.Graph(id='stress-strain-graph', style={'height': '100%', 'width': '100%'})
+                            ]
+                        ),
+                    ]
+                ),
+                # Second row: Height Change and Mohr-Coulomb Graph
+                html.Div(
+                    style={'display': 'flex', 'width': '100%', 'height': '50%'}, 
+                    children=[
+                        html.Div(
+                            style={'width': '50%', 'height': '100%'}, 
+                            children=[
+                                dcc.Graph(id='mohr-coulomb-graph', style={'height': '100%', 'width': '100%'})
+                            ]
+                        ),
+                        html.Div(
+                            style={'width': '50%', 'height': '100%'}, 
+                            children=[
+                                dcc.Graph(id='height-change-graph', style={'height': '100%', 'width': '100%'})
+                            ]
+                        ),
+                    ]
+                ),
+            ]
+        ),
+
+
+        # Interval component for animation
+        dcc.Interval(id='interval-component', interval=100, n_intervals=0, disabled=True),
+
+        # Per-session animation state (running flag and current step), kept in the browser
+        dcc.Store(id='animation-state', data={'running': False, 'step': 0}),
+
+        # Last animation step drawn by the server, so later steps only send new points
+        dcc.Store(id='drawn-step'),
+
+        # Curves for the current parameters and the static figure templates used by clientside playback
+        dcc.Store(id='curve-data'),
+        dcc.Store(id='figure-templates', data=templates),
+
+        # Add the logo image to the top left corner
+        html.Img(
+            src='/assets/logo.png', className='logo',
+            style={
+                'position': 'absolute',
+                'width': '15%',  # Adjust size as needed
+                'height': 'auto',
+                'z-index': '1000',  # Ensure it's on top of other elements
+            }
+        ),
+        ])  # End of main container
+    ])
 
 
 
-# Store the state of the animation (whether it's running or not)
-animation_running = False
-shear_displacement = np.linspace(0, 80, 81)
-shear_strain = shear_displacement / 100
 shear_stress = np.zeros_like(shear_strain)
 height_change = np.zeros_like(shear_strain)  # Initialize height_change
 max_steps = len(shear_strain)
-current_step = 0  # Keep track of the current step
-
-# Callback to handle the animations and input updates
-@app.callback(
-    [Output('stress-strain-graph', 'figure'),
-     Output('height-change-graph', 'figure'),
-     Output('mohr-coulomb-graph', 'figure'),
-     Output('shear-box-graph', 'figure'),
-     Output('interval-component', 'disabled')],
-    [Input('interval-component', 'n_intervals'),
-     Input('soil-type-checklist', 'value'),  
-     Input('normal-stress-checklist', 'value'),
-     Input('normal-stress-1', 'value'),
-     Input('normal-stress-2', 'value'),
-     Input('normal-stress-3', 'value'),
-     Input('cohesion', 'value'),
-     Input('friction-angle', 'value'),
-     Input('start-button', 'n_clicks'),
-     Input('pause-button', 'n_clicks'),
-     Input('reset-button', 'n_clicks')],
-    [State('interval-component', 'disabled'),
-     State('stress-strain-graph', 'figure'),
-     State('height-change-graph', 'figure')]
-)
-def update_graphs(n, soil_types, normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3, 
-                  cohesion, friction_angle, start_clicks, pause_clicks, reset_clicks, 
-                  interval_disabled, stress_strain_fig, height_change_fig):
-    global animation_running, current_step, shear_displacement, shear_strain
-
-    # Initialize figures if None
-    # Convert figures from dict to go.Figure
-    if not isinstance(stress_strain_fig, go.Figure):
-        stress_strain_fig = go.Figure(stress_strain_fig)
-    if not isinstance(height_change_fig, go.Figure):
-        height_change_fig = go.Figure(height_change_fig)
-    shear_box_fig = go.Figure()  # Always reset shear box figure
-    mohr_fig = go.Figure()
-
-    # Handle button clicks
-    ctx = dash.callback_context
-    trigger_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
-    if trigger_id == 'reset-button':
-        current_step = 0
-        animation_running = False
-        return stress_strain_fig, height_change_fig,  mohr_fig, shear_box_fig,True
-
-    if trigger_id == 'pause-button':
-        animation_running = False
-        # return stress_strain_fig, height_change_fig,  mohr_fig, shear_box_fig,True
-
-    if trigger_id == 'start-button':
-        animation_running = True
-        interval_disabled = False
-    
-    # Update animation step
-    if animation_running:
-        current_step = min(current_step + 1, len(shear_displacement) - 1)
-    
-    # Map normal stresses to their slider values
+
+# Define a color map for normal stresses
+stress_colors = {
+    'sigma_n1': 'blue',  # Assign a unique color for sigma_n1
+    'sigma_n2': 'green', # Assign a unique color for sigma_n2
+    'sigma_n3': 'red'    # Assign a unique color for sigma_n3
+}
+
+# define legend names map 
+legend_names = {
+    'sigma_n1': 'σ<sub>n-1</sub>',
+    'sigma_n2': 'σ<sub>n-2</sub>',
+    'sigma_n3': 'σ<sub>n-3</sub>'
+}
+
+# Listed normal stresses beyond the sliders, capped to keep figures usable
+MAX_STRESS_LEVELS = 500
+
+
+
+@lru_cache(maxsize=None)
+def figure_templates():
+    # Static parts of the figures for clientside playback, built on the first page load rather than at startup
+    return playback_templates(shear_strain, shear_displacement * 0.1)
+
+
+def warm_cache(config):
+    # Build every model's curve table and parse the measured data now instead of on first use. Both are
+    # memory-mapped from the array cache, so with gunicorn's preload the master builds them and workers share them
+    for soil_type in MODELS:
+        get_curve_table(shear_strain).table(soil_type)
+    if config['MEASURED_DATA']:
+        from experimental import load_dataset
+        load_dataset()
+
+
+def parse_stress_list(text):
+    # Normal stresses from "25, 150, 0:300:20" (single values and inclusive ranges), limited to the slider range.
+    # Values are rounded to whole kPa like the sliders, so every listed stress is a row of the curve tables
+    stresses = []
+    for token in (text or '').replace(';', ',').replace(' ', ',').split(','):
+        try:
+            if ':' in token:
+                start, stop, step = (float(part) for part in token.split(':'))
+                if step > 0 and np.isfinite([start, stop, step]).all() and stop >= start:
+                    # Count the values (stop included within half a step) before generating them and cap the
+                    # count, so tiny steps cannot allocate huge ranges
+                    count = int(min(np.floor((stop - start) / step + 0.5) + 1, MAX_STRESS_LEVELS))
+                    stresses.extend((start + step * np.arange(count)).tolist())
+            elif token:
+                value = float(token)
+                if np.isfinite(value):
+                    stresses.append(value)
+        except ValueError:
+            continue
+    snapped = dict.fromkeys(float(stress) for stress in np.floor(np.asarray(stresses) + 0.5) if 0 <= stress <= 300)
+    return list(snapped)[:MAX_STRESS_LEVELS]
+
+
+def stress_levels(normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3, stress_list):
+    # Values, legend names and colors of the checked slider stresses followed by the listed ones
     normal_stress_map = {
         'sigma_n1': normal_stress_1,
         'sigma_n2': normal_stress_2,
         'sigma_n3': normal_stress_3
     }
-
-
-    # Define a color map for normal stresses
-    stress_colors = {
-        'sigma_n1': 'blue',  # Assign a unique color for sigma_n1
-        'sigma_n2': 'green', # Assign a unique color for sigma_n2
-        'sigma_n3': 'red'    # Assign a unique color for sigma_n3
-    }
-
-    # define legend names map 
-    legend_names = {
-        'sigma_n1': 'σ<sub>n-1</sub>',
-        'sigma_n2': 'σ<sub>n-2</sub>',
-        'sigma_n3': 'σ<sub>n-3</sub>'
-    }
-
-    # Function to create graphs (unchanged)
-    def create_graphs(soil_t, normal_stress):
-        shear_stress = np.zeros_like(shear_strain)
-        height_change = np.zeros_like(shear_strain)
-        if soil_t == 'dense':
-            # Shear stress calculation for dense soil
-            for i, strain in enumerate(shear_strain):
-                if strain < 0.19*(normal_stress/100)**0.25:
-                    s_y0 = (normal_stress / 100) * 1.16
-                    s_A = -s_y0
-                    if normal_stress > 100:
-                        s_R0 = -15
-                    else:
-                        s_R0 = -20
-                    shear_stress[i] = s_y0 + s_A * np.exp(s_R0 * strain)
-                else:
-                    s_y0 = (normal_stress / 100) * 0.65
-                    s_A1 = -s_y0 * 100
-                    s_t1 = 0.09 *(normal_stress / 100) ** 0.25
-                    s_A2 = -s_A1 * 0.92
-                    s_t2 = s_t1 * 1.072
-                    shear_stress[i] = s_y0 + s_A1 * np.exp(-strain / s_t1) + s_A2 * np.exp(-strain / s_t2)
-
-            # Height change calculation for dense soil
-            for i, strain in enumerate(shear_strain):
-                    v_A = -0.6 * (normal_stress / 100) **0.01 # Amplitude
-                    if normal_stress > 100:
-                        v_xc = 0.084 * (normal_stress / 100) ** 0.6 # Center
-                        v_w = 0.327 * (normal_stress / 100) ** 0.2  # Width
-                    else:
-                        v_xc = 0.084 * (normal_stress / 100) ** 0.9 # Center
-                        v_w = 0.327 * (normal_stress / 100) ** 0.01  # Width
-                    v_y0 = -v_A / (v_w * np.sqrt(np.pi / (4 * np.log(2)))) * np.exp(-4 * np.log(2) * (0 - v_xc) ** 2 / v_w ** 2)
-
-                    # Add a steepness control term for the upper half
-                    height_change[i] = v_y0 + v_A / (v_w * np.sqrt(np.pi / (4 * np.log(2)))) * np.exp(
-                        -4 * np.log(2) * (strain - v_xc)**2 / (v_w**2)
-                    )
-                    height_change[i] += 0.2 * height_change[i] **2 # Scale down the height change
-
-        elif soil_t == 'loose':
-            # Shear stress calculation for loose soil
-            for i, strain in enumerate(shear_strain):
-                s_y0 = (normal_stress / 100) * 0.65
-                s_A = -s_y0
-                s_R0 = -3.107
-                shear_stress[i] = s_y0 + s_A * np.exp(s_R0 * strain)
-
-            # Height change calculation for loose soil
-            for i, strain in enumerate(shear_strain):
-                v_y0 = -(normal_stress / 100) * 0.81
-                v_A = -v_y0
-                v_R0 = -3.9
-                height_change[i] = v_y0 + v_A * np.exp(v_R0 * strain)
-
-        return shear_stress, height_change
-
-    # Remove deselected traces
-    selected_stresses = set(normal_stresses)
-    stress_strain_fig.data = [
-        trace for trace in stress_strain_fig.data
-        if trace.name in selected_stresses
-    ]
-    height_change_fig.data = [
-        trace for trace in height_change_fig.data
-        if trace.name in selected_stresses
-    ]
-
-    # Generate new data for selected soil types and stresses
-    for soil_type in soil_types:
-        for stress_label in normal_stresses:
-            normal_stress = normal_stress_map[stress_label]
-
-            # Use the `create_graphs` function to calculate data
-            shear_stress, height_change = create_graphs(soil_type, normal_stress)
-
-            # Set line style based on soil type
-            line_style = 'solid' if soil_type == 'dense' else 'dash'
-
-            # Add traces to the stress-strain graph
-            stress_strain_fig.add_trace(go.Scatter(
-                x=shear_strain[:current_step],
-                y=shear_stress[:current_step],
-                mode='lines',
-                line=dict(width=3, dash=line_style, color=stress_colors[stress_label]),  # Apply color and line style
-                name=f'{legend_names[stress_label]} ({soil_type})',
-                hoverinfo='none'
-            ))
-
-            # Add traces to the height-change graph
-            height_change_fig.add_trace(go.Scatter(
-                x=shear_strain[:current_step],
-                y=height_change[:current_step],
-                mode='lines',
-                line=dict(width=3, dash=line_style, color=stress_colors[stress_label]),  # Apply color and line style
-                name=f'{legend_names[stress_label]} ({soil_type})',
-                hoverinfo='none'
-            ))
-            # add trace for "P" at the peak stress
-            if (shear_stress[:current_step] == shear_stress.max()).any():
-                stress_strain_fig.add_trace(go.Scatter(
-                    x=[shear_strain[np.argmax(shear_stress)]],
-                    y=[np.max(shear_stress)],
-                    mode='markers+text',  # Enable both markers and text
-                    marker=dict(color='black', size=10),
-                    text=['P'],  # Add text
-                    textposition="top center",  # Position the text relative to the marker
-                    showlegend=False,
-                    hoverinfo='none'
-                ))
-                # Adding a scatter point for corresponding height change in height change figure
-                height_change_fig.add_trace(go.Scatter(
-                    x=[shear_strain[np.argmax(shear_stress)]], 
-                    y=[height_change[np.argmax(shear_stress)]], 
-                    mode='markers+text',  # Enable both markers and text
-                    marker=dict(color='black', size=10),
-                    text=['P'],  # Add text
-                    textposition="top center",  # Position the text relative to the marker
-                    showlegend=False,
-                    hoverinfo='none'
-                ))
-            # add 'CS' at the critical state at the end of the graph
-            if current_step == max_steps - 1:
-                stress_strain_fig.add_trace(go.Scatter(
-                    x=[shear_strain[-1]],
-                    y=[shear_stress[-1]],
-                    mode='markers+text',  # Enable both markers and text
-                    marker=dict(color='black', size=10),
-                    text=['CS'],  # Add text
-                    textposition="top center",  # Position the text relative to the marker
-                    showlegend=False,
-                    hoverinfo='none'
-                ))
-                # Adding a scatter point for corresponding height change in height change figure
-                height_change_fig.add_trace(go.Scatter(
-                    x=[shear_strain[-1]], 
-                    y=[height_change[-1]], 
-                    mode='markers+text',  # Enable both markers and text
-                    marker=dict(color='black', size=10),
-                    text=['CS'],  # Add text
-                    textposition="top center",  # Position the text relative to the marker
-                    showlegend=False,
-                    hoverinfo='none'
-                ))
-
-
-    # Mohr-Coulomb Failure Envelope
-    normal_stresses = [normal_stress_1, normal_stress_2, normal_stress_3]
-    peak_stresses= [cohesion + sigma * np.tan(np.radians(friction_angle)) for sigma in normal_stresses] 
-
-
-
-    # Add the shear stress points as red markers
-    mohr_fig.add_trace(go.Scatter(
-        x=normal_stresses,
-        y=peak_stresses,
-        mode='markers',
-        marker=dict(color='red', size=10),
-        name='Stress Points',
-        showlegend=False
-    ))
-
-    # Add the failure envelope line starting from the cohesion value
-    mohr_fig.add_trace(go.Scatter(
-        x=[0, max(normal_stresses)],
-        y=[cohesion, cohesion + max(normal_stresses) * np.tan(np.radians(friction_angle))],
-        mode='lines',
-        line=dict(color='black', width=3),
-        name='Failure Envelope'
-    ))
-
-    # adding annotation for the equation of shear stress
-    mohr_fig.add_annotation(
-        x=min(normal_stresses), y=max(peak_stresses),
-        xref='x', yref='y',
-        text=f'τ = c + σ tan(φ)',
-        showarrow=False,
-        font=dict(family="Times New Roman, Arial, sans-serif", size=20, color="black", weight="bold"),
+    listed = parse_stress_list(stress_list)
+    values = [normal_stress_map[stress_label] for stress_label in normal_stresses] + listed
+    names = [legend_names[stress_label] for stress_label in normal_stresses] + [f'{stress:g} kPa' for stress in listed]
+    colors = [stress_colors[stress_label] for stress_label in normal_stresses] + level_colors(len(listed))
+    return values, names, colors
+
+
+@lru_cache(maxsize=32)
+def _curve_indices(soil_types, normal_stresses, version):
+    curves = get_curve_table(shear_strain).select(list(soil_types), list(normal_stresses))
+    n_curves = curves.peak_index.size
+    n_out = points_per_curve(n_curves, len(shear_strain))
+    if n_out is None:
+        return [np.arange(len(shear_strain))] * n_curves
+    shape = (n_curves, len(shear_strain))
+    return decimate(shear_strain, [curves.shear_stress.reshape(shape), curves.height_change.reshape(shape)], n_out,
+                    keep=curves.peak_index.reshape(-1))
+
+
+def curve_indices(soil_types, normal_stresses):
+    # Strain indices drawn for each curve (soil type major), LTTB-decimated once the figures exceed the point budget
+    return _curve_indices(tuple(soil_types), tuple(normal_stresses), model_version(soil_types))
+
+
+def measured_points(strain, values, n_out):
+    # Indices of one measured curve under its share of the point budget
+    if n_out is None:
+        return np.arange(len(strain))
+    return np.unique(np.concatenate([lttb_indices(strain, np.asarray(y)[None], n_out)[0] for y in values]))
+
+
+def measured_curves(soil_types):
+    # Measured (strain, shear stress, height change) curves from data.csv, loaded on first use
+    from experimental import load_dataset
+    dataset = load_dataset()
+    return [(soil_type, curve) for soil_type in soil_types for curve in dataset.curves(soil_type)]
+
+
+def event_markers(curves, start_step, end_step, webgl=False):
+    # (stress-strain, height-change) trace per marker event with the events shown after start_step, up to end_step
+    events = curve_events(curves, shear_strain)
+    for name, reached in events_between(events, start_step, end_step).items():
+        event = events[name]
+        strain = display_values(event.strain[reached])
+        yield (marker_trace(strain, display_values(event.shear_stress[reached]), event.label, webgl),
+               marker_trace(strain, display_values(event.height_change[reached]), event.label, webgl))
+
+# Callback to draw the stress-strain and height-change curves (server playback)
+@instrument
+def update_curves(animation_state, soil_types, normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3,
+                  stress_list, overlays, drawn_step):
+    current_step = (animation_state or {'step': 0})['step']
+    stress_values, names, colors = stress_levels(
+        normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3, stress_list
     )
 
-    # Update the layout of the figure
-    mohr_fig.update_layout(
-        title=dict(
-            text='Mohr-Coulomb Failure Envelope',
-            font=dict(family="Arial, sans-serif", size=16, color="black", weight="bold", style="italic"),
-        ),
-        font=dict(family="Times New Roman, Arial, sans-serif", size=16, color="black", weight="bold"),
-        xaxis_title='Normal Stress, 	σ<sub>n</sub> (kPa)',
-        yaxis_title='Shear Stress, τ (kPa)',
-        xaxis=dict(
-            range=[0, max(normal_stresses) * 1.2],
-            title_standoff=4,
-            zeroline=False,
-            showticklabels=True,
-            ticks='outside',
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            showgrid=False,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            mirror=True,
-            hoverformat=".2f"  # Sets hover value format for x-axis to two decimal places
-        ),
-        yaxis=dict(
-            range=[0, max(peak_stresses) * 1.2],
-            zeroline=True,
-            zerolinecolor= "black",
-            title_standoff=4,
-            showticklabels=True,
-            ticks='outside',
-            ticklen=5,
-            minor_ticks="inside",
-            showline=True,
-            linewidth=2,
-            linecolor='black',
-            showgrid=False,
-            gridwidth=1,
-            gridcolor='lightgrey',
-            mirror=True,
-            hoverformat=".3f"  # Sets hover value format for y-axis to two decimal places
-        ),
-        legend=dict(
-            yanchor="top",  # Align the bottom of the legend box
-            y=0.1,               # Position the legend at the bottom inside the plot
-            xanchor="right",    # Align the right edge of the legend box
-            x=1,               # Position the legend at the right inside the plot
-            font= dict(size=12),  # Adjust font size
-            bgcolor="rgba(255, 255, 255, 0.7)",  # Optional: Semi-transparent white background
-            bordercolor="black",                 # Optional: Border color
-            borderwidth=1                        # Optional: Border width
-        ),
-        margin=dict( r=40, t=40),
-    )
+    # Look up the precomputed curves for the selected soil types and stresses
+    curves = get_curve_table(shear_strain).select(soil_types, stress_values)
+    indices = curve_indices(soil_types, stress_values)
+    webgl = use_webgl(sum(len(index) for index in indices))
+    n_curves = len(indices)
+    lap('curves')
 
-    # Shear box movement
+    ctx = dash.callback_context
+    trigger_ids = {trigger['prop_id'].split('.')[0] for trigger in ctx.triggered}
+    if trigger_ids == {'animation-state'} and drawn_step is not None and drawn_step <= current_step:
+        if drawn_step == current_step:
+            return no_update, no_update, no_update, no_update, no_update
+
+        # Animation steps only send the new points as extendData: [{'x': [...], 'y': [...]}, trace indices]
+        stress_update, height_update, extended = {'x': [], 'y': []}, {'x': [], 'y': []}, []
+        for k, (i, j) in enumerate(np.ndindex(curves.shear_stress.shape[:2])):
+            new_points = indices[k][(indices[k] >= drawn_step) & (indices[k] < current_step)]
+            if len(new_points):
+                extended.append(k)
+                strain = display_values(shear_strain[new_points])
+                stress_update['x'].append(strain)
+                stress_update['y'].append(display_values(curves.shear_stress[i, j, new_points]))
+                height_update['x'].append(strain)
+                height_update['y'].append(display_values(curves.height_change[i, j, new_points]))
+
+        # Newly reached markers join the marker trace of their event
+        markers = event_markers(curves, drawn_step, current_step)
+        for e, (stress_marker, height_marker) in enumerate(markers):
+            if len(stress_marker.x):
+                extended.append(n_curves + e)
+                stress_update['x'].append(stress_marker.x)
+                stress_update['y'].append(stress_marker.y)
+                height_update['x'].append(height_marker.x)
+                height_update['y'].append(height_marker.y)
+        lap('figure')
+        if not extended:
+            return no_update, no_update, no_update, no_update, current_step
+        return no_update, no_update, [stress_update, extended], [height_update, extended], current_step
+
+    stress_strain_fig = go.Figure()
+    height_change_fig = go.Figure()
+    for k, (i, j) in enumerate(np.ndindex(curves.shear_stress.shape[:2])):
+        soil_type = soil_types[i]
+        drawn = indices[k][indices[k] < current_step]
+
+        # Set line style based on soil type
+        line_style = MODELS[soil_type].dash
+        name = f'{names[j]} ({soil_type})'
+
+        # Add traces to the stress-strain and height-change graphs; animation steps extend them, so they stay lists
+        strain = display_values(shear_strain[drawn])
+        stress_strain_fig.add_trace(curve_trace(
+            strain, display_values(curves.shear_stress[i, j, drawn]), name, colors[j], line_style, webgl
+        ))
+        height_change_fig.add_trace(curve_trace(
+            strain, display_values(curves.height_change[i, j, drawn]), name, colors[j], line_style, webgl
+        ))
+
+    # One marker trace per event after all curves, so animation steps can extend curves and markers by index
+    for stress_marker, height_marker in event_markers(curves, -1, current_step, webgl):
+        stress_strain_fig.add_trace(stress_marker)
+        height_change_fig.add_trace(height_marker)
+
+    # Measured curves are drawn in full and never extended, so they go as typed arrays
+    measured_traces = []
+    if 'measured' in overlays:
+        measured = measured_curves(soil_types)
+        for soil_type, (strain, shear_stress, height_change) in measured:
+            n_out = points_per_curve(len(measured), len(strain))
+            kept = measured_points(strain, (shear_stress, height_change), n_out)
+            measured_traces.append(len(stress_strain_fig.data))
+            stress_strain_fig.add_trace(measured_trace(strain[kept], shear_stress[kept], soil_type, webgl))
+            height_change_fig.add_trace(measured_trace(strain[kept], height_change[kept], soil_type, webgl))
+    lap('figure')
+
+    # Update the layout of the stress-strain and height-change graphs
+    style_stress_strain(stress_strain_fig)
+    style_height_change(height_change_fig)
+    lap('layout')
+
+    figures = [encode_figure(fig, traces=measured_traces) for fig in (stress_strain_fig, height_change_fig)]
+    lap('encode')
+    return (*figures, None, None, current_step)
+
+
+# Callback to move the shear box (server playback)
+@instrument
+def update_shear_box(animation_state):
+    current_step = (animation_state or {'step': 0})['step']
     displacement = shear_displacement[current_step] * 0.1
-    
-
-    # Original position of the lower box (dashed border)
-    shear_box_fig.add_trace(go.Scatter(
-        x=[0+displacement, 0, 0, displacement],
-        y=[0, 0, 10, 10],
-        mode='lines',
-        line=dict(color='black', width=1, dash='dash'),
-        hoverinfo='none'
-    ))
-
-
-    # Lower shear box (moves right with shear displacement)
-    shear_box_fig.add_shape(
-        type="rect",
-        x0=10+displacement, y0=2, x1=90+displacement, y1=10,
-        fillcolor="rgb(236,204,162)",
-        line=dict(color="rgba(0,0,0,0)"),  # Make the border transparent
-        
-    )
-
-    # Upper shear box (fixed position)
-    shear_box_fig.add_shape(
-        type="rect",
-        x0=10, y0=10, x1=90, y1=18,
-        fillcolor="rgb(236,204,162)",
-        line=dict(color="rgba(0,0,0,0)"),  # Make the border transparent
-        
-    )
-
-    # Add the shear box outline left_upp
-    shear_box_fig.add_trace(go.Scatter(
-        x=[0, 10, 10, 0, 0],
-        y=[10.2, 10.2, 20, 20, 10.2],
-        mode='lines',
-        line=dict(color='black', width=1),  # Border color and width
-        fill='toself',  # Fill the enclosed area
-        fillpattern=dict(
-            shape="/",  # Pattern shape ('/', '\', '|', '-', '+', 'x', etc.)
-            bgcolor='white',  # Background color of the pattern
-            fgcolor='black',  # Foreground color of the pattern
-            size=5,  # Pattern size
-            solidity=0.5  # Pattern transparency
-        ),
-        hoverinfo='none'
-    ))
-
-    # Add the shear box outline left_down
-    shear_box_fig.add_trace(go.Scatter(
-        x=[0+displacement, 10+displacement, 10+displacement, 0+displacement, 0+displacement],
-        y=[0, 0, 9.8, 9.8, 0],
-        mode='lines',
-        line=dict(color='black', width=1),  # Border color and width
-        fill='toself',  # Fill the enclosed area
-        fillpattern=dict(
-            shape="/",  # Pattern shape ('/', '\', '|', '-', '+', 'x', etc.)
-            bgcolor='white',  # Background color of the pattern
-            fgcolor='black',  # Foreground color of the pattern
-            size=5,  # Pattern size
-            solidity=0.5  # Pattern transparency
-        ),
-        hoverinfo='none'
-    ))
-
-    # Add the shear box outline right
-    shear_box_fig.add_trace(go.Scatter
-    (
-        x=[100, 90, 90, 100, 100],
-        y=[10.2, 10.2, 20, 20, 10.2],
-        mode='lines',
-        line=dict(color='black', width=1),
-        fill='toself',
-        fillpattern=dict(
-            shape="/",
-            bgcolor='white',
-            fgcolor='black',
-            size=5,
-            solidity=0.5
-        ),
-        hoverinfo='none'
-    ))
-
-    # Add the shear box outline right
-    shear_box_fig.add_trace(go.Scatter
-    (
-        x=[100+displacement, 90+displacement, 90+displacement, 100+displacement, 100+displacement],
-        y=[0, 0, 9.8, 9.8, 0],
-        mode='lines',
-        line=dict(color='black', width=1),
-        fill='toself',
-        fillpattern=dict(
-            shape="/",
-            bgcolor='white',
-            fgcolor='black',
-            size=5,
-            solidity=0.5
-        ),
-        hoverinfo='none'
-    ))
-
-    # Add prous stone down
-    shear_box_fig.add_trace(go.Scatter
-    (
-        x=[10+displacement, 90+displacement, 90+displacement, 10+displacement, 10+displacement],
-        y=[0, 0, 2, 2, 0],
-        mode='lines',
-        line=dict(color='black', width=1),
-        fill='toself',
-        fillpattern=dict(
-            shape=".",
-            bgcolor='lightgray',
-            fgcolor='black',
-            size=5,
-            solidity=0.5
-        ),
-        hoverinfo='none'
-    ))
-
-    # Add prous stone upp
-    shear_box_fig.add_trace(go.Scatter
-    (
-        x=[10, 90, 90, 10, 10],
-        y=[18, 18, 20, 20, 18],
-        mode='lines',
-        line=dict(color='black', width=1),
-        fill='toself',
-        fillpattern=dict(
-            shape=".",
-            bgcolor='lightgray',
-            fgcolor='black',
-            size=5,
-            solidity=0.5
-        ),
-        hoverinfo='none'
-    ))
-
-    # Adding shape top blatten
-    shear_box_fig.add_trace(go.Scatter(
-        x=[10, 90, 80, 20, 10],
-        y=[20, 20, 23, 23, 20],
-        mode='lines',
-        line=dict(color='black', width=1),  # Border color and width
-        fill='toself',  # Fill the enclosed area
-        fillcolor='black',  # Solid black fill
-        name='Shear Box'
-    ))
-
-    # Adding the circle at the top
-    shear_box_fig.add_shape(
-        type="circle",
-        xref="x", yref="y",  # Use the same coordinate system as the Scatter trace
-        x0=46, y0=22.5,  # Bottom-left corner of the bounding box
-        x1=54, y1=23.5,  # Top-right corner of the bounding box
-        line=dict(color="white", width=2),  # Circle border (white)
-        fillcolor="black"  # Circle fill (black)
-    )
 
+    # The static geometry is sent once; later steps only move the lower half
+    if dash.callback_context.triggered_id is None:
+        return translate_shear_box(copy.deepcopy(shear_box_template()['figure']), displacement)
+    return translate_shear_box(Patch(), displacement)
 
 
-    # Add an arrow showing the horizontal shear force
-    shear_box_fig.add_annotation(
-        x=0 + displacement,  y=5,
-        ax=-40 + displacement, ay=5,
-        xref="x", yref="y",
-        axref="x", ayref="y",
-        showarrow=True,
-        arrowhead=2,
-        arrowsize=1.5,
-        arrowwidth=3,
-        arrowcolor="red",
-        text="Shear force",
-        font=dict(family="Arial, sans-serif", size=16, color="red", weight="bold"),
+@instrument
+def curve_data(soil_types, normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3, stress_list, overlays):
+    # Full curves for the selected soil types and stresses, sent once per parameter change as typed arrays
+    stress_values, names, colors = stress_levels(
+        normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3, stress_list
     )
-
-    # Add an arrow showing the normal stress (downward arrow)
-    shear_box_fig.add_annotation(
-        x=50 , y=23.5,
-        ax=50 , ay=30,
-        xref="x", yref="y",
-        axref="x", ayref="y",
-        showarrow=True,
-        arrowhead=2,
-        arrowsize=1.5,
-        arrowwidth=3,
-        arrowcolor="blue",
-        text="Normal force",
-        font=dict(family="Arial, sans-serif", size=16, color="blue", weight="bold"),
-        valign="top"
-    )
-
-    # Update the layout of the figure
-    shear_box_fig.update_layout(
-        title='Shear Box Animation:',
-        font=dict(family="Arial, sans-serif", size=14, color="black", weight="bold", style="italic"),
-        plot_bgcolor='white',
-        xaxis=dict(
-            range=[-50, 150], 
-            showticklabels=False,
-            showgrid=False,
-            title=None, 
-            zeroline=False,
-            fixedrange=True
-            ),
-        yaxis=dict(
-            range=[-5, 30],
-            showticklabels=False,
-            showline = False,
-            showgrid=False, 
-            title=None,
-            zeroline=False,
-            fixedrange=True
-            ),
-        showlegend=False,
-        margin=dict(l=40, r=40, t=40, b=40)
-    )
-
-    # Update the layout of the stress-strain graph
-    stress_strain_fig.update_layout(
-        plot_bgcolor='white',
-        xaxis_title='Horizantal displacement (Shear strain)',     # Set the title for the x-axis
-        yaxis_title='Shear stress',
-        font=dict(family="Times New Roman, Arial, sans-serif", size=12, color="black", weight="bold"),
-        xaxis=dict(
-            range=[0, 1],  # Set the range for the x-axis
-            mirror=True,           # Mirror the axes on all sides
-            showline=True,         # Show the axes line
-            linewidth=2,           # Set the width of the axes line
-            linecolor = 'black',
-            gridcolor='white',  # Set the gridline color
-            showticklabels=False,
-            zerolinecolor='black',  # Set zero line color
-            fixedrange=True
-        ),
-        yaxis=dict(
-            range=[0, 3.8],  # Set the range for the y-axis
-            mirror=True,           # Mirror the axes on all sides
-            showline=True,         # Show the axes line
-            linewidth=2,           # Set the width of the axes line
-            linecolor = 'black',
-            showgrid=False,
-            showticklabels=False,
-            gridcolor='white',
-            fixedrange=True
-        ),
-        margin=dict(l=40, r=40, t=40, b=40)
+    curves = get_curve_table(shear_strain).select(soil_types, stress_values)
+    events = curve_events(curves, shear_strain)
+    # Events that show at all; later steps are never reached
+    shown = events_between(events, -1, max_steps - 1)
+    indices = curve_indices(soil_types, stress_values)
+    decimated = points_per_curve(curves.peak_index.size, len(shear_strain)) is not None
+    lap('curves')
+    data = []
+    for k, (i, j) in enumerate(np.ndindex(curves.shear_stress.shape[:2])):
+        soil_type = soil_types[i]
+        curve = {
+            'name': f'{names[j]} ({soil_type})',
+            'color': colors[j],
+            'dash': MODELS[soil_type].dash,
+            'shear_stress': encode_array(curves.shear_stress[i, j, indices[k]]),
+            'height_change': encode_array(curves.height_change[i, j, indices[k]]),
+            # Markers in drawing order, each shown from its step on
+            'events': [
+                {'label': events[name].label, 'step': int(events[name].step[i, j]),
+                 'strain': display_values(events[name].strain[i, j]),
+                 'shear_stress': display_values(events[name].shear_stress[i, j]),
+                 'height_change': display_values(events[name].height_change[i, j])}
+                for name in MARKER_EVENTS if shown[name][i, j]
+            ],
+        }
+        # Decimated curves carry the strain indices of their points
+        if decimated:
+            curve['indices'] = encode_array(indices[k], 'u2' if len(shear_strain) <= 1 << 16 else 'u4')
+        data.append(curve)
+    measured = []
+    if 'measured' in overlays:
+        measured_list = measured_curves(soil_types)
+        for soil_type, (strain, shear_stress, height_change) in measured_list:
+            kept = measured_points(strain, (shear_stress, height_change),
+                                   points_per_curve(len(measured_list), len(strain)))
+            measured.append({
+                'name': f'Measured ({soil_type})',
+                'dash': 'solid' if soil_type == 'dense' else 'dash',
+                'strain': encode_array(strain[kept]),
+                'shear_stress': encode_array(shear_stress[kept]),
+                'height_change': encode_array(height_change[kept]),
+            })
+    webgl = use_webgl(sum(len(index) for index in indices))
+    lap('encode')
+    return {'curves': data, 'measured': measured, 'webgl': webgl}
+
+
+@instrument
+def download_animation(n_clicks, soil_types, normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3,
+                       stress_list):
+    # Standalone HTML with native Plotly frames, for offline use
+    from animation_export import animation_html
+    stress_values, names, colors = stress_levels(
+        normal_stresses, normal_stress_1, normal_stress_2, normal_stress_3, stress_list
     )
-
-    # Update the layout of the height-change graph
-    height_change_fig.update_layout(
-        plot_bgcolor='white',
-        xaxis_title='Horizontal displacement (Shear strain)',
-        yaxis_title='Change in height (Volumetric strain)',
-        font=dict(family="Times New Roman, Arial, sans-serif", size=10, color="black", weight="bold"),
-        xaxis=dict(
-            range=[0, 1],  # Set the range for the x-axis
-            mirror=True,  # Mirror the axes on all sides
-            showline=True,  # Show the axes line
-            linewidth=2,  # Set the width of the axes line
-            linecolor='black',
-            gridcolor='white',  # Set the gridline color
-            showticklabels=False,
-            zeroline=True,
-            zerolinecolor='black',  # Set zero line color for the vertical zeroline
-            fixedrange=True
-        ),
-        yaxis=dict(
-            range=[-3, 3],  # Set the range for the y-axis
-            mirror=True,  # Mirror the axes on all sides
-            showline=True,  # Show the axes line
-            linewidth=2,  # Set the width of the axes line
-            linecolor='black',
-            showgrid=False,
-            zeroline=True,  # Ensure the horizontal zero line is shown
-            zerolinecolor='black',  # Set a visible color for the horizontal zero line
-            zerolinewidth=2,  # Adjust the thickness of the horizontal zero line
-            showticklabels=False,
-            gridcolor='white',
-            fixedrange=True
-        ),
-        margin=dict(l=40, r=40, t=40)
+    page = animation_html(soil_types, stress_values, names=names, colors=colors)
+    return dcc.send_string(page, 'direct_shear_animation.html')
+
+
+# Colors of the fitted envelopes and their confidence bands
+envelope_colors = {'peak': 'red', 'critical': 'royalblue'}
+
+
+@instrument
+def update_mohr_coulomb(normal_stress_1, normal_stress_2, normal_stress_3, stress_list, cohesion, friction_angle,
+                        soil_types, envelopes, uncertainty, cohesion_std, friction_angle_std):
+    normal_stresses = [normal_stress_1, normal_stress_2, normal_stress_3] + parse_stress_list(stress_list)
+    mohr_fig = mohr_coulomb_figure(normal_stresses, cohesion, friction_angle)
+    lap('figure')
+
+    # c and phi as normal distributions around the slider values, sampled on a fixed sigma grid (cached per
+    # parameter set, so moving the stress sliders reuses them) interpolated at the selected stresses
+    if 'monte_carlo' in (uncertainty or []):
+        distribution = monte_carlo_envelope(('normal', cohesion, cohesion_std),
+                                            ('normal', friction_angle, friction_angle_std))
+        add_envelope_distribution(mohr_fig, distribution, normal_stresses)
+        lap('monte_carlo')
+
+    # Fit c and phi to one model test per kPa across the slider range, with a 95% bootstrap band
+    test_stresses = np.arange(min(normal_stresses), max(normal_stresses) + 1)
+    for state in envelopes or []:
+        if not soil_types or len(test_stresses) < 2:
+            break
+        fit = model_envelope(soil_types, test_stresses, state)
+        # Tests the model leaves undefined (dense at sigma = 0) are dropped; one stress left gives no envelope
+        if fit.n_stresses < 2:
+            continue
+        add_envelope_fit(mohr_fig, fit, 'Peak fit' if state == 'peak' else 'CS fit', envelope_colors[state])
+    lap('envelopes')
+    mohr_fig = encode_figure(mohr_fig)
+    lap('encode')
+    return mohr_fig
+
+
+def register_callbacks(app, config):
+    # Each figure has its own callback with only the inputs it depends on
+    app.callback(
+        Output('mohr-coulomb-graph', 'figure'),
+        [Input('normal-stress-1', 'value'),
+         Input('normal-stress-2', 'value'),
+         Input('normal-stress-3', 'value'),
+         Input('normal-stress-list', 'value'),
+         Input('cohesion', 'value'),
+         Input('friction-angle', 'value'),
+         Input('soil-type-checklist', 'value'),
+         Input('envelope-checklist', 'value'),
+         Input('uncertainty-checklist', 'value'),
+         Input('cohesion-std', 'value'),
+         Input('friction-angle-std', 'value')]
+    )(update_mohr_coulomb)
+
+    if config['DOWNLOAD']:
+        app.callback(
+            Output('download-animation', 'data'),
+            [Input('download-button', 'n_clicks')],
+            [State('soil-type-checklist', 'value'),
+             State('normal-stress-checklist', 'value'),
+             State('normal-stress-1', 'value'),
+             State('normal-stress-2', 'value'),
+             State('normal-stress-3', 'value'),
+             State('normal-stress-list', 'value')],
+            prevent_initial_call=True
+        )(download_animation)
+
+    # Start/Pause/Reset and interval ticks only change the animation state, so they run in the browser
+    app.clientside_callback(
+        ClientsideFunction(namespace='playback', function_name='control'),
+        [Output('animation-state', 'data'),
+         Output('interval-component', 'disabled')],
+        [Input('interval-component', 'n_intervals'),
+         Input('start-button', 'n_clicks'),
+         Input('pause-button', 'n_clicks'),
+         Input('reset-button', 'n_clicks')],
+        [State('animation-state', 'data'),
+         State('figure-templates', 'data')]
     )
 
+    if config['PLAYBACK_MODE'] == 'server':
+        app.callback(
+            [Output('stress-strain-graph', 'figure'),
+             Output('height-change-graph', 'figure'),
+             Output('stress-strain-graph', 'extendData'),
+             Output('height-change-graph', 'extendData'),
+             Output('drawn-step', 'data')],
+            [Input('animation-state', 'data'),
+             Input('soil-type-checklist', 'value'),
+             Input('normal-stress-checklist', 'value'),
+             Input('normal-stress-1', 'value'),
+             Input('normal-stress-2', 'value'),
+             Input('normal-stress-3', 'value'),
+             Input('normal-stress-list', 'value'),
+             Input('overlay-checklist', 'value')],
+            [State('drawn-step', 'data')]
+        )(update_curves)
+        app.callback(
+            Output('shear-box-graph', 'figure'),
+            [Input('animation-state', 'data')]
+        )(update_shear_box)
+
+    if config['PLAYBACK_MODE'] == 'client':
+        # The server only answers parameter changes; frames are drawn in assets/playback.js
+        app.callback(
+            Output('curve-data', 'data'),
+            [Input('soil-type-checklist', 'value'),
+             Input('normal-stress-checklist', 'value'),
+             Input('normal-stress-1', 'value'),
+             Input('normal-stress-2', 'value'),
+             Input('normal-stress-3', 'value'),
+             Input('normal-stress-list', 'value'),
+             Input('overlay-checklist', 'value')]
+        )(curve_data)
+        app.clientside_callback(
+            ClientsideFunction(namespace='playback', function_name='render'),
+            [Output('stress-strain-graph', 'figure'),
+             Output('height-change-graph', 'figure'),
+             Output('shear-box-graph', 'figure')],
+            [Input('animation-state', 'data'),
+             Input('curve-data', 'data')],
+            [State('figure-templates', 'data')]
+        )
+
+
+def create_app(config=None):
+    """Dash app of the simulator, with ``config`` overriding ``DEFAULT_CONFIG``.
+
+    Optional subsystems are imported only when enabled and the figure
+    templates are built on the first page load, so starting a worker costs
+    little more than importing Dash. The settings are kept in
+    ``app.server.config``.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    app = dash.Dash(__name__, meta_tags=[{"name": "viewport", "content": "width=device-width, initial-scale=1"}])
+    app.title = 'Direct Shear'
+    app._favicon = ('assets/favicon.ico')
+    app.server.config.update(config)
+
+    # Plugin models and fitted parameter sets become extra soil types
+    discover_models()
+    if config['API']:
+        # Curves and events over HTTP for notebooks and other scripts (/api/curves)
+        from api import register_api
+        register_api(app.server)
+    if config['METRICS']:
+        # Per-callback phase timings and payload sizes on /metrics and in Server-Timing headers
+        from metrics import register_metrics
+        register_metrics(app.server)
+    if config['WARM_CACHE']:
+        warm_cache(config)
+
+    def serve_layout():
+        # Dash validates the callbacks against the layout at startup, which needs no templates
+        return page_layout(config, figure_templates() if has_request_context() else None)
+
+    app.layout = serve_layout
+    register_callbacks(app, config)
+    return app
+
+
+def __getattr__(name):
+    # The default app is created on first access, e.g. by gunicorn loading `direct_shear:server`
+    if name in ('app', 'server'):
+        app = globals()['app'] = create_app()
+        globals()['server'] = app.server
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-    return stress_strain_fig, height_change_fig, mohr_fig, shear_box_fig, interval_disabled
 
 # Run the Dash app
 if __name__ == '__main__':
-    app.run_server(debug=True)
-    
-
-# Expose the server
-server = app.server
-
+    create_app().run_server(debug=True)
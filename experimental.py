@@ -0,0 +1,91 @@
+import os
+import re
+
+import numpy as np
+
+from array_cache import cache_key, cached_arrays
+
+# Measured curves shipped with the app (semicolon separated, BOM header)
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data.csv')
+
+# Column prefixes and suffixes of the export layout, e.g. SS_D = shear stress of the dense specimen
+QUANTITIES = {'SS': 'shear_stress', 'Vd': 'height_change'}
+SOIL_CODES = {'D': 'dense', 'L': 'loose'}
+DISPLACEMENT_COLUMN = 'H_disp'
+
+
+class Dataset:
+    """Measured shear tests parsed from one export file.
+
+    ``values`` holds all rows (memory-mapped from the cache) with ``columns``
+    as names. An export may contain several tests one after another; each
+    test starts where ``H_disp`` drops back, listed in ``test_starts``.
+    """
+
+    def __init__(self, path, columns, values, test_starts):
+        self.path = path
+        self.columns = list(columns)
+        self.values = values
+        self.test_starts = list(test_starts)
+
+    def column(self, name):
+        return self.values[:, self.columns.index(name)]
+
+    def tests(self):
+        """Yield each test as a dict of column name -> array."""
+        bounds = self.test_starts + [len(self.values)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield {name: self.values[start:end, k] for k, name in enumerate(self.columns)}
+
+    def curves(self, soil_type):
+        """(strain, shear stress, height change) of every test for ``soil_type``; none for unmeasured soil types."""
+        code = next((code for code, name in SOIL_CODES.items() if name == soil_type), None)
+        if code is None:
+            return []
+        shear_column, height_column = f'SS_{code}', f'Vd_{code}'
+        if shear_column not in self.columns or height_column not in self.columns:
+            return []
+        return [
+            (test[DISPLACEMENT_COLUMN], test[shear_column], test[height_column])
+            for test in self.tests()
+        ]
+
+
+def parse_export(path):
+    """Parse an export file into column names, a float array and the row index where each test starts."""
+    import pandas as pd
+
+    frame = pd.read_csv(path, sep=';', encoding='utf-8-sig')
+    frame.columns = [column.strip() for column in frame.columns]
+    values = frame.to_numpy(dtype=float)
+    displacement = values[:, frame.columns.get_loc(DISPLACEMENT_COLUMN)]
+    test_starts = [0] + (np.flatnonzero(np.diff(displacement) < 0) + 1).tolist()
+    return list(frame.columns), values, test_starts
+
+
+def _parsed_arrays(path):
+    columns, values, test_starts = parse_export(path)
+    return {'columns': np.array(columns), 'values': values, 'test_starts': np.array(test_starts, dtype=np.int64)}
+
+
+_datasets = {}
+
+
+def load_dataset(path=DATA_FILE):
+    """Return the ``Dataset`` for ``path``, parsing the CSV only when its cache is missing or stale.
+
+    The parsed arrays live in the shared array cache under the file's name
+    and location, versioned by its modification time and size, so an edited
+    export is parsed again on next use and replaces its old cache.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = cache_key(stat.st_mtime_ns, stat.st_size)
+    dataset = _datasets.get((path, key))
+    if dataset is None:
+        stem = re.sub(r'[^\w.-]', '_', os.path.splitext(os.path.basename(path))[0])
+        arrays = cached_arrays(f'data-{stem}-{cache_key(path)}', key, lambda: _parsed_arrays(path))
+        dataset = _datasets[(path, key)] = Dataset(
+            path, arrays['columns'].tolist(), arrays['values'], arrays['test_starts'].tolist(),
+        )
+    return dataset
@@ -0,0 +1,617 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import plotly.graph_objs as go
+from plotly.colors import sample_colorscale
+
+# Figures with more points than this are drawn with WebGL traces
+WEBGL_POINT_THRESHOLD = int(os.environ.get('DIRECT_SHEAR_WEBGL_POINTS', 2000))
+# Curves are decimated (LTTB) so a figure stays below this many points
+POINT_BUDGET = int(os.environ.get('DIRECT_SHEAR_POINT_BUDGET', 20000))
+# Decimated curves keep at least this many points each
+MIN_CURVE_POINTS = 20
+
+
+def use_webgl(n_points):
+    return n_points > WEBGL_POINT_THRESHOLD
+
+
+def points_per_curve(n_curves, n_points):
+    """Points each of ``n_curves`` curves may keep under ``POINT_BUDGET``, or None if they all fit."""
+    if n_curves * n_points <= POINT_BUDGET:
+        return None
+    return max(POINT_BUDGET // max(n_curves, 1), MIN_CURVE_POINTS)
+
+
+def level_colors(count):
+    """``count`` distinct colors for normal stress levels, sampled from a continuous scale."""
+    if count <= 1:
+        return sample_colorscale('Viridis', [0.5])
+    return sample_colorscale('Viridis', [k / (count - 1) * 0.9 for k in range(count)])
+
+
+def curve_trace(x, y, name, color, dash, webgl=False):
+    """Model curve of one soil type and normal stress."""
+    return (go.Scattergl if webgl else go.Scatter)(
+        x=x,
+        y=y,
+        mode='lines',
+        line=dict(width=3, dash=dash, color=color),  # Apply color and line style
+        name=name,
+        hoverinfo='none'
+    )
+
+
+def marker_trace(x, y, text, webgl=False):
+    """Black markers labelled ``text`` such as "P" (peak) or "CS" (critical state), one per point of ``x``/``y``.
+
+    The label is a text template, so points appended later are labelled too.
+    """
+    return (go.Scattergl if webgl else go.Scatter)(
+        x=x,
+        y=y,
+        mode='markers+text',  # Enable both markers and text
+        marker=dict(color='black', size=10),
+        texttemplate=text,  # Same label for every point
+        textposition="top center",  # Position the text relative to the marker
+        showlegend=False,
+        hoverinfo='none'
+    )
+
+
+def measured_trace(x, y, soil_type, webgl=False):
+    """Grey line of a measured curve, dashed for loose soil like the model curves."""
+    return (go.Scattergl if webgl else go.Scatter)(
+        x=x,
+        y=y,
+        mode='lines',
+        line=dict(width=2, dash='solid' if soil_type == 'dense' else 'dash', color='grey'),
+        name=f'Measured ({soil_type})',
+        hoverinfo='none'
+    )
+
+
+def mohr_coulomb_figure(normal_stresses, cohesion, friction_angle):
+    """Failure envelope through the peak stresses of the given normal stresses."""
+    mohr_fig = go.Figure()
+
+    # Mohr-Coulomb Failure Envelope
+    peak_stresses= [cohesion + sigma * np.tan(np.radians(friction_angle)) for sigma in normal_stresses] 
+
+
+
+    # Add the shear stress points as red markers
+    mohr_fig.add_trace((go.Scattergl if use_webgl(len(normal_stresses)) else go.Scatter)(
+        x=normal_stresses,
+        y=peak_stresses,
+        mode='markers',
+        marker=dict(color='red', size=10),
+        name='Stress Points',
+        showlegend=False
+    ))
+
+    # Add the failure envelope line starting from the cohesion value
+    mohr_fig.add_trace(go.Scatter(
+        x=[0, max(normal_stresses)],
+        y=[cohesion, cohesion + max(normal_stresses) * np.tan(np.radians(friction_angle))],
+        mode='lines',
+        line=dict(color='black', width=3),
+        name='Failure Envelope'
+    ))
+
+    # adding annotation for the equation of shear stress
+    mohr_fig.add_annotation(
+        x=min(normal_stresses), y=max(peak_stresses),
+        xref='x', yref='y',
+        text=f'τ = c + σ tan(φ)',
+        showarrow=False,
+        font=dict(family="Times New Roman, Arial, sans-serif", size=20, color="black", weight="bold"),
+    )
+
+    # Update the layout of the figure
+    mohr_fig.update_layout(
+        title=dict(
+            text='Mohr-Coulomb Failure Envelope',
+            font=dict(family="Arial, sans-serif", size=16, color="black", weight="bold", style="italic"),
+        ),
+        font=dict(family="Times New Roman, Arial, sans-serif", size=16, color="black", weight="bold"),
+        xaxis_title='Normal Stress, 	σ<sub>n</sub> (kPa)',
+        yaxis_title='Shear Stress, τ (kPa)',
+        xaxis=dict(
+            range=[0, max(normal_stresses) * 1.2],
+            title_standoff=4,
+            zeroline=False,
+            showticklabels=True,
+            ticks='outside',
+            ticklen=5,
+            minor_ticks="inside",
+            showline=True,
+            linewidth=2,
+            linecolor='black',
+            showgrid=False,
+            gridwidth=1,
+            gridcolor='lightgrey',
+            mirror=True,
+            hoverformat=".2f"  # Sets hover value format for x-axis to two decimal places
+        ),
+        yaxis=dict(
+            range=[0, max(peak_stresses) * 1.2],
+            zeroline=True,
+            zerolinecolor= "black",
+            title_standoff=4,
+            showticklabels=True,
+            ticks='outside',
+            ticklen=5,
+            minor_ticks="inside",
+            showline=True,
+            linewidth=2,
+            linecolor='black',
+            showgrid=False,
+            gridwidth=1,
+            gridcolor='lightgrey',
+            mirror=True,
+            hoverformat=".3f"  # Sets hover value format for y-axis to two decimal places
+        ),
+        legend=dict(
+            yanchor="top",  # Align the bottom of the legend box
+            y=0.1,               # Position the legend at the bottom inside the plot
+            xanchor="right",    # Align the right edge of the legend box
+            x=1,               # Position the legend at the right inside the plot
+            font= dict(size=12),  # Adjust font size
+            bgcolor="rgba(255, 255, 255, 0.7)",  # Optional: Semi-transparent white background
+            bordercolor="black",                 # Optional: Border color
+            borderwidth=1                        # Optional: Border width
+        ),
+        margin=dict( r=40, t=40),
+    )
+
+    return mohr_fig
+
+
+def add_envelope_fit(mohr_fig, fit, name, color):
+    """Draw a fitted envelope (``mohr_coulomb.EnvelopeFit``) with its bootstrap band onto the Mohr-Coulomb figure."""
+    mohr_fig.add_trace(go.Scatter(
+        x=np.concatenate([fit.sigma, fit.sigma[::-1]]),
+        y=np.concatenate([fit.upper, fit.lower[::-1]]),
+        fill='toself',
+        fillcolor=color,
+        opacity=0.25,
+        line=dict(width=0),
+        hoverinfo='skip',
+        showlegend=False
+    ))
+    mohr_fig.add_trace(go.Scatter(
+        x=fit.sigma,
+        y=fit.cohesion + fit.sigma * np.tan(np.radians(fit.friction_angle)),
+        mode='lines',
+        line=dict(color=color, width=2, dash='dash'),
+        name=f'{name}: c = {fit.cohesion:.1f} kPa, φ = {fit.friction_angle:.1f}°'
+    ))
+
+    # Keep the band inside the visible range
+    top = np.nanmax(fit.upper[fit.sigma <= mohr_fig.layout.xaxis.range[1]], initial=0)
+    mohr_fig.update_yaxes(range=[0, max(mohr_fig.layout.yaxis.range[1], top * 1.05)])
+    return mohr_fig
+
+
+def add_envelope_distribution(mohr_fig, distribution, normal_stresses):
+    """Draw Monte Carlo percentile bands (``mohr_coulomb.EnvelopeDistribution``) onto the Mohr-Coulomb figure.
+
+    The outer percentiles shade the envelope, the middle one is drawn dotted
+    and the peak strength at ``normal_stresses`` gets error bars.
+    """
+    sigma, bands = distribution.sigma, distribution.bands
+    lower, middle, upper = bands[0], bands[len(bands) // 2], bands[-1]
+    low_pct, mid_pct, high_pct = distribution.percentiles[[0, len(bands) // 2, -1]]
+    mohr_fig.add_trace(go.Scatter(
+        x=np.concatenate([sigma, sigma[::-1]]),
+        y=np.concatenate([upper, lower[::-1]]),
+        fill='toself',
+        fillcolor='grey',
+        opacity=0.3,
+        line=dict(width=0),
+        name=f'P{low_pct:g}–P{high_pct:g} envelope',
+        hoverinfo='skip'
+    ))
+    mohr_fig.add_trace(go.Scatter(
+        x=sigma,
+        y=middle,
+        mode='lines',
+        line=dict(color='dimgrey', width=2, dash='dot'),
+        name=f'P{mid_pct:g} envelope'
+    ))
+
+    # Peak strength at the selected normal stresses with its percentile range
+    peak_middle = np.interp(normal_stresses, sigma, middle)
+    mohr_fig.add_trace(go.Scatter(
+        x=normal_stresses,
+        y=peak_middle,
+        mode='markers',
+        marker=dict(color='dimgrey', size=8, symbol='diamond'),
+        error_y=dict(
+            type='data', symmetric=False,
+            array=np.interp(normal_stresses, sigma, upper) - peak_middle,
+            arrayminus=peak_middle - np.interp(normal_stresses, sigma, lower),
+        ),
+        name='Peak strength',
+        showlegend=False
+    ))
+
+    top = np.nanmax(upper[sigma <= mohr_fig.layout.xaxis.range[1]], initial=0)
+    mohr_fig.update_yaxes(range=[0, max(mohr_fig.layout.yaxis.range[1], top * 1.05)])
+    return mohr_fig
+
+
+def shear_box_figure(displacement):
+    """Shear box with the lower half moved right by ``displacement``."""
+    shear_box_fig = go.Figure()
+
+    
+
+    # Original position of the lower box (dashed border)
+    shear_box_fig.add_trace(go.Scatter(
+        x=[0+displacement, 0, 0, displacement],
+        y=[0, 0, 10, 10],
+        mode='lines',
+        line=dict(color='black', width=1, dash='dash'),
+        hoverinfo='none'
+    ))
+
+
+    # Lower shear box (moves right with shear displacement)
+    shear_box_fig.add_shape(
+        type="rect",
+        x0=10+displacement, y0=2, x1=90+displacement, y1=10,
+        fillcolor="rgb(236,204,162)",
+        line=dict(color="rgba(0,0,0,0)"),  # Make the border transparent
+        
+    )
+
+    # Upper shear box (fixed position)
+    shear_box_fig.add_shape(
+        type="rect",
+        x0=10, y0=10, x1=90, y1=18,
+        fillcolor="rgb(236,204,162)",
+        line=dict(color="rgba(0,0,0,0)"),  # Make the border transparent
+        
+    )
+
+    # Add the shear box outline left_upp
+    shear_box_fig.add_trace(go.Scatter(
+        x=[0, 10, 10, 0, 0],
+        y=[10.2, 10.2, 20, 20, 10.2],
+        mode='lines',
+        line=dict(color='black', width=1),  # Border color and width
+        fill='toself',  # Fill the enclosed area
+        fillpattern=dict(
+            shape="/",  # Pattern shape ('/', '\', '|', '-', '+', 'x', etc.)
+            bgcolor='white',  # Background color of the pattern
+            fgcolor='black',  # Foreground color of the pattern
+            size=5,  # Pattern size
+            solidity=0.5  # Pattern transparency
+        ),
+        hoverinfo='none'
+    ))
+
+    # Add the shear box outline left_down
+    shear_box_fig.add_trace(go.Scatter(
+        x=[0+displacement, 10+displacement, 10+displacement, 0+displacement, 0+displacement],
+        y=[0, 0, 9.8, 9.8, 0],
+        mode='lines',
+        line=dict(color='black', width=1),  # Border color and width
+        fill='toself',  # Fill the enclosed area
+        fillpattern=dict(
+            shape="/",  # Pattern shape ('/', '\', '|', '-', '+', 'x', etc.)
+            bgcolor='white',  # Background color of the pattern
+            fgcolor='black',  # Foreground color of the pattern
+            size=5,  # Pattern size
+            solidity=0.5  # Pattern transparency
+        ),
+        hoverinfo='none'
+    ))
+
+    # Add the shear box outline right
+    shear_box_fig.add_trace(go.Scatter
+    (
+        x=[100, 90, 90, 100, 100],
+        y=[10.2, 10.2, 20, 20, 10.2],
+        mode='lines',
+        line=dict(color='black', width=1),
+        fill='toself',
+        fillpattern=dict(
+            shape="/",
+            bgcolor='white',
+            fgcolor='black',
+            size=5,
+            solidity=0.5
+        ),
+        hoverinfo='none'
+    ))
+
+    # Add the shear box outline right
+    shear_box_fig.add_trace(go.Scatter
+    (
+        x=[100+displacement, 90+displacement, 90+displacement, 100+displacement, 100+displacement],
+        y=[0, 0, 9.8, 9.8, 0],
+        mode='lines',
+        line=dict(color='black', width=1),
+        fill='toself',
+        fillpattern=dict(
+            shape="/",
+            bgcolor='white',
+            fgcolor='black',
+            size=5,
+            solidity=0.5
+        ),
+        hoverinfo='none'
+    ))
+
+    # Add prous stone down
+    shear_box_fig.add_trace(go.Scatter
+    (
+        x=[10+displacement, 90+displacement, 90+displacement, 10+displacement, 10+displacement],
+        y=[0, 0, 2, 2, 0],
+        mode='lines',
+        line=dict(color='black', width=1),
+        fill='toself',
+        fillpattern=dict(
+            shape=".",
+            bgcolor='lightgray',
+            fgcolor='black',
+            size=5,
+            solidity=0.5
+        ),
+        hoverinfo='none'
+    ))
+
+    # Add prous stone upp
+    shear_box_fig.add_trace(go.Scatter
+    (
+        x=[10, 90, 90, 10, 10],
+        y=[18, 18, 20, 20, 18],
+        mode='lines',
+        line=dict(color='black', width=1),
+        fill='toself',
+        fillpattern=dict(
+            shape=".",
+            bgcolor='lightgray',
+            fgcolor='black',
+            size=5,
+            solidity=0.5
+        ),
+        hoverinfo='none'
+    ))
+
+    # Adding shape top blatten
+    shear_box_fig.add_trace(go.Scatter(
+        x=[10, 90, 80, 20, 10],
+        y=[20, 20, 23, 23, 20],
+        mode='lines',
+        line=dict(color='black', width=1),  # Border color and width
+        fill='toself',  # Fill the enclosed area
+        fillcolor='black',  # Solid black fill
+        name='Shear Box'
+    ))
+
+    # Adding the circle at the top
+    shear_box_fig.add_shape(
+        type="circle",
+        xref="x", yref="y",  # Use the same coordinate system as the Scatter trace
+        x0=46, y0=22.5,  # Bottom-left corner of the bounding box
+        x1=54, y1=23.5,  # Top-right corner of the bounding box
+        line=dict(color="white", width=2),  # Circle border (white)
+        fillcolor="black"  # Circle fill (black)
+    )
+
+
+
+    # Add an arrow showing the horizontal shear force
+    shear_box_fig.add_annotation(
+        x=0 + displacement,  y=5,
+        ax=-40 + displacement, ay=5,
+        xref="x", yref="y",
+        axref="x", ayref="y",
+        showarrow=True,
+        arrowhead=2,
+        arrowsize=1.5,
+        arrowwidth=3,
+        arrowcolor="red",
+        text="Shear force",
+        font=dict(family="Arial, sans-serif", size=16, color="red", weight="bold"),
+    )
+
+    # Add an arrow showing the normal stress (downward arrow)
+    shear_box_fig.add_annotation(
+        x=50 , y=23.5,
+        ax=50 , ay=30,
+        xref="x", yref="y",
+        axref="x", ayref="y",
+        showarrow=True,
+        arrowhead=2,
+        arrowsize=1.5,
+        arrowwidth=3,
+        arrowcolor="blue",
+        text="Normal force",
+        font=dict(family="Arial, sans-serif", size=16, color="blue", weight="bold"),
+        valign="top"
+    )
+
+    # Update the layout of the figure
+    shear_box_fig.update_layout(
+        title='Shear Box Animation:',
+        font=dict(family="Arial, sans-serif", size=14, color="black", weight="bold", style="italic"),
+        plot_bgcolor='white',
+        xaxis=dict(
+            range=[-50, 150], 
+            showticklabels=False,
+            showgrid=False,
+            title=None, 
+            zeroline=False,
+            fixedrange=True
+            ),
+        yaxis=dict(
+            range=[-5, 30],
+            showticklabels=False,
+            showline = False,
+            showgrid=False, 
+            title=None,
+            zeroline=False,
+            fixedrange=True
+            ),
+        showlegend=False,
+        margin=dict(l=40, r=40, t=40, b=40)
+    )
+
+    return shear_box_fig
+
+
+def style_stress_strain(stress_strain_fig):
+    # Update the layout of the stress-strain graph
+    stress_strain_fig.update_layout(
+        plot_bgcolor='white',
+        xaxis_title='Horizantal displacement (Shear strain)',     # Set the title for the x-axis
+        yaxis_title='Shear stress',
+        font=dict(family="Times New Roman, Arial, sans-serif", size=12, color="black", weight="bold"),
+        xaxis=dict(
+            range=[0, 1],  # Set the range for the x-axis
+            mirror=True,           # Mirror the axes on all sides
+            showline=True,         # Show the axes line
+            linewidth=2,           # Set the width of the axes line
+            linecolor = 'black',
+            gridcolor='white',  # Set the gridline color
+            showticklabels=False,
+            zerolinecolor='black',  # Set zero line color
+            fixedrange=True
+        ),
+        yaxis=dict(
+            range=[0, 3.8],  # Set the range for the y-axis
+            mirror=True,           # Mirror the axes on all sides
+            showline=True,         # Show the axes line
+            linewidth=2,           # Set the width of the axes line
+            linecolor = 'black',
+            showgrid=False,
+            showticklabels=False,
+            gridcolor='white',
+            fixedrange=True
+        ),
+        margin=dict(l=40, r=40, t=40, b=40)
+    )
+
+
+def style_height_change(height_change_fig):
+    # Update the layout of the height-change graph
+    height_change_fig.update_layout(
+        plot_bgcolor='white',
+        xaxis_title='Horizontal displacement (Shear strain)',
+        yaxis_title='Change in height (Volumetric strain)',
+        font=dict(family="Times New Roman, Arial, sans-serif", size=10, color="black", weight="bold"),
+        xaxis=dict(
+            range=[0, 1],  # Set the range for the x-axis
+            mirror=True,  # Mirror the axes on all sides
+            showline=True,  # Show the axes line
+            linewidth=2,  # Set the width of the axes line
+            linecolor='black',
+            gridcolor='white',  # Set the gridline color
+            showticklabels=False,
+            zeroline=True,
+            zerolinecolor='black',  # Set zero line color for the vertical zeroline
+            fixedrange=True
+        ),
+        yaxis=dict(
+            range=[-3, 3],  # Set the range for the y-axis
+            mirror=True,  # Mirror the axes on all sides
+            showline=True,  # Show the axes line
+            linewidth=2,  # Set the width of the axes line
+            linecolor='black',
+            showgrid=False,
+            zeroline=True,  # Ensure the horizontal zero line is shown
+            zerolinecolor='black',  # Set a visible color for the horizontal zero line
+            zerolinewidth=2,  # Adjust the thickness of the horizontal zero line
+            showticklabels=False,
+            gridcolor='white',
+            fixedrange=True
+        ),
+        margin=dict(l=40, r=40, t=40)
+    )
+
+
+@lru_cache(maxsize=None)
+def shear_box_template():
+    """Shear box at zero displacement plus the parts that follow the lower half.
+
+    The moving parts are found by comparing the box at two displacements, so
+    ``shear_box_figure`` stays the single description of the geometry. The
+    result is built once and shared; treat it as read-only.
+    """
+    base = shear_box_figure(0).to_plotly_json()
+    shifted = shear_box_figure(1).to_plotly_json()
+    moving_traces = {}
+    for i, (trace, moved) in enumerate(zip(base['data'], shifted['data'])):
+        mask = np.asarray(moved['x']) != np.asarray(trace['x'])
+        if mask.any():
+            moving_traces[i] = mask.tolist()
+    moving_shapes = [
+        i for i, (shape, moved) in enumerate(zip(base['layout']['shapes'], shifted['layout']['shapes']))
+        if shape['x0'] != moved['x0']
+    ]
+    moving_annotations = [
+        i for i, (annotation, moved) in enumerate(zip(base['layout']['annotations'], shifted['layout']['annotations']))
+        if annotation['x'] != moved['x']
+    ]
+    return {
+        'figure': base,
+        'moving': {'traces': moving_traces, 'shapes': moving_shapes, 'annotations': moving_annotations},
+    }
+
+
+@lru_cache(maxsize=None)
+def shear_box_frame(displacement):
+    """Coordinates of the moving shear box parts at ``displacement``."""
+    template = shear_box_template()
+    figure, moving = template['figure'], template['moving']
+    return {
+        'traces': {
+            i: [x + displacement if moves else x for x, moves in zip(figure['data'][i]['x'], mask)]
+            for i, mask in moving['traces'].items()
+        },
+        'shapes': {
+            i: (figure['layout']['shapes'][i]['x0'] + displacement, figure['layout']['shapes'][i]['x1'] + displacement)
+            for i in moving['shapes']
+        },
+        'annotations': {
+            i: (figure['layout']['annotations'][i]['x'] + displacement,
+                figure['layout']['annotations'][i]['ax'] + displacement)
+            for i in moving['annotations']
+        },
+    }
+
+
+def translate_shear_box(shear_box_fig, displacement):
+    """Move the lower half of a shear box figure dict (or a dash ``Patch`` of one) to ``displacement``."""
+    frame = shear_box_frame(displacement)
+    for i, x in frame['traces'].items():
+        shear_box_fig['data'][i]['x'] = x
+    for i, (x0, x1) in frame['shapes'].items():
+        shear_box_fig['layout']['shapes'][i]['x0'] = x0
+        shear_box_fig['layout']['shapes'][i]['x1'] = x1
+    for i, (x, ax) in frame['annotations'].items():
+        shear_box_fig['layout']['annotations'][i]['x'] = x
+        shear_box_fig['layout']['annotations'][i]['ax'] = ax
+    return shear_box_fig
+
+
+def playback_templates(strain, box_displacement):
+    """Static data the browser needs to draw any animation frame on its own."""
+    stress_strain_fig = go.Figure()
+    style_stress_strain(stress_strain_fig)
+    height_change_fig = go.Figure()
+    style_height_change(height_change_fig)
+    return {
+        'strain': np.asarray(strain).tolist(),
+        'box_displacement': np.asarray(box_displacement).tolist(),
+        'max_steps': len(strain),
+        'stress_strain': stress_strain_fig.to_plotly_json()['layout'],
+        'height_change': height_change_fig.to_plotly_json()['layout'],
+        'shear_box': shear_box_template(),
+    }
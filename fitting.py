@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from shear_model import FITTED_MODELS_DIR, MODELS, SOIL_TYPES
+
+# Fitted parameters per specimen (dict of arrays), final cost, iterations used and convergence flags
+FitResult = namedtuple('FitResult', ['params', 'cost', 'iterations', 'converged'])
+
+
+def pad_curves(curves):
+    """Stack curves of different lengths into padded arrays with a weight mask.
+
+    ``curves`` is a list of ``(strain, shear_stress, height_change)``. Short
+    curves repeat their last point; the padding gets zero weight.
+    """
+    length = max(len(strain) for strain, _, _ in curves)
+    strain = np.empty((len(curves), length))
+    shear_stress = np.empty_like(strain)
+    height_change = np.empty_like(strain)
+    weights = np.zeros_like(strain)
+    for k, (x, tau, dh) in enumerate(curves):
+        n = len(x)
+        strain[k] = np.concatenate([x, np.repeat(x[-1:], length - n)])
+        shear_stress[k] = np.concatenate([tau, np.repeat(tau[-1:], length - n)])
+        height_change[k] = np.concatenate([dh, np.repeat(dh[-1:], length - n)])
+        weights[k, :n] = 1
+    return strain, shear_stress, height_change, weights
+
+
+def _residuals(kind, names, values, base, normal_stress, strain, shear_stress, height_change, weights):
+    # values: (..., n_specimens, n_free) -> residuals (..., n_specimens, 2 * n_points)
+    params = dict(base)
+    for k, name in enumerate(names):
+        params[name] = values[..., k:k + 1]
+    with np.errstate(all='ignore'):
+        # Outputs that do not depend on a free parameter lack its batch axis
+        model_stress, model_height = np.broadcast_arrays(*MODELS[kind].function(normal_stress, strain, params))
+    return np.concatenate([(model_stress - shear_stress) * weights, (model_height - height_change) * weights], axis=-1)
+
+
+def _jacobian(kind, names, values, residuals, base, *data):
+    # Forward differences for all parameters and specimens in one evaluation: (n_specimens, n_residuals, n_free)
+    steps = 1e-6 * np.maximum(np.abs(values), 1e-3)
+    eye = np.eye(len(names))
+    perturbed = values[None] + eye[:, None, :] * steps[None]
+    jacobian = (_residuals(kind, names, perturbed, base, *data) - residuals[None]) / steps.T[:, :, None]
+    return np.nan_to_num(np.moveaxis(jacobian, 0, -1))
+
+
+def _identifiable(kind, base, data):
+    # Parameters with a non-zero Jacobian column for some specimen, less those that move the branch switch
+    names = list(base)
+    values = np.tile([base[name] for name in names], (data[0].shape[0], 1)).astype(float)
+    jacobian = _jacobian(kind, names, values, _residuals(kind, names, values, base, *data), base, *data)
+    free = [name for name, column in zip(names, np.abs(jacobian).max(axis=(0, 1))) if column > 0]
+    switch = MODELS[kind].switch
+    if switch is not None:
+        start = switch(data[0], base)
+        free = [name for name in free
+                if np.array_equal(switch(data[0], {**base, name: base[name] * 1.001 + 1e-3}), start)]
+    return free
+
+
+def fit_specimens(kind, strain, shear_stress, height_change, normal_stress=100, weights=None, free=None,
+                  max_iterations=100, tolerance=1e-10, gradient_tolerance=1e-4):
+    """Levenberg-Marquardt fit of the ``kind`` model to many specimens at once.
+
+    ``strain``, ``shear_stress``, ``height_change`` (and ``weights``) are
+    ``(n_specimens, n_points)`` arrays, e.g. from ``pad_curves``. All
+    specimens iterate in lockstep: residuals and the finite-difference
+    Jacobian of every specimen come from one broadcast model evaluation, and
+    the damped normal equations are solved as one batch.
+
+    ``free`` defaults to the parameters the data can identify: those whose
+    Jacobian column is non-zero for some specimen at the start values and
+    that leave the model's branch switch in place. This leaves out constants
+    of branches no test reaches (``rise_rate_high`` at 100 kPa) and the
+    strain of the switch (``switch_factor``), across which the curves jump
+    and finite differences give zero or spikes. A specimen converges when an accepted step
+    lowers its cost by less than ``tolerance`` (relative), or when the
+    residuals are orthogonal to every Jacobian column to within
+    ``gradient_tolerance`` (the cosine of their angle), as in MINPACK.
+    """
+    strain = np.atleast_2d(np.asarray(strain, dtype=float))
+    shear_stress = np.atleast_2d(np.asarray(shear_stress, dtype=float))
+    height_change = np.atleast_2d(np.asarray(height_change, dtype=float))
+    weights = np.ones_like(strain) if weights is None else np.atleast_2d(np.asarray(weights, dtype=float))
+    n_specimens = strain.shape[0]
+    normal_stress = np.broadcast_to(np.asarray(normal_stress, dtype=float), (n_specimens,)).reshape(-1, 1)
+    base = MODELS[kind].params
+    data = (normal_stress, strain, shear_stress, height_change, weights)
+    names = list(_identifiable(kind, base, data) if free is None else free)
+
+    values = np.tile([base[name] for name in names], (n_specimens, 1)).astype(float)
+    residuals = _residuals(kind, names, values, base, *data)
+    cost = np.nansum(residuals ** 2, axis=-1)
+    damping = np.full(n_specimens, 1e-3)
+    converged = np.zeros(n_specimens, dtype=bool)
+    eye = np.eye(len(names))
+
+    for iteration in range(1, max_iterations + 1):
+        jacobian = _jacobian(kind, names, values, residuals, base, *data)
+        jtj = np.einsum('srp,srq->spq', jacobian, jacobian)
+        gradient = np.einsum('srp,sr->sp', jacobian, np.nan_to_num(residuals))
+
+        # Scaled gradient: cosine between the residuals and each Jacobian column
+        norms = np.sqrt(np.diagonal(jtj, axis1=1, axis2=2)) * np.linalg.norm(np.nan_to_num(residuals), axis=-1)[:, None]
+        cosine = np.abs(gradient) / np.maximum(norms, 1e-300)
+        converged |= cosine.max(axis=-1) < gradient_tolerance
+        scale = np.diagonal(jtj, axis1=1, axis2=2) + 1e-12
+        system = jtj + damping[:, None, None] * eye * scale[:, None, :]
+        delta = -np.linalg.solve(system, gradient[..., None])[..., 0]
+
+        trial = values + np.where(converged[:, None], 0, delta)
+        trial_residuals = _residuals(kind, names, trial, base, *data)
+        trial_cost = np.sum(trial_residuals ** 2, axis=-1)
+        improved = np.isfinite(trial_cost) & (trial_cost < cost) & ~converged
+
+        gain = np.where(improved, (cost - trial_cost) / np.maximum(cost, 1e-300), 0)
+        values = np.where(improved[:, None], trial, values)
+        residuals = np.where(improved[:, None], trial_residuals, residuals)
+        cost = np.where(improved, trial_cost, cost)
+        damping = np.where(improved, damping / 10, damping * 10)
+        converged |= (improved & (gain < tolerance)) | (damping > 1e12)
+        if converged.all():
+            break
+
+    params = {name: values[:, k] for k, name in enumerate(names)}
+    return FitResult(params, cost, iteration, converged)
+
+
+def _fit_task(task):
+    return fit_specimens(*task[:5], **task[5])
+
+
+def fit_many(kind, curves, normal_stresses=100, workers=None, chunk_size=64, **options):
+    """Fit ``curves`` (list of ``(strain, shear_stress, height_change)``) across a process pool.
+
+    Specimens are padded to a common length, split into chunks of
+    ``chunk_size`` and each chunk is fitted as one batch by ``fit_specimens``.
+    ``workers=1`` runs in-process.
+    """
+    strain, shear_stress, height_change, weights = pad_curves(curves)
+    normal_stresses = np.broadcast_to(np.asarray(normal_stresses, dtype=float), (len(curves),))
+    tasks = []
+    for start in range(0, len(curves), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        tasks.append((kind, strain[chunk], shear_stress[chunk], height_change[chunk], normal_stresses[chunk],
+                      dict(options, weights=weights[chunk])))
+    if workers == 1 or len(tasks) == 1:
+        parts = [_fit_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(_fit_task, tasks))
+
+    return FitResult(
+        {name: np.concatenate([part.params[name] for part in parts]) for name in parts[0].params},
+        np.concatenate([part.cost for part in parts]),
+        max(part.iterations for part in parts),
+        np.concatenate([part.converged for part in parts]),
+    )
+
+
+def save_model(directory, name, kind, params, label=None):
+    """Write one fitted parameter set as a JSON model file the app can load."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}.json')
+    with open(path, 'w') as f:
+        json.dump({'name': name, 'kind': kind, 'label': label or name,
+                   'params': {key: float(value) for key, value in params.items()}}, f, indent=2)
+    return path
+
+
+def main(argv=None):
+    from experimental import DATA_FILE, load_dataset
+
+    parser = argparse.ArgumentParser(description='Fit model parameters to measured shear tests.')
+    parser.add_argument('--data', default=DATA_FILE, help='semicolon-separated export file')
+    parser.add_argument('--soil', nargs='+', default=list(SOIL_TYPES), choices=SOIL_TYPES)
+    parser.add_argument('--normal-stress', type=float, default=100, help='normal stress of the tests in kPa')
+    parser.add_argument('--name', default='fitted', help='model name prefix')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('-o', '--output', default=FITTED_MODELS_DIR, help='directory for the model files')
+    args = parser.parse_args(argv)
+
+    dataset = load_dataset(args.data)
+    for kind in args.soil:
+        curves = [tuple(np.asarray(array) for array in curve) for curve in dataset.curves(kind)]
+        if not curves:
+            continue
+        result = fit_many(kind, curves, args.normal_stress, workers=args.workers)
+        for k in range(len(curves)):
+            name = f'{args.name}-{kind}' + (f'-{k + 1}' if len(curves) > 1 else '')
+            params = {key: value[k] for key, value in result.params.items()}
+            path = save_model(args.output, name, kind, params, label=f'{name} (fitted)')
+            print(f'{path}: cost {result.cost[k]:.4g}, converged {bool(result.converged[k])}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+# gunicorn settings, read from the working directory (e.g. `gunicorn direct_shear:server`)
+import os
+
+# Import the app once in the master: curve tables and datasets are built there and shared by all workers
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
@@ -0,0 +1,328 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmark import callback_payload
+
+# Component properties a session starts from, read from the served layout
+LAYOUT_PROPS = ('value', 'data', 'n_clicks', 'n_intervals')
+# Seconds to wait for the workers to answer after starting the server
+STARTUP_TIMEOUT = 120
+# Seconds between memory samples of the workers
+MEMORY_INTERVAL = 0.5
+
+
+def layout_values(layout, values=None):
+    """Initial ``{'id.property': value}`` of every component with an id in a ``/_dash-layout`` tree."""
+    values = {} if values is None else values
+    if isinstance(layout, list):
+        for child in layout:
+            layout_values(child, values)
+    elif isinstance(layout, dict):
+        props = layout.get('props', {})
+        if 'id' in props:
+            values.update({f'{props["id"]}.{prop}': props[prop] for prop in LAYOUT_PROPS if prop in props})
+        layout_values(props.get('children'), values)
+    return values
+
+
+def worker_pids(master_pid):
+    """Process ids of the children of ``master_pid`` (the gunicorn workers), from ``/proc``."""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', encoding='ascii') as f:
+                # The parent pid follows the parenthesised command name, which may contain spaces
+                parent = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def process_memory(pid):
+    """Resident (``rss``) and proportional (``pss``, shared pages split between processes) memory in MB."""
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', encoding='ascii') as f:
+            for line in f:
+                field, _, value = line.partition(':')
+                if field in ('Rss', 'Pss'):
+                    memory[field.lower() + '_mb'] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return memory
+
+
+class MemoryMonitor(threading.Thread):
+    """Samples the memory of a server's workers until stopped, keeping the first and the peak values."""
+
+    def __init__(self, master_pid, interval=MEMORY_INTERVAL):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.workers = {}
+        self.stopped = threading.Event()
+
+    def sample(self):
+        for pid in worker_pids(self.master_pid):
+            memory = process_memory(pid)
+            if not memory:
+                continue
+            worker = self.workers.setdefault(pid, {'start': memory, 'peak': dict(memory)})
+            for key, value in memory.items():
+                worker['peak'][key] = max(worker['peak'].get(key, 0), value)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def report(self):
+        return [{'pid': pid, **{f'{key}_start': value for key, value in worker['start'].items()},
+                 **{f'{key}_peak': value for key, value in worker['peak'].items()}}
+                for pid, worker in sorted(self.workers.items())]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, threads, port, mode):
+    """Run ``direct_shear:server`` under gunicorn and wait until it serves the layout."""
+    env = dict(os.environ, DIRECT_SHEAR_PLAYBACK=mode)
+    command = [sys.executable, '-m', 'gunicorn', 'direct_shear:server', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {process.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/_dash-layout')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'gunicorn did not answer within {STARTUP_TIMEOUT} s')
+
+
+class Session(threading.Thread):
+    """One browser tab: loads the page, then repeatedly presses Start, plays the animation,
+    resets it and moves a slider, posting the server callbacks each of these triggers.
+
+    Store values returned by the server (e.g. the drawn step) are fed back
+    into later requests as the browser would. Requests of one trigger are
+    sent one after another, so a session has at most one request in flight.
+    """
+
+    def __init__(self, address, start_barrier, duration, tick_rate, seed):
+        super().__init__(daemon=True)
+        self.address = address
+        self.start_barrier = start_barrier
+        self.duration = duration
+        self.end_time = None
+        self.tick_rate = tick_rate
+        self.random = random.Random(seed)
+        self.connection = None
+        self.records = []
+        self.ticks = 0
+
+    def request(self, action, method, path, body=None):
+        # One timed request on the session's keep-alive connection; returns the parsed JSON or None
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        start = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(*self.address, timeout=30)
+            self.connection.request(method, path, body=data, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+            ok = 200 <= response.status < 300
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection, content, ok = None, b'', False
+        self.records.append((action, time.perf_counter() - start, len(content), ok))
+        if ok and content and response.getheader('Content-Type', '').startswith('application/json'):
+            return json.loads(content)
+        return None
+
+    def post(self, action, dependency, prop=None):
+        # Call a server callback with the session's current values, keeping the returned ones it tracks
+        result = self.request(action, 'POST', '/_dash-update-component',
+                              callback_payload(dependency, self.values, prop, self.values))
+        for component, props in ((result or {}).get('response') or {}).items():
+            self.values.update({f'{component}.{name}': props[name] for name in props
+                                if f'{component}.{name}' in self.tracked})
+
+    def trigger(self, action, prop, value):
+        # Set a component property and post every server callback it fires
+        self.values[prop] = value
+        for dependency in self.callbacks.get(prop, []):
+            self.post(action, dependency, prop)
+
+    def load(self):
+        self.request('load', 'GET', '/')
+        self.values = layout_values(self.request('load', 'GET', '/_dash-layout'))
+        dependencies = [item for item in self.request('load', 'GET', '/_dash-dependencies') or []
+                        if not item.get('clientside_function')]
+        self.callbacks, self.tracked = {}, set()
+        for dependency in dependencies:
+            for item in dependency['inputs'] + dependency['state']:
+                self.tracked.add(f'{item["id"]}.{item["property"]}')
+            for item in dependency['inputs']:
+                self.callbacks.setdefault(f'{item["id"]}.{item["property"]}', []).append(dependency)
+        # Initial calls of the server callbacks, as on page load
+        for dependency in dependencies:
+            if not dependency.get('prevent_initial_call'):
+                self.post('load', dependency)
+
+    def play(self):
+        # Start, then one tick per interval until the last step or the end of the test
+        last = self.values.get('figure-templates.data', {}).get('max_steps', 81) - 1
+        self.trigger('start', 'animation-state.data', {'running': True, 'step': 1})
+        next_tick = time.monotonic()
+        for step in range(2, last + 1):
+            next_tick += 1 / self.tick_rate
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Behind schedule: the next interval fires right away, without catching up
+                next_tick = time.monotonic()
+            if next_tick >= self.end_time:
+                return
+            self.trigger('tick', 'animation-state.data', {'running': step < last, 'step': step})
+            self.ticks += 1
+
+    def run(self):
+        try:
+            self.load()
+        finally:
+            # Every session presses Start at the same moment
+            self.start_barrier.wait()
+        self.end_time = time.monotonic() + self.duration
+        while time.monotonic() < self.end_time:
+            self.play()
+            if time.monotonic() >= self.end_time:
+                break
+            self.trigger('reset', 'animation-state.data', {'running': False, 'step': 0})
+            slider = self.random.choice(['normal-stress-1.value', 'normal-stress-2.value', 'normal-stress-3.value'])
+            self.trigger('slider', slider, self.random.randrange(10, 301, 10))
+        if self.connection is not None:
+            self.connection.close()
+
+
+def latency_summary(records):
+    """Request count, error rate, bytes and latency percentiles (ms) of ``(action, seconds, bytes, ok)`` records."""
+    latencies = np.array([seconds for _, seconds, _, _ in records]) * 1000
+    errors = sum(not ok for _, _, _, ok in records)
+    return {
+        'requests': len(records),
+        'errors': errors,
+        'error_rate': errors / len(records) if records else 0.0,
+        'bytes_mean': float(np.mean([size for _, _, size, _ in records])) if records else 0.0,
+        **{f'latency_ms_p{q}': float(np.percentile(latencies, q)) if records else float('nan')
+           for q in (50, 95, 99)},
+        'latency_ms_max': float(latencies.max()) if records else float('nan'),
+    }
+
+
+def run_load(address, sessions, duration, tick_rate, seed=0):
+    """Run ``sessions`` concurrent sessions against ``address`` for ``duration`` seconds after Start."""
+    barrier = threading.Barrier(sessions + 1)
+    runners = [Session(address, barrier, duration, tick_rate, seed + k) for k in range(sessions)]
+    for session in runners:
+        session.start()
+    barrier.wait()
+    start = time.monotonic()
+    for session in runners:
+        session.join()
+    elapsed = time.monotonic() - start
+
+    records = [record for session in runners for record in session.records]
+    loaded = [record for record in records if record[0] != 'load']
+    actions = sorted({action for action, _, _, _ in records})
+    return {
+        'sessions': sessions, 'duration_s': elapsed, 'tick_rate': tick_rate,
+        'throughput_rps': len(loaded) / elapsed,
+        'ticks_per_s': sum(session.ticks for session in runners) / elapsed,
+        'target_ticks_per_s': sessions * tick_rate,
+        'overall': latency_summary(loaded),
+        'actions': {action: latency_summary([record for record in records if record[0] == action])
+                    for action in actions},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Load-test the app with concurrent sessions, by default under a local gunicorn.')
+    parser.add_argument('--sessions', type=int, default=200, help='concurrent sessions (browser tabs)')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run after everyone presses Start')
+    parser.add_argument('--tick-rate', type=float, default=10, help='animation ticks per second and session')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--mode', default='server', choices=('server', 'client'), help='playback mode to serve')
+    parser.add_argument('--url', help='test a running server instead of starting gunicorn (no memory figures)')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the sessions\' slider moves')
+    parser.add_argument('-o', '--output', help='JSON file for the results')
+    args = parser.parse_args(argv)
+
+    process = monitor = None
+    if args.url:
+        parts = urlsplit(args.url)
+        address = (parts.hostname, parts.port or 80)
+    else:
+        address = ('127.0.0.1', free_port())
+        process = start_server(args.workers, args.threads, address[1], args.mode)
+        monitor = MemoryMonitor(process.pid)
+        monitor.sample()
+        monitor.start()
+    try:
+        result = run_load(address, args.sessions, args.duration, args.tick_rate, args.seed)
+    finally:
+        if monitor is not None:
+            monitor.stopped.set()
+            monitor.sample()
+        if process is not None:
+            process.terminate()
+            process.wait()
+    result.update(workers=args.workers if process else None, threads=args.threads if process else None,
+                  mode=args.mode if process else None, memory=monitor.report() if monitor else [])
+
+    overall = result['overall']
+    print(f'{args.sessions} sessions, {result["duration_s"]:.1f} s: {result["throughput_rps"]:.0f} requests/s, '
+          f'{result["ticks_per_s"]:.0f} of {result["target_ticks_per_s"]:.0f} ticks/s, '
+          f'errors {overall["errors"]} ({overall["error_rate"]:.2%})')
+    for action, summary in result['actions'].items():
+        print(f'  {action:6} {summary["requests"]:7d} requests  p50 {summary["latency_ms_p50"]:7.1f} ms  '
+              f'p95 {summary["latency_ms_p95"]:7.1f} ms  p99 {summary["latency_ms_p99"]:7.1f} ms  '
+              f'errors {summary["errors"]}')
+    for worker in result['memory']:
+        print(f'  worker {worker["pid"]}: rss {worker.get("rss_mb_start", 0):.0f} -> '
+              f'{worker.get("rss_mb_peak", 0):.0f} MB, pss {worker.get("pss_mb_start", 0):.0f} -> {worker.get("pss_mb_peak", 0):.0f} MB')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=1)
+    return 1 if overall['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import dash
+from dash.exceptions import MissingCallbackContextException
+import numpy as np
+from flask import Response, abort, current_app, g, has_request_context, request
+
+from array_cache import CACHE_DIR
+
+# Default of the app's METRICS setting: instrumentation is on unless DIRECT_SHEAR_METRICS=0
+METRICS_ENABLED = os.environ.get('DIRECT_SHEAR_METRICS', '1') != '0'
+# Observations kept per series for the rolling quantiles
+METRICS_WINDOW = int(os.environ.get('DIRECT_SHEAR_METRICS_WINDOW', 1024))
+QUANTILES = (0.5, 0.95, 0.99)
+# Per-process observation logs, merged across the workers of one server when /metrics is scraped
+METRICS_DIR = os.environ.get('DIRECT_SHEAR_METRICS_DIR', os.path.join(CACHE_DIR, 'metrics'))
+# Size at which a process rewrites its log as a snapshot of its summaries
+METRICS_LOG_BYTES = 256 * 2 ** 10
+# Client addresses allowed to scrape /metrics (comma-separated), by default only the machine itself
+METRICS_ALLOW = os.environ.get('DIRECT_SHEAR_METRICS_ALLOW', '127.0.0.1,::1')
+
+
+class RollingSummary:
+    """Count and sum of all observations plus the last ``window`` values for quantiles."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.values = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def quantiles(self, quantiles=QUANTILES):
+        if not self.values:
+            return [float('nan')] * len(quantiles)
+        return np.quantile(np.fromiter(self.values, dtype=float), quantiles).tolist()
+
+
+class Metrics:
+    """Rolling summaries by metric name and label set, rendered in the Prometheus text format.
+
+    Observing is a dict lookup and a deque append under a lock; quantiles
+    are only computed when ``/metrics`` is scraped. With a ``directory``,
+    each process also appends its observations to its own log there after
+    every request, and a scrape merges the logs of all live processes of
+    its ``group`` (by default those started by the same parent, i.e. the
+    gunicorn workers), whichever worker answers it. A log is rewritten as a snapshot of its process's summaries
+    once it grows past ``METRICS_LOG_BYTES``.
+    """
+
+    def __init__(self, window=METRICS_WINDOW, directory=METRICS_DIR, group=None):
+        self.window = window
+        self.directory = directory
+        self.group = group
+        self.series = {}
+        self.help = {}
+        self.pending = []
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self._check_process()
+            summary = self.series.get(key)
+            if summary is None:
+                summary = self.series[key] = RollingSummary(self.window)
+            summary.observe(value)
+            self.pending.append([name, key[1], value])
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def _check_process(self):
+        # Workers forked from a process that imported the app start with empty summaries of their own
+        if self.pid != os.getpid():
+            self.pid, self.series, self.pending = os.getpid(), {}, []
+
+    def _group(self):
+        # Processes whose logs are merged: by default those with the same parent, e.g. one gunicorn master
+        return os.getppid() if self.group is None else self.group
+
+    def _log_path(self):
+        return os.path.join(self.directory, f'{self._group()}-{os.getpid()}.jsonl')
+
+    def flush(self):
+        """Append the observations since the last flush to this process's log."""
+        if self.directory is None:
+            return
+        with self.lock:
+            self._check_process()
+            if not self.pending:
+                return
+            path = self._log_path()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if os.path.exists(path) and os.path.getsize(path) > METRICS_LOG_BYTES:
+                    # Compact: one line per series with its count, sum and window
+                    temporary = f'{path}.tmp'
+                    with open(temporary, 'w') as f:
+                        for (name, labels), summary in self.series.items():
+                            f.write(json.dumps([name, labels, None, summary.count, summary.total,
+                                                list(summary.values)]) + '\n')
+                    os.replace(temporary, path)
+                else:
+                    with open(path, 'a') as f:
+                        f.write(''.join(json.dumps(line) + '\n' for line in self.pending))
+                self.pending = []
+            except OSError:
+                # Unwritable directory: the process's own summaries are still served
+                self.pending = []
+                self.directory = None
+
+    def _read_logs(self):
+        # Summaries of every live process sharing this process's parent, rebuilt from their logs
+        series = {}
+        for path in glob.glob(os.path.join(glob.escape(self.directory), f'{self._group()}-*.jsonl')):
+            pid = int(os.path.basename(path)[:-len('.jsonl')].rsplit('-', 1)[1])
+            if not _alive(pid):
+                _remove(path)
+                continue
+            summaries = {}
+            try:
+                with open(path) as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for text in lines:
+                try:
+                    name, labels, value, *snapshot = json.loads(text)
+                except ValueError:
+                    # A line still being written
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                summary = summaries.setdefault(key, RollingSummary(self.window))
+                if value is None:
+                    summary.count, summary.total = snapshot[0], snapshot[1]
+                    summary.values.clear()
+                    summary.values.extend(snapshot[2])
+                else:
+                    summary.observe(value)
+            for key, summary in summaries.items():
+                series.setdefault(key, []).append(summary)
+        return series
+
+    def render(self):
+        self.flush()
+        with self.lock:
+            if self.directory is None:
+                series = {key: [summary] for key, summary in self.series.items()}
+            else:
+                series = self._read_logs()
+        snapshot = []
+        for (name, labels), summaries in sorted(series.items()):
+            merged = RollingSummary(self.window * len(summaries))
+            for summary in summaries:
+                merged.values.extend(summary.values)
+                merged.count += summary.count
+                merged.total += summary.total
+            snapshot.append((name, labels, merged.quantiles(), merged.total, merged.count))
+        lines, described = [], set()
+        for name, labels, quantiles, total, count in snapshot:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {self.help.get(name, name)}')
+                lines.append(f'# TYPE {name} summary')
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            for quantile, value in zip(QUANTILES, quantiles):
+                lines.append(f'{name}{{{label_text},quantile="{quantile}"}} {value:.6g}')
+            lines.append(f'{name}_sum{{{label_text}}} {total:.6g}')
+            lines.append(f'{name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+METRICS = Metrics()
+METRICS.describe('direct_shear_callback_seconds',
+                 'Time per callback phase; serialize covers Dash dispatch and JSON encoding')
+METRICS.describe('direct_shear_callback_bytes', 'Request and response body sizes per callback')
+
+
+def trigger_type(triggered_id):
+    """Kind of input that fired a callback: tick, button, input or initial."""
+    if triggered_id is None:
+        return 'initial'
+    if triggered_id in ('interval-component', 'animation-state'):
+        return 'tick'
+    if triggered_id.endswith('-button'):
+        return 'button'
+    return 'input'
+
+
+def lap(name):
+    """End phase ``name`` of the running callback: the time since the callback started or the previous lap.
+
+    Called between the steps of a callback, so timing a phase needs no
+    extra indentation; a no-op outside instrumented requests.
+    """
+    if not has_request_context() or 'lap_start' not in g:
+        return
+    now = time.perf_counter()
+    g.phases.append((name, now - g.lap_start))
+    g.lap_start = now
+
+
+def instrument(function):
+    """Record a callback's (or view's) name, trigger type and total time for the request's metrics.
+
+    Whether to record is decided per request by the ``METRICS`` setting of
+    the serving app, so callbacks defined once at import follow each app's
+    config.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not has_request_context() or not current_app.config.get('METRICS'):
+            return function(*args, **kwargs)
+        g.callback = function.__name__
+        try:
+            g.trigger = trigger_type(dash.callback_context.triggered_id)
+        except MissingCallbackContextException:
+            g.trigger = 'request'
+        g.phases, g.lap_start = [], time.perf_counter()
+        start = g.lap_start
+        try:
+            return function(*args, **kwargs)
+        finally:
+            g.callback_time = time.perf_counter() - start
+            g.pop('lap_start')
+    return wrapper
+
+
+def _record_request(response):
+    # After each instrumented request: observe the phases and sizes, and report them as Server-Timing
+    callback = g.get('callback')
+    start = g.get('request_start')
+    if callback is None or start is None:
+        return response
+    total = time.perf_counter() - start
+    callback_time = g.get('callback_time', 0.0)
+    timings = g.get('phases', []) + [
+        ('callback', callback_time), ('serialize', max(total - callback_time, 0.0)), ('total', total),
+    ]
+
+    labels = {'callback': callback, 'trigger': g.get('trigger', 'request')}
+    for name, duration in timings:
+        METRICS.observe('direct_shear_callback_seconds', {**labels, 'phase': name}, duration)
+    METRICS.observe('direct_shear_callback_bytes', {**labels, 'direction': 'request'}, request.content_length or 0)
+    if not response.direct_passthrough:
+        METRICS.observe('direct_shear_callback_bytes', {**labels, 'direction': 'response'},
+                        response.calculate_content_length() or 0)
+    METRICS.flush()
+
+    response.headers['Server-Timing'] = ', '.join(f'{name};dur={duration * 1000:.2f}' for name, duration in timings)
+    return response
+
+
+def _serve_metrics():
+    # Only for the scrapers in METRICS_ALLOW (by default the machine itself), not for every visitor of the app
+    if request.remote_addr not in {address.strip() for address in METRICS_ALLOW.split(',')}:
+        abort(403)
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
+def register_metrics(server, path='/metrics'):
+    """Time requests on the Flask ``server`` and serve the summaries of all its workers at ``path``."""
+    @server.before_request
+    def _start_request():
+        g.request_start = time.perf_counter()
+
+    server.after_request(_record_request)
+    server.add_url_rule(path, 'metrics', _serve_metrics)
+    return server
@@ -0,0 +1,194 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from shear_model import get_curve_table, model_version, shear_strain
+
+# Which failure stress of a test the envelope goes through
+STATE_COLUMNS = {'peak': 'peak_stress', 'critical': 'critical_stress'}
+# The model curves give shear stress in units of 100 kPa (normal stress / 100 in shear_model)
+MODEL_STRESS_UNIT = 100
+
+# Least-squares envelope with bootstrap percentile bands of tau(sigma) on ``sigma``; n_stresses counts the
+# distinct normal stresses of the finite tests (fewer than two leave c and phi undefined)
+EnvelopeFit = namedtuple('EnvelopeFit', [
+    'cohesion', 'friction_angle', 'sigma', 'lower', 'upper', 'cohesion_samples', 'friction_angle_samples',
+    'n_stresses',
+])
+
+
+def fit_envelope(normal_stress, shear_stress, weights=None):
+    """Least-squares cohesion and friction angle (degrees) of tau = c + sigma * tan(phi).
+
+    ``weights`` may be a ``(n_fits, n_tests)`` array (e.g. bootstrap counts),
+    in which case one fit per row is returned as arrays.
+    """
+    x = np.asarray(normal_stress, dtype=float)
+    y = np.asarray(shear_stress, dtype=float)
+    weights = np.ones_like(x) if weights is None else np.asarray(weights, dtype=float)
+
+    # Weighted sums as matrix products, so many weight rows are fitted in one BLAS call
+    sw = weights.sum(axis=-1)
+    sx, sy = weights @ x, weights @ y
+    sxx, sxy = weights @ (x * x), weights @ (x * y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (sw * sxy - sx * sy) / (sw * sxx - sx ** 2)
+        intercept = (sy - slope * sx) / sw
+    return intercept, np.degrees(np.arctan(slope))
+
+
+def _bootstrap_chunk(x, y, n_resamples, seed):
+    rng = np.random.default_rng(seed)
+    counts = rng.multinomial(len(x), np.full(len(x), 1 / len(x)), size=n_resamples)
+    return fit_envelope(x, y, counts.astype(float))
+
+
+def bootstrap_envelope(normal_stress, shear_stress, n_resamples=10000, sigma=None, confidence=95, seed=0,
+                       workers=None, chunk_size=500):
+    """Fit the envelope and its bootstrap confidence band.
+
+    Tests are resampled with replacement ``n_resamples`` times, drawn as
+    multinomial counts so each resample is one weight row for
+    ``fit_envelope``. Chunks of ``chunk_size`` resamples run on a thread pool
+    (the matrix products release the GIL); ``seed`` makes the result
+    reproducible. Non-finite tests (e.g. the dense model at sigma = 0) are
+    dropped.
+    """
+    x = np.asarray(normal_stress, dtype=float).reshape(-1)
+    y = np.asarray(shear_stress, dtype=float).reshape(-1)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    sigma = np.linspace(0, x.max() * 1.2 if len(x) else 1, 50) if sigma is None else np.asarray(sigma, dtype=float)
+
+    cohesion, friction_angle = fit_envelope(x, y)
+    n_stresses = len(np.unique(x))
+    if n_stresses < 2:
+        # No resample can have a slope either
+        undefined = np.full(sigma.shape, np.nan)
+        return EnvelopeFit(cohesion, friction_angle, sigma, undefined, undefined, np.full(n_resamples, np.nan),
+                           np.full(n_resamples, np.nan), n_stresses)
+    chunks = [min(chunk_size, n_resamples - start) for start in range(0, n_resamples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parts = list(executor.map(_bootstrap_chunk, [x] * len(chunks), [y] * len(chunks), chunks, seeds))
+    cohesion_samples = np.concatenate([part[0] for part in parts])
+    friction_samples = np.concatenate([part[1] for part in parts])
+
+    # Resamples that hit a single normal stress have no slope and are ignored
+    envelopes = cohesion_samples[:, None] + sigma[None, :] * np.tan(np.radians(friction_samples))[:, None]
+    tail = (100 - confidence) / 2
+    with np.errstate(invalid='ignore'):
+        lower, upper = np.nanpercentile(envelopes, [tail, 100 - tail], axis=0)
+    return EnvelopeFit(cohesion, friction_angle, sigma, lower, upper, cohesion_samples, friction_samples, n_stresses)
+
+
+def fit_results(results, state='peak', **options):
+    """Bootstrap envelope through the ``state`` stresses of ``batch.simulate``/``sweep`` results (in kPa)."""
+    return bootstrap_envelope(results['normal_stress'], results[STATE_COLUMNS[state]] * MODEL_STRESS_UNIT, **options)
+
+
+@lru_cache(maxsize=64)
+def _model_envelope(soil_types, normal_stresses, state, n_resamples, confidence, version):
+    curves = get_curve_table(shear_strain).select(list(soil_types), np.asarray(normal_stresses, dtype=float))
+    stresses = np.broadcast_to(np.asarray(normal_stresses, dtype=float), curves.peak_stress.shape)
+    shear_stresses = getattr(curves, STATE_COLUMNS[state]) * MODEL_STRESS_UNIT
+    return bootstrap_envelope(stresses, shear_stresses, n_resamples, confidence=confidence)
+
+
+def model_envelope(soil_types, normal_stresses, state='peak', n_resamples=10000, confidence=95):
+    """Envelope fitted to the model tests of ``soil_types`` at ``normal_stresses``, cached per argument set."""
+    return _model_envelope(tuple(soil_types), tuple(float(sigma) for sigma in normal_stresses), state,
+                           n_resamples, confidence, model_version(soil_types))
+
+
+# Percentiles of tau(sigma) over sampled (c, phi); ``bands`` is (n_percentiles, n_sigma)
+EnvelopeDistribution = namedtuple('EnvelopeDistribution', ['sigma', 'percentiles', 'bands', 'n_samples'])
+
+# Normal stresses (kPa) of the Monte Carlo bands: a fixed grid over the slider range plus the 20 % axis margin,
+# so bands depend on the parameter distributions only and are interpolated at the selected stresses. The bands
+# are nearly straight, so a 10 kPa spacing keeps the interpolation well inside the sampling noise.
+ENVELOPE_SIGMA = np.linspace(0, 360, 37)
+
+# Physical limits the sampled parameters are clipped to
+COHESION_LIMITS = (0, np.inf)
+FRICTION_ANGLE_LIMITS = (0, 89)
+
+
+def _parameter_range(distribution, a, b, limits):
+    # Support of the sampled values: +-6 std for normals, the interval itself for uniforms
+    low, high = (a - 6 * b, a + 6 * b) if distribution == 'normal' else (min(a, b), max(a, b))
+    return max(low, limits[0]), min(high, limits[1])
+
+
+@lru_cache(maxsize=8)
+def _base_draws(distribution, size, seed, stream):
+    # Standard normal or uniform draws of one parameter, shared by every mean and spread, so moving a slider
+    # only rescales them
+    rng = np.random.default_rng([seed, stream])
+    draws = rng.standard_normal(size) if distribution == 'normal' else rng.random(size)
+    draws.flags.writeable = False
+    return draws
+
+
+def _sample(draws, distribution, a, b, bounds):
+    values = a + b * draws if distribution == 'normal' else a + (b - a) * draws
+    return np.clip(values, *bounds)
+
+
+@lru_cache(maxsize=32)
+def _monte_carlo_envelope(cohesion, friction_angle, sigma, percentiles, n_samples, chunk_elements, n_bins, seed):
+    sigma = np.asarray(sigma, dtype=float)
+    c_bounds = _parameter_range(*cohesion, COHESION_LIMITS)
+    phi_bounds = _parameter_range(*friction_angle, FRICTION_ANGLE_LIMITS)
+
+    # tau grows with c and phi, so the parameter bounds give the range of tau at every sigma
+    tau_low = c_bounds[0] + sigma * np.tan(np.radians(phi_bounds[0]))
+    tau_span = np.maximum(c_bounds[1] + sigma * np.tan(np.radians(phi_bounds[1])) - tau_low, 1e-12)
+
+    # Histogram per sigma, accumulated chunk by chunk so memory stays at chunk_elements values of tau
+    counts = np.zeros(len(sigma) * n_bins, dtype=np.int64)
+    offsets = np.arange(len(sigma)) * n_bins
+    chunk_size = max(chunk_elements // len(sigma), 1)
+    c_draws = _base_draws(cohesion[0], n_samples, seed, 0)
+    phi_draws = _base_draws(friction_angle[0], n_samples, seed, 1)
+    for start in range(0, n_samples, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        c = _sample(c_draws[chunk], *cohesion, c_bounds)
+        tan_phi = np.tan(np.radians(_sample(phi_draws[chunk], *friction_angle, phi_bounds)))
+        tau = c[:, None] + tan_phi[:, None] * sigma[None, :]
+        bins = np.clip(((tau - tau_low) / tau_span * n_bins).astype(np.int64), 0, n_bins - 1)
+        counts += np.bincount((bins + offsets).ravel(), minlength=counts.size)
+
+    # Interpolate the percentiles inside the bins of the cumulative histogram
+    cumulative = np.cumsum(counts.reshape(len(sigma), n_bins), axis=1) / n_samples
+    bands = np.empty((len(percentiles), len(sigma)))
+    for k, percentile in enumerate(percentiles):
+        target = percentile / 100
+        index = np.minimum((cumulative < target).sum(axis=1), n_bins - 1)
+        below = np.where(index > 0, cumulative[np.arange(len(sigma)), index - 1], 0)
+        inside = cumulative[np.arange(len(sigma)), index] - below
+        fraction = np.clip((target - below) / np.where(inside > 0, inside, 1), 0, 1)
+        bands[k] = tau_low + (index + fraction) / n_bins * tau_span
+    return EnvelopeDistribution(sigma, np.asarray(percentiles, dtype=float), bands, n_samples)
+
+
+def monte_carlo_envelope(cohesion, friction_angle, sigma=ENVELOPE_SIGMA, percentiles=(5, 50, 95),
+                         n_samples=200_000, chunk_elements=2_500_000, n_bins=4096, seed=0):
+    """Percentile bands of the failure envelope for uncertain cohesion and friction angle.
+
+    ``cohesion`` and ``friction_angle`` are ``('normal', mean, std)`` or
+    ``('uniform', low, high)``; samples are clipped to physical values.
+    ``n_samples`` pairs are drawn in chunks of at most ``chunk_elements``
+    values of tau and only a fixed-bin histogram of tau per normal stress is
+    kept, so the percentiles are exact to ``1 / n_bins`` of the range of tau
+    and memory does not grow with ``sigma``. The standard draws behind the
+    samples are kept per distribution family and seed, so new means and
+    spreads only rescale them. Results are cached per argument set; keep the
+    default ``sigma`` and interpolate to reuse them.
+    """
+    return _monte_carlo_envelope(
+        tuple(cohesion), tuple(friction_angle), tuple(float(s) for s in sigma), tuple(percentiles),
+        int(n_samples), int(chunk_elements), int(n_bins), seed,
+    )
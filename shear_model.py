@@ -0,0 +1,630 @@
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+import simulation
+from array_cache import cache_key, cached_arrays, source_version
+from simulation import MC_DENSE_PARAMS, MC_LOOSE_PARAMS, mohr_coulomb_curves
+
+# Points of the app's uniform strain grid
+DEFAULT_RESOLUTION = int(os.environ.get('DIRECT_SHEAR_RESOLUTION', 81))
+
+# Strain grid used by the app (shear displacement in mm, strain as fraction)
+shear_displacement = np.linspace(0, 80, DEFAULT_RESOLUTION)
+shear_strain = shear_displacement / 100
+
+SOIL_TYPES = ('dense', 'loose')
+
+# Normal stresses covered by the precomputed table (the slider range in kPa)
+TABLE_STRESSES = np.arange(0, 301)
+
+# Model constants; fitted models override some of them (see register_model)
+DENSE_PARAMS = {
+    'rise_factor': 1.16,  # Peak-side asymptote, times sigma/100
+    'rise_rate_low': -20.0,  # Rise rate for sigma <= 100 kPa
+    'rise_rate_high': -15.0,  # Rise rate for sigma > 100 kPa
+    'switch_factor': 0.19,  # Strain of the branch switch, times (sigma/100)**0.25
+    'residual_factor': 0.65,  # Critical-state stress, times sigma/100
+    'decay_amplitude': 100.0,
+    'decay_time': 0.09,
+    'decay_ratio': 0.92,
+    'decay_time_ratio': 1.072,
+    'dilation_amplitude': 0.6,
+    'dilation_center': 0.084,
+    'dilation_width': 0.327,
+    'dilation_curvature': 0.2,
+}
+LOOSE_PARAMS = {
+    'residual_factor': 0.65,  # Critical-state stress, times sigma/100
+    'rise_rate': -3.107,
+    'contraction_factor': 0.81,  # Final height change, times sigma/100
+    'contraction_rate': -3.9,
+}
+
+
+def strain_grid(resolution=81, max_displacement=80):
+    """Uniform strain grid with ``resolution`` points up to ``max_displacement`` (mm)."""
+    return np.linspace(0, max_displacement, resolution) / 100
+
+
+def dense_curves(normal_stress, strain, params=DENSE_PARAMS):
+    """Shear stress and height change of dense sand / OC clay.
+
+    ``normal_stress``, ``strain`` and the values in ``params`` are broadcast
+    against each other, so a column of stresses and a row of strains gives
+    one curve per stress.
+    """
+    normal_stress = np.asarray(normal_stress, dtype=float)
+    strain = np.asarray(strain, dtype=float)
+    ratio = normal_stress / 100
+    high = normal_stress > 100
+
+    # Shear stress: exponential rise up to the branch switch, then softening
+    s_y0 = ratio * params['rise_factor']
+    s_A = -s_y0
+    s_R0 = np.where(high, params['rise_rate_high'], params['rise_rate_low'])
+    rising = s_y0 + s_A * np.exp(s_R0 * strain)
+
+    s_y0 = ratio * params['residual_factor']
+    s_A1 = -s_y0 * params['decay_amplitude']
+    s_t1 = params['decay_time'] * ratio ** 0.25
+    s_A2 = -s_A1 * params['decay_ratio']
+    s_t2 = s_t1 * params['decay_time_ratio']
+    softening = s_y0 + s_A1 * np.exp(-strain / s_t1) + s_A2 * np.exp(-strain / s_t2)
+
+    shear_stress = np.where(strain < params['switch_factor'] * ratio ** 0.25, rising, softening)
+
+    # Height change: gaussian dilation bump shifted to start at zero
+    v_A = -params['dilation_amplitude'] * ratio ** 0.01  # Amplitude
+    v_xc = params['dilation_center'] * np.where(high, ratio ** 0.6, ratio ** 0.9)  # Center
+    v_w = params['dilation_width'] * np.where(high, ratio ** 0.2, ratio ** 0.01)  # Width
+    v_k = v_A / (v_w * np.sqrt(np.pi / (4 * np.log(2))))
+    v_y0 = -v_k * np.exp(-4 * np.log(2) * (0 - v_xc) ** 2 / v_w ** 2)
+
+    height_change = v_y0 + v_k * np.exp(-4 * np.log(2) * (strain - v_xc) ** 2 / (v_w ** 2))
+    height_change = height_change + params['dilation_curvature'] * height_change ** 2  # Scale down the height change
+
+    return shear_stress, height_change
+
+
+def dense_switch_strain(normal_stress, params=DENSE_PARAMS):
+    """Strain where the dense shear stress switches from the rising to the softening branch."""
+    return params['switch_factor'] * (np.asarray(normal_stress, dtype=float) / 100) ** 0.25
+
+
+def loose_curves(normal_stress, strain, params=LOOSE_PARAMS):
+    """Shear stress and height change of loose sand / NC clay (see ``dense_curves``)."""
+    normal_stress = np.asarray(normal_stress, dtype=float)
+    strain = np.asarray(strain, dtype=float)
+
+    s_y0 = (normal_stress / 100) * params['residual_factor']
+    s_A = -s_y0
+    s_R0 = params['rise_rate']
+    shear_stress = s_y0 + s_A * np.exp(s_R0 * strain)
+
+    v_y0 = -(normal_stress / 100) * params['contraction_factor']
+    v_A = -v_y0
+    v_R0 = params['contraction_rate']
+    height_change = v_y0 + v_A * np.exp(v_R0 * strain)
+
+    return shear_stress, height_change
+
+
+HYPERBOLIC_PARAMS = {
+    'strength_factor': 0.62,  # Asymptotic shear stress, times sigma/100
+    'failure_ratio': 0.9,  # Share of the asymptote reached at failure (R_f)
+    'stiffness_factor': 12.0,  # Initial stiffness, times (sigma/100)**stiffness_exponent
+    'stiffness_exponent': 0.5,
+    'contraction_factor': 0.7,  # Final height change, times sigma/100
+    'contraction_strain': 0.08,  # Strain at half the final contraction
+}
+SOFTENING_PARAMS = {
+    'peak_factor': 1.05,  # Peak shear stress, times sigma/100
+    'residual_factor': 0.65,  # Critical-state stress, times sigma/100
+    'peak_strain_factor': 0.12,  # Peak strain, times (sigma/100)**0.25
+    'softening_strain': 0.12,  # Decay length of the post-peak softening
+    'dilation_factor': 1.5,  # Final dilation, times (sigma/100)**0.3
+    'contraction_factor': 0.15,  # Initial contraction, times (sigma/100)**0.5
+    'dilation_width': 0.08,
+}
+
+
+def hyperbolic_curves(normal_stress, strain, params=HYPERBOLIC_PARAMS):
+    """Hyperbolic (Duncan-Chang type) hardening with hyperbolic contraction (see ``dense_curves``)."""
+    normal_stress = np.asarray(normal_stress, dtype=float)
+    strain = np.asarray(strain, dtype=float)
+    ratio = normal_stress / 100
+
+    strength = ratio * params['strength_factor']
+    stiffness = params['stiffness_factor'] * ratio ** params['stiffness_exponent']
+    shear_stress = strain / (1 / stiffness + strain * params['failure_ratio'] / strength)
+
+    height_change = -ratio * params['contraction_factor'] * strain / (params['contraction_strain'] + strain)
+    return shear_stress, height_change
+
+
+def softening_strain(normal_stress, params=SOFTENING_PARAMS):
+    """Strain where the softening model reaches its peak and starts to soften."""
+    return params['peak_strain_factor'] * (np.asarray(normal_stress, dtype=float) / 100) ** 0.25
+
+
+def softening_curves(normal_stress, strain, params=SOFTENING_PARAMS):
+    """Parabolic rise to a peak, exponential softening to the critical state and dilation after an initial
+    contraction (see ``dense_curves``)."""
+    normal_stress = np.asarray(normal_stress, dtype=float)
+    strain = np.asarray(strain, dtype=float)
+    ratio = normal_stress / 100
+    peak_strain = softening_strain(normal_stress, params)
+
+    rising = 1 - (1 - strain / peak_strain) ** 2
+    softening = params['residual_factor'] + (params['peak_factor'] - params['residual_factor']) * np.exp(
+        -(strain - peak_strain) / params['softening_strain']
+    )
+    shear_stress = ratio * np.where(strain < peak_strain, params['peak_factor'] * rising, softening)
+
+    # Contraction that turns into dilation around the peak
+    dilation = params['dilation_factor'] * ratio ** 0.3
+    width = params['dilation_width']
+    onset = np.tanh(-peak_strain / width)
+    height_change = (dilation * (np.tanh((strain - peak_strain) / width) - onset) / (1 - onset)
+                     - params['contraction_factor'] * ratio ** 0.5 * np.sin(np.pi * np.minimum(strain / peak_strain, 1)))
+    return shear_stress, height_change
+
+
+class SoilModel:
+    """One constitutive model of the direct shear test.
+
+    ``function(normal_stress, strain, params)`` returns shear stress (in
+    units of 100 kPa) and height change, broadcasting its inputs like
+    ``dense_curves``. ``kind`` is the model a parameter set derives from
+    (fitted models share their base model's kind), ``dash`` the line style of
+    its curves and ``switch`` an optional ``(normal_stress, params)`` function
+    for the strain of a branch switch.
+    """
+
+    def __init__(self, name, function, params, label=None, kind=None, dash='solid', switch=None):
+        self.name = name
+        self.function = function
+        self.params = {key: float(value) for key, value in params.items()}
+        self.label = label or name
+        self.kind = kind or name
+        self.dash = dash
+        self.switch = switch
+        self.version = self._fingerprint()
+
+    def _fingerprint(self):
+        # Bytecode, constants and parameters: editing a model invalidates its cached curves
+        digest = hashlib.sha1(self.name.encode())
+        for function in filter(None, (self.function, self.switch)):
+            digest.update(function.__code__.co_code)
+            digest.update(repr(function.__code__.co_consts).encode())
+        digest.update(repr(sorted(self.params.items())).encode())
+        return digest.hexdigest()[:12]
+
+    def evaluate(self, normal_stresses, strains):
+        """Shear stress and height change, each shaped ``(len(normal_stresses), n_strain)``.
+
+        ``strains`` is one grid for all stresses or one row per stress.
+        """
+        stresses = np.asarray(normal_stresses, dtype=float).reshape(-1, 1)
+        # sigma = 0 divides by zero in the dense model; keep the NaN/inf it produces
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            return self.function(stresses, np.asarray(strains, dtype=float), self.params)
+
+    def derive(self, name, params, label=None):
+        """Copy of this model with some constants replaced by ``params`` (e.g. fitted values)."""
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise ValueError(f'Unknown {self.kind} model parameters: {sorted(unknown)}')
+        return SoilModel(name, self.function, {**self.params, **params}, label, self.kind, self.dash, self.switch)
+
+
+# Registered models by soil type name, in checklist order
+MODELS = {}
+
+
+def register(model):
+    """Add ``model`` to the registry, replacing a model of the same name."""
+    MODELS[model.name] = model
+    return model
+
+
+register(SoilModel('dense', dense_curves, DENSE_PARAMS, 'Dense Sand / OC Clay', switch=dense_switch_strain))
+register(SoilModel('loose', loose_curves, LOOSE_PARAMS, 'Loose Sand / NC Clay', dash='dash'))
+register(SoilModel('hyperbolic', hyperbolic_curves, HYPERBOLIC_PARAMS, 'Hyperbolic (Duncan-Chang)', dash='dot'))
+register(SoilModel('softening', softening_curves, SOFTENING_PARAMS, 'Strain Softening', dash='dashdot',
+                   switch=softening_strain))
+register(SoilModel('mc-dense', mohr_coulomb_curves, MC_DENSE_PARAMS, 'Mohr-Coulomb, Softening (incremental)',
+                   dash='longdash'))
+register(SoilModel('mc-loose', mohr_coulomb_curves, MC_LOOSE_PARAMS, 'Mohr-Coulomb, Perfectly Plastic (incremental)',
+                   dash='longdashdot'))
+
+
+# Directory with fitted models saved as JSON (see fitting.py) and model plugins as Python modules
+FITTED_MODELS_DIR = os.environ.get(
+    'DIRECT_SHEAR_MODELS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fitted_models')
+)
+# Entry point group through which installed packages provide models
+ENTRY_POINT_GROUP = 'direct_shear.models'
+
+
+def register_model(name, kind, params, label=None):
+    """Add a soil type that uses the ``kind`` model with some constants replaced by ``params``."""
+    return register(MODELS[kind].derive(name, params, label))
+
+
+def _register_provided(provided):
+    # A plugin provides a SoilModel, an iterable of them, or a callable returning either
+    if callable(provided) and not isinstance(provided, SoilModel):
+        provided = provided()
+    models = [provided] if isinstance(provided, SoilModel) else list(provided)
+    return [register(model).name for model in models]
+
+
+def load_model_files(directory):
+    """Register the models in ``directory``.
+
+    ``*.json`` files are parameter sets (``name``, ``kind``, ``params``,
+    ``label``) of a registered model; ``*.py`` files are plugins defining
+    ``MODELS``, a list of ``SoilModel`` (or a callable returning one).
+    """
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if filename.endswith('.json'):
+            with open(path) as f:
+                model = json.load(f)
+            names.append(register_model(model['name'], model['kind'], model['params'], model.get('label')).name)
+        elif filename.endswith('.py') and not filename.startswith('_'):
+            spec = importlib.util.spec_from_file_location(f'direct_shear_models.{filename[:-3]}', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            names += _register_provided(module.MODELS)
+    return names
+
+
+def load_entry_point_models(group=ENTRY_POINT_GROUP):
+    """Register the models installed packages provide under the ``group`` entry points."""
+    names = []
+    for entry_point in importlib.metadata.entry_points(group=group):
+        names += _register_provided(entry_point.load())
+    return names
+
+
+def discover_models(directory=FITTED_MODELS_DIR):
+    """Register plugin models from entry points, then from ``directory`` (which wins on name clashes)."""
+    return load_entry_point_models() + load_model_files(directory)
+
+
+def compute_curves(soil_types, normal_stresses, strain=shear_strain):
+    """Evaluate a batch of curves in one go.
+
+    Returns ``(shear_stress, height_change)``, each shaped
+    ``(len(soil_types), len(normal_stresses), n_strain)``. ``strain`` is one
+    grid for all curves or one row per normal stress.
+    """
+    stresses = np.asarray(normal_stresses, dtype=float).reshape(-1)
+    strain = np.asarray(strain, dtype=float)
+    shape = (len(soil_types), stresses.shape[0], strain.shape[-1])
+    shear_stress = np.empty(shape)
+    height_change = np.empty(shape)
+    for i, soil_type in enumerate(soil_types):
+        shear_stress[i], height_change[i] = MODELS[soil_type].evaluate(stresses, strain)
+    return shear_stress, height_change
+
+
+def model_version(soil_types=None):
+    """Fingerprint of the given registered models (all by default).
+
+    Combines each model's own version (see ``SoilModel``), so editing a
+    model changes the version and invalidates caches built from it.
+    """
+    names = sorted(MODELS) if soil_types is None else soil_types
+    return hashlib.sha1(' '.join(f'{name}:{MODELS[name].version}' for name in names).encode()).hexdigest()[:12]
+
+
+# Curves with their peak, critical-state and dilation values, shaped (soil types, normal stresses[, strain]).
+# peak_strain is the refined peak location; peak_index is the first grid point at or after it.
+# dilation_index is the grid point of the fastest dilation, or the grid length if the curve never dilates.
+CurveBatch = namedtuple('CurveBatch', [
+    'shear_stress', 'height_change', 'peak_index', 'peak_strain', 'peak_stress', 'peak_height_change',
+    'critical_stress', 'critical_height_change', 'dilation_index', 'dilation_strain', 'dilation_stress',
+    'dilation_height_change',
+])
+
+# One event of every curve in a CurveBatch: its marker label, the animation step from which it is shown
+# (a step past the last frame means never) and where it sits on both graphs
+CurveEvent = namedtuple('CurveEvent', ['label', 'step', 'strain', 'shear_stress', 'height_change'])
+
+# Events drawn as markers on the stress-strain and height-change graphs
+MARKER_EVENTS = ('peak', 'critical')
+
+
+def refine_maximum(function, lower, upper, points=17, iterations=4):
+    """Locate the maximum of ``function`` inside ``[lower, upper]`` for many curves at once.
+
+    ``lower`` and ``upper`` are arrays of any shape; ``function`` maps
+    strains of shape ``lower.shape + (points,)`` to values of the same shape.
+    The interval is sampled and shrunk to two sample spacings around the
+    best sample ``iterations`` times, so the location is accurate to about
+    ``(upper - lower) * (2 / (points - 1)) ** iterations``. Returns
+    ``(strain, value)``; curves that are NaN throughout give NaN.
+    """
+    lower, upper = np.broadcast_arrays(np.asarray(lower, dtype=float), np.asarray(upper, dtype=float))
+    low_limit, high_limit = lower, upper
+    fractions = np.linspace(0, 1, points)
+    for _ in range(iterations):
+        x = lower[..., None] + (upper - lower)[..., None] * fractions
+        y = function(x)
+        valid = np.isfinite(y)
+        best = np.argmax(np.where(valid, y, -np.inf), axis=-1)[..., None]
+        center = np.take_along_axis(x, best, axis=-1)[..., 0]
+        value = np.where(valid.any(axis=-1), np.take_along_axis(y, best, axis=-1)[..., 0], np.nan)
+        spacing = (upper - lower) / (points - 1)
+        lower, upper = np.maximum(center - spacing, low_limit), np.minimum(center + spacing, high_limit)
+    return np.where(np.isnan(value), np.nan, center), value
+
+
+def _evaluate(soil_type, normal_stresses, strain):
+    # One model evaluated on per-curve strains: stresses (n,) against strains (n, points)
+    return MODELS[soil_type].evaluate(normal_stresses, strain)
+
+
+def find_peaks(soil_types, normal_stresses, strain, shear_stress):
+    """Refined peak strain, shear stress and height change of every curve.
+
+    The grid maximum of ``shear_stress`` only brackets the peak; the peak
+    itself comes from ``refine_maximum`` on the model between the grid
+    points either side of it. ``strain`` is one grid or one row per normal
+    stress. Returns three ``(n_soil, n_stress)`` arrays.
+    """
+    grid = np.broadcast_to(np.asarray(strain, dtype=float), shear_stress.shape)
+    normal_stresses = np.asarray(normal_stresses, dtype=float).reshape(-1)
+    peak = np.argmax(np.nan_to_num(shear_stress, nan=-np.inf), axis=-1)[..., None]
+    lower = np.take_along_axis(grid, np.maximum(peak - 1, 0), axis=-1)[..., 0]
+    upper = np.take_along_axis(grid, np.minimum(peak + 1, grid.shape[-1] - 1), axis=-1)[..., 0]
+
+    peak_strain = np.empty(lower.shape)
+    peak_stress = np.empty(lower.shape)
+    peak_height_change = np.empty(lower.shape)
+    for i, soil_type in enumerate(soil_types):
+        peak_strain[i], peak_stress[i] = refine_maximum(
+            lambda x: _evaluate(soil_type, normal_stresses, x)[0], lower[i], upper[i]
+        )
+
+        # The rising branch ends just before a branch switch, which may lie outside the bracket
+        model = MODELS[soil_type]
+        if model.switch is not None:
+            before = model.switch(normal_stresses, model.params) * (1 - 1e-9)
+            before_stress = _evaluate(soil_type, normal_stresses, before[:, None])[0][:, 0]
+            higher = before_stress > peak_stress[i]
+            peak_strain[i] = np.where(higher, before, peak_strain[i])
+            peak_stress[i] = np.where(higher, before_stress, peak_stress[i])
+        peak_height_change[i] = _evaluate(soil_type, normal_stresses, peak_strain[i][:, None])[1][:, 0]
+
+    # Curves with NaNs on the grid (sigma = 0 for dense) have no peak
+    undefined = np.isnan(np.max(shear_stress, axis=-1))
+    for values in (peak_strain, peak_stress, peak_height_change):
+        values[undefined] = np.nan
+    return peak_strain, peak_stress, peak_height_change
+
+
+def summarize_curves(soil_types, normal_stresses, strain, shear_stress, height_change):
+    """Attach refined peak and critical-state values to computed curves as a ``CurveBatch``.
+
+    ``strain`` is one grid for all curves or one row per normal stress.
+    """
+    peak_strain, peak_stress, peak_height_change = find_peaks(soil_types, normal_stresses, strain, shear_stress)
+    grid = np.broadcast_to(np.asarray(strain, dtype=float), shear_stress.shape)
+    # First grid point at or after the peak; curves without a finite maximum (sigma = 0 for dense) never reach it
+    peak_index = (grid < np.nan_to_num(peak_strain, nan=np.inf)[..., None]).sum(axis=-1)
+
+    # Fastest dilation on the grid; contracting curves have none
+    rate = np.nan_to_num(np.diff(height_change, axis=-1), nan=-np.inf)
+    fastest = np.argmax(rate, axis=-1)
+    dilates = np.take_along_axis(rate, fastest[..., None], axis=-1)[..., 0] > 0
+    dilation_index = np.where(dilates, fastest, grid.shape[-1])
+    at_dilation = np.minimum(dilation_index, grid.shape[-1] - 1)[..., None]
+    dilation_values = [np.where(dilates, np.take_along_axis(values, at_dilation, axis=-1)[..., 0], np.nan)
+                       for values in (shear_stress, height_change, grid)]
+    dilation_strain = dilation_values.pop()
+    return CurveBatch(
+        shear_stress, height_change, peak_index, peak_strain, peak_stress, peak_height_change,
+        shear_stress[..., -1], height_change[..., -1], dilation_index, dilation_strain, *dilation_values,
+    )
+
+
+def curve_events(curves, strain):
+    """Event index of a ``CurveBatch``: peak (P), critical state (CS) and fastest dilation (D).
+
+    Built from fields computed once with the curves, so deciding which
+    markers a frame shows is a comparison of ``step`` with the current
+    animation step. A grid point's event shows once the curve is drawn past
+    it; the critical state shows on the last frame.
+    """
+    last = len(strain) - 1
+    shape = curves.peak_index.shape
+    return {
+        'peak': CurveEvent('P', curves.peak_index + 1, curves.peak_strain, curves.peak_stress,
+                           curves.peak_height_change),
+        'critical': CurveEvent('CS', np.full(shape, last), np.full(shape, float(strain[-1])),
+                               curves.critical_stress, curves.critical_height_change),
+        'dilation': CurveEvent('D', curves.dilation_index + 1, curves.dilation_strain, curves.dilation_stress,
+                               curves.dilation_height_change),
+    }
+
+
+def events_between(events, start_step, end_step, names=MARKER_EVENTS):
+    """Which curves show each event first after ``start_step``, up to and including ``end_step``.
+
+    Returns a dict of event name -> boolean array shaped like the curves.
+    A ``start_step`` of -1 selects every event shown by ``end_step``; the
+    client playback script applies the same rule to the steps it is sent.
+    """
+    return {name: (start_step < events[name].step) & (events[name].step <= end_step) for name in names}
+
+
+def feature_strains(soil_types, normal_stresses, strain=shear_strain):
+    """Strains where the curves change fastest: refined peak, branch switch and maximum dilation rate.
+
+    Returns a dict of ``(n_soil, n_stress)`` arrays (NaN where a model has no
+    such feature), used to refine adaptive grids.
+    """
+    strain = np.asarray(strain, dtype=float)
+    normal_stresses = np.asarray(normal_stresses, dtype=float).reshape(-1)
+    shear_stress, height_change = compute_curves(soil_types, normal_stresses, strain)
+    peak_strain = find_peaks(soil_types, normal_stresses, strain, shear_stress)[0]
+
+    switch_strain = np.full(peak_strain.shape, np.nan)
+    dilation_strain = np.empty(peak_strain.shape)
+    step = (strain[-1] - strain[0]) * 1e-6
+    for i, soil_type in enumerate(soil_types):
+        model = MODELS[soil_type]
+        if model.switch is not None:
+            switch_strain[i] = model.switch(normal_stresses, model.params)
+
+        # Dilation rate by central differences, bracketed by its grid maximum
+        def rate(x):
+            return (_evaluate(soil_type, normal_stresses, x + step)[1]
+                    - _evaluate(soil_type, normal_stresses, x - step)[1]) / (2 * step)
+        fastest = np.argmax(np.nan_to_num(np.gradient(height_change[i], strain, axis=-1), nan=-np.inf), axis=-1)
+        dilation_strain[i] = refine_maximum(
+            rate, strain[np.maximum(fastest - 1, 0)], strain[np.minimum(fastest + 1, len(strain) - 1)]
+        )[0]
+    return {'peak': peak_strain, 'switch': switch_strain, 'dilation': dilation_strain}
+
+
+def adaptive_strain_grid(soil_types, normal_stresses, resolution=41, max_displacement=80, refine_points=9):
+    """Coarse uniform grid plus clusters of points around the features of each normal stress's curves.
+
+    Each feature from ``feature_strains`` (peak, branch switch, maximum
+    dilation rate) gets ``refine_points`` extra points spread over one coarse
+    spacing either side, denser towards the feature itself. Branch switches
+    also get a point just before the switch so the jump is drawn vertically.
+    Returns one grid row per normal stress, refined only around the features
+    of that stress's curves, so the grid size does not grow with the number
+    of stresses; shorter rows are padded by repeating their last strain.
+    """
+    coarse = strain_grid(resolution, max_displacement)
+    spacing = coarse[1] - coarse[0]
+    features = feature_strains(soil_types, normal_stresses, coarse)
+    offsets = spacing * np.sign(np.linspace(-1, 1, refine_points)) * np.linspace(-1, 1, refine_points) ** 2
+    n_stress = np.asarray(normal_stresses).reshape(-1).shape[0]
+    # Refinement points per stress: (n_stress, n_soil * refine_points) for each feature, then the switch points
+    points = [np.broadcast_to(coarse, (n_stress, len(coarse)))]
+    for feature in features.values():
+        points.append((feature.T[..., None] + offsets).reshape(n_stress, -1))
+    points.append(features['switch'].T - spacing * 1e-6)
+    points = np.sort(np.clip(np.concatenate(points, axis=1), coarse[0], coarse[-1]), axis=1)
+
+    # Drop missing features and points closer than a tiny fraction of the coarse spacing, then pad
+    keep = np.isfinite(points) & np.concatenate(
+        [np.ones((n_stress, 1), dtype=bool), np.diff(points, axis=1) > spacing * 1e-7], axis=1)
+    length = keep.sum(axis=1).max()
+    rows = np.full((n_stress, length), coarse[-1])
+    for row, (values, kept) in zip(rows, zip(points, keep)):
+        row[:kept.sum()] = values[kept]
+    return rows
+
+
+# Version of the cached table layout: its fields and the code computing peaks, events and the engine models
+CURVE_TABLE_FORMAT = cache_key(CurveBatch._fields, source_version(sys.modules[__name__], simulation))
+
+
+class CurveTable:
+    """All model curves for a strain grid, computed once and sliced afterwards."""
+
+    def __init__(self, strain=shear_strain, normal_stresses=TABLE_STRESSES, soil_types=None):
+        self.strain = np.array(strain, dtype=float)
+        self.normal_stresses = np.array(normal_stresses, dtype=float)
+        self.soil_types = tuple(MODELS if soil_types is None else soil_types)
+        self.version = model_version(self.soil_types)
+        # Shared by all processes through the array cache: one entry per model and grids, versioned by the
+        # model and the code and fields of the table, so only outdated tables of the same grids are replaced
+        name = 'curves-{}-{}'.format(re.sub(r'[^\w.-]', '_', '-'.join(self.soil_types)),
+                                     cache_key(self.strain, self.normal_stresses))
+        self.curves = CurveBatch(**cached_arrays(name, cache_key(self.version, CURVE_TABLE_FORMAT), self._compute))
+
+        for array in (self.strain, self.normal_stresses, *self.curves):
+            array.flags.writeable = False
+
+    def _compute(self):
+        return summarize_curves(
+            self.soil_types, self.normal_stresses, self.strain,
+            *compute_curves(self.soil_types, self.normal_stresses, self.strain),
+        )._asdict()
+
+    def select(self, soil_types, normal_stresses):
+        """Return a ``CurveBatch`` for the given soil types and normal stresses.
+
+        Stresses outside the table are computed on the fly, each distinct
+        one once; the others are sliced from the table.
+        """
+        stresses = np.asarray(normal_stresses, dtype=float).reshape(-1)
+        index = np.clip(np.searchsorted(self.normal_stresses, stresses), 0, len(self.normal_stresses) - 1)
+        on_table = self.normal_stresses[index] == stresses
+        rows = np.array([self.soil_types.index(soil_type) for soil_type in soil_types], dtype=int)
+        if on_table.all():
+            grid = np.ix_(rows, index)
+            return CurveBatch(*(field[grid] for field in self.curves))
+
+        extra, inverse = np.unique(stresses[~on_table], return_inverse=True)
+        computed = summarize_curves(soil_types, extra, self.strain, *compute_curves(soil_types, extra, self.strain))
+        fields = []
+        for field, values in zip(self.curves, computed):
+            selected = np.empty((len(rows), len(stresses)) + field.shape[2:], dtype=np.result_type(field, values))
+            selected[:, on_table] = field[np.ix_(rows, index[on_table])]
+            selected[:, ~on_table] = values[:, inverse]
+            fields.append(selected)
+        return CurveBatch(*fields)
+
+
+class ModelTables:
+    """One ``CurveTable`` per model for a strain grid.
+
+    Each model's table is built on first use and rebuilt only when that
+    model's version changes, so registering or editing one model leaves the
+    cached curves of all others alone.
+    """
+
+    def __init__(self, strain=shear_strain):
+        self.strain = np.array(strain, dtype=float)
+        self.tables = {}
+
+    def table(self, soil_type):
+        table = self.tables.get(soil_type)
+        if table is None or table.version != model_version((soil_type,)):
+            table = self.tables[soil_type] = CurveTable(self.strain, soil_types=(soil_type,))
+        return table
+
+    def select(self, soil_types, normal_stresses):
+        """``CurveTable.select`` across models, stacked in the order of ``soil_types``."""
+        if len(soil_types) == 0:
+            return self.table(next(iter(MODELS))).select([], normal_stresses)
+        parts = [self.table(soil_type).select([soil_type], normal_stresses) for soil_type in soil_types]
+        if len(parts) == 1:
+            return parts[0]
+        return CurveBatch(*(np.concatenate(fields) for fields in zip(*parts)))
+
+
+_curve_tables = {}
+
+
+def get_curve_table(strain=shear_strain):
+    """Return the cached per-model ``ModelTables`` for ``strain``."""
+    strain = np.asarray(strain, dtype=float)
+    key = strain.tobytes()
+    tables = _curve_tables.get(key)
+    if tables is None:
+        _curve_tables.clear()
+        tables = _curve_tables[key] = ModelTables(strain)
+    return tables
@@ -0,0 +1,216 @@
+import argparse
+from collections import namedtuple
+
+import numpy as np
+
+# Incremental Mohr-Coulomb materials. Stresses in kPa; strain is the app's shear strain (displacement / 100).
+MC_DENSE_PARAMS = {
+    'cohesion': 0.0,
+    'peak_friction': 48.6,  # Peak friction angle (degrees)
+    'critical_friction': 33.0,  # Critical-state friction angle (degrees)
+    'dilatancy': 15.0,  # Peak dilatancy angle (degrees), negative for contraction
+    'softening_strain': 0.15,  # Plastic strain over which friction and dilatancy decay by 1/e
+    'stiffness': 1100.0,  # Shear stiffness at sigma = 100 kPa (kPa per unit strain)
+    'stiffness_exponent': 0.5,  # Stiffness grows with (sigma/100)**stiffness_exponent
+    'contraction': 2.0,  # Height loss per unit elastic strain at sigma = 100 kPa
+    'dilation_scale': 50.0,  # Height change per unit plastic strain and unit tan(dilatancy)
+}
+MC_LOOSE_PARAMS = {
+    'cohesion': 0.0,
+    'peak_friction': 33.0,  # Equal to critical: elastic-perfectly-plastic
+    'critical_friction': 33.0,
+    'dilatancy': -10.0,
+    'softening_strain': 0.2,
+    'stiffness': 250.0,
+    'stiffness_exponent': 0.5,
+    'contraction': 1.0,
+    'dilation_scale': 12.0,
+}
+
+# Loading programme: 'strain' or 'stress' control, one increment per step (strain, or shear/normal stress
+# ratio) and the time per step
+Schedule = namedtuple('Schedule', ['control', 'increments', 'dt'])
+
+# State of every specimen after one step; arrays shaped like the specimens (soil types x normal stresses).
+# failed marks stress-controlled specimens whose target exceeded their strength.
+SimulationStep = namedtuple('SimulationStep', [
+    'step', 'time', 'strain', 'shear_stress', 'height_change', 'plastic_strain', 'failed',
+])
+
+
+def constant_rate(rate, n_steps, dt=1.0):
+    """Strain-controlled loading at ``rate`` strain per unit time."""
+    return Schedule('strain', np.full(n_steps, rate * dt, dtype=float), dt)
+
+
+def variable_rate(rates, dt=1.0, n_steps=None):
+    """Strain-controlled loading with a rate per step, or a ``rates(time)`` function over ``n_steps`` steps."""
+    if callable(rates):
+        rates = rates(np.arange(n_steps) * dt)
+    return Schedule('strain', np.asarray(rates, dtype=float) * dt, dt)
+
+
+def stress_controlled(stress_ratios, dt=1.0):
+    """Shear stress raised through the targets ``tau / sigma``, one per step."""
+    ratios = np.asarray(stress_ratios, dtype=float)
+    return Schedule('stress', np.diff(ratios, prepend=0.0), dt)
+
+
+def _material(params, normal_stress):
+    # Per-specimen constants derived from the parameters (any broadcastable shapes)
+    ratio = normal_stress / 100
+    return {
+        'stiffness': params['stiffness'] * ratio ** params['stiffness_exponent'],
+        'peak_tan': np.tan(np.radians(params['peak_friction'])),
+        'critical_tan': np.tan(np.radians(params['critical_friction'])),
+        'dilatancy_tan': np.tan(np.radians(params['dilatancy'])),
+        'contraction': params['contraction'] * np.sqrt(ratio),
+    }
+
+
+class ShearTest:
+    """Incremental direct shear test of many specimens in lockstep.
+
+    Strain-softening Mohr-Coulomb with a mobilised friction angle that decays
+    from ``peak_friction`` to ``critical_friction`` with plastic strain, and
+    a dilatancy angle that decays alongside it (equal angles give
+    elastic-perfectly-plastic behaviour). ``normal_stress`` and every value
+    in ``params`` are broadcast against each other, so a column of
+    parameters and a row of stresses run every soil type at every stress.
+    Each step of ``schedule`` is split into ``substeps`` elastic-predictor /
+    plastic-corrector updates.
+    """
+
+    def __init__(self, normal_stress, params, schedule, substeps=10):
+        self.normal_stress = np.asarray(normal_stress, dtype=float)
+        self.params = params
+        self.schedule = schedule
+        self.substeps = substeps
+        self.material = _material(params, self.normal_stress)
+        shape = np.broadcast_shapes(self.normal_stress.shape, *(np.shape(value) for value in params.values()))
+        self.strain = np.zeros(shape)
+        self.shear_stress = np.zeros(shape)
+        self.height_change = np.zeros(shape)
+        self.plastic_strain = np.zeros(shape)
+        self.failed = np.zeros(shape, dtype=bool)
+
+    def strength(self, plastic_strain):
+        """Shear strength and its slope with respect to plastic strain."""
+        decay = np.exp(-plastic_strain / self.params['softening_strain'])
+        excess = self.material['peak_tan'] - self.material['critical_tan']
+        strength = self.params['cohesion'] + self.normal_stress * (self.material['critical_tan'] + excess * decay)
+        slope = -self.normal_stress * excess * decay / self.params['softening_strain']
+        return strength, slope
+
+    def advance(self, strain_increment):
+        """Apply one strain increment to every specimen (elastic predictor, plastic corrector)."""
+        stiffness = self.material['stiffness']
+        trial = self.shear_stress + stiffness * strain_increment
+        strength, slope = self.strength(self.plastic_strain)
+
+        # Plastic slip brings the trial stress back onto the (softening) yield surface
+        yielding = trial > strength
+        plastic = np.where(yielding, (trial - strength) / np.maximum(stiffness + slope, 1e-3 * stiffness), 0)
+        plastic = np.minimum(plastic, strain_increment)
+        dilatancy_tan = self.material['dilatancy_tan'] * np.exp(-self.plastic_strain / self.params['softening_strain'])
+
+        self.plastic_strain = self.plastic_strain + plastic
+        self.shear_stress = np.where(yielding, self.strength(self.plastic_strain)[0], trial)
+        self.height_change = (self.height_change - self.material['contraction'] * (strain_increment - plastic)
+                              + self.params['dilation_scale'] * plastic * dilatancy_tan)
+        self.strain = self.strain + strain_increment
+
+    def _stress_increment(self, ratio_increment):
+        # Strain increment that raises the shear stress by ratio_increment * sigma while elastic
+        target = self.shear_stress + ratio_increment * self.normal_stress
+        strength = self.strength(self.plastic_strain)[0]
+        self.failed |= target > strength + 1e-9 * np.maximum(strength, 1)
+        return np.where(self.failed, 0, (target - self.shear_stress) / self.material['stiffness'])
+
+    def steps(self):
+        """Generator of one ``SimulationStep`` per schedule step, starting with the initial state."""
+        yield self._snapshot(0)
+        for k, increment in enumerate(self.schedule.increments, start=1):
+            for _ in range(self.substeps):
+                if self.schedule.control == 'stress':
+                    self.advance(self._stress_increment(increment / self.substeps))
+                else:
+                    self.advance(np.broadcast_to(increment / self.substeps, self.strain.shape))
+            yield self._snapshot(k)
+
+    def _snapshot(self, step):
+        return SimulationStep(step, step * self.schedule.dt, self.strain.copy(), self.shear_stress.copy(),
+                              self.height_change.copy(), self.plastic_strain.copy(), self.failed.copy())
+
+    def run(self):
+        """All steps stacked along a trailing axis, as a ``SimulationStep`` of arrays."""
+        history = list(self.steps())
+        return SimulationStep(*(np.stack(field, axis=-1) for field in zip(*history)))
+
+
+# Strain increment of the internal grid used to evaluate the engine as a closed curve
+CURVE_STRAIN_STEP = 0.001
+
+
+def mohr_coulomb_curves(normal_stress, strain, params=MC_DENSE_PARAMS):
+    """Strain-controlled ``ShearTest`` sampled at ``strain``, with the interface of ``dense_curves``.
+
+    The test runs once on a uniform internal grid up to the largest
+    requested strain; curves are then read off by linear interpolation.
+    Shear stress is returned in units of 100 kPa like the closed-form models.
+    """
+    normal_stress = np.asarray(normal_stress, dtype=float)
+    strain = np.asarray(strain, dtype=float)
+    n_steps = max(int(np.ceil(np.nanmax(strain, initial=0) / CURVE_STRAIN_STEP)), 1)
+    test = ShearTest(normal_stress, params, constant_rate(CURVE_STRAIN_STEP, n_steps), substeps=1)
+    history = test.run()
+
+    # Specimens carry a length-1 axis where the strain axis goes; drop it and gather along the history
+    specimens = history.shear_stress.shape[:-1]
+    lead = specimens[:-1] if specimens and specimens[-1] == 1 else specimens
+    shape = np.broadcast_shapes(lead + (1,), strain.shape)
+    position = np.broadcast_to(np.clip(strain / CURVE_STRAIN_STEP, 0, n_steps), shape).reshape(-1, shape[-1])
+    below = np.minimum(np.nan_to_num(position).astype(int), n_steps - 1)
+    fraction = position - below
+    values = []
+    for series in (history.shear_stress / 100, history.height_change):
+        series = np.broadcast_to(series.reshape(lead + (n_steps + 1,)), shape[:-1] + (n_steps + 1,))
+        series = series.reshape(-1, n_steps + 1)
+        left, right = np.take_along_axis(series, below, -1), np.take_along_axis(series, below + 1, -1)
+        values.append((left + fraction * (right - left)).reshape(shape))
+    return values[0], values[1]
+
+
+def main(argv=None):
+    from shear_model import MODELS, discover_models
+    # Run as a script this module is __main__; the registry holds the imported module's function
+    from simulation import mohr_coulomb_curves as engine
+
+    discover_models()
+    engine_models = [name for name, model in MODELS.items() if model.function is engine]
+    parser = argparse.ArgumentParser(description='Run incremental Mohr-Coulomb shear tests.')
+    parser.add_argument('--soil', nargs='+', default=engine_models[:1], choices=engine_models, help='materials')
+    parser.add_argument('--stress', nargs='+', type=float, default=[50, 100, 200], help='normal stresses in kPa')
+    parser.add_argument('--control', choices=('strain', 'stress'), default='strain')
+    parser.add_argument('--rate', nargs='+', type=float, default=[0.01],
+                        help='strain per step; several values are spread over the steps (variable rate)')
+    parser.add_argument('--ratio', type=float, default=1.0, help='final tau/sigma of stress-controlled tests')
+    parser.add_argument('--steps', type=int, default=80)
+    parser.add_argument('-o', '--output', default='simulation.npz')
+    args = parser.parse_args(argv)
+
+    if args.control == 'stress':
+        schedule = stress_controlled(np.linspace(0, args.ratio, args.steps + 1)[1:])
+    elif len(args.rate) == 1:
+        schedule = constant_rate(args.rate[0], args.steps)
+    else:
+        schedule = variable_rate(np.interp(np.linspace(0, 1, args.steps), np.linspace(0, 1, len(args.rate)), args.rate))
+    params = {key: np.array([[MODELS[name].params[key]] for name in args.soil]) for key in MODELS[args.soil[0]].params}
+    result = ShearTest(np.array(args.stress)[None, :], params, schedule).run()
+    np.savez_compressed(args.output, soil_type=np.array(args.soil), normal_stress=np.array(args.stress),
+                        **result._asdict())
+    print(f'Wrote {len(args.soil) * len(args.stress)} tests x {len(schedule.increments)} steps to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# The app modules live at the repository root; cached arrays go to a throwaway directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DIRECT_SHEAR_CACHE', tempfile.mkdtemp(prefix='direct-shear-cache-'))
@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+
+from animation_export import (
+    EXPORT_POINT_BUDGET, MARKER_EVENTS, MAX_EXPORT_CURVES, animation_figure, animation_html, animation_json,
+)
+from shear_model import shear_strain
+
+
+def curve_frames(figure):
+    # Per frame, the stress-strain and height-change lines (the line traces outside the shear box panel)
+    lines = {k for k, trace in enumerate(figure['data']) if trace['mode'] == 'lines' and trace['xaxis'] != 'x'}
+    return [[trace for k, trace in zip(frame['traces'], frame['data']) if k in lines] for frame in figure['frames']]
+
+
+def test_frames_draw_curves_up_to_their_step():
+    figure = animation_figure(['dense', 'loose'], [50, 200])
+    assert len(figure['frames']) == len(shear_strain)
+    frames = curve_frames(figure)
+    assert len(frames[0]) == 2 * 2 * 2
+    assert all(len(trace['x']) == 0 for trace in frames[0])
+    assert all(len(trace['x']) == len(shear_strain) - 1 for trace in frames[-1])
+
+    # Markers appear once reached: none on the first frame, the critical state of every curve on both graphs last
+    texts = [[trace['text'] for trace in frame['data'] if 'text' in trace] for frame in figure['frames']]
+    assert len(texts[0]) == 4 * 2 * len(MARKER_EVENTS) and not any(texts[0])
+    assert texts[-1].count(['CS']) == 4 * 2
+
+
+def test_large_exports_are_thinned_and_decimated():
+    figure = animation_figure(['dense', 'loose'], list(np.arange(0, 301.0)))
+    last = curve_frames(figure)[-1]
+    assert len(last) == 2 * MAX_EXPORT_CURVES
+    assert sum(len(trace['x']) for trace in last) <= 2 * EXPORT_POINT_BUDGET
+
+
+def test_figure_json_is_cached_and_pages_inline_plotly():
+    first = animation_json(['loose'], [100])
+    assert animation_json(['loose'], [100]) is first
+    assert json.loads(first)['frames']
+    page = animation_html(['loose'], [100])
+    assert page.startswith('<html>') and 'Plotly.newPlot' in page
@@ -0,0 +1,62 @@
+import io
+
+import numpy as np
+import pytest
+
+from api import MAX_COMPUTED_QUERIES, etag
+from direct_shear import create_app
+from shear_model import get_curve_table, shear_strain
+
+
+@pytest.fixture(scope='module')
+def client():
+    return create_app({'WARM_CACHE': False}).server.test_client()
+
+
+def test_curves_match_the_tables(client):
+    response = client.get('/api/curves?soil=dense,loose&stress=50&stress=200')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['soil_type'] == ['dense', 'dense', 'loose', 'loose'] and body['normal_stress'] == [50, 200, 50, 200]
+    curves = get_curve_table(shear_strain).select(['dense', 'loose'], [50, 200])
+    np.testing.assert_allclose(body['shear_stress'], curves.shear_stress.reshape(4, -1))
+    assert body['events']['peak']['step'] == (curves.peak_index.reshape(-1) + 1).tolist()
+
+
+def test_formats_agree(client):
+    query = {'queries': [['loose', 100], ['dense', 12.5]]}
+    plain = client.post('/api/curves', json=query).get_json()
+    archive = np.load(io.BytesIO(client.post('/api/curves?format=npz', json=query).data))
+    np.testing.assert_allclose(archive['shear_stress'], plain['shear_stress'])
+    np.testing.assert_array_equal(archive['peak_step'], plain['events']['peak']['step'])
+    typed = client.post('/api/curves?format=typed', json=query).get_json()
+    assert typed['shear_stress']['shape'] == f'2,{len(shear_strain)}'
+
+
+def test_etag_revalidation(client):
+    response = client.get('/api/curves?soil=dense&stress=100')
+    tag = response.headers['ETag']
+    assert client.get('/api/curves?soil=dense&stress=100', headers={'If-None-Match': tag}).status_code == 304
+    assert client.get('/api/curves?soil=dense&stress=101', headers={'If-None-Match': tag}).status_code == 200
+    # Responses of other grids or table code carry other tags
+    queries = (('dense', 100.0),)
+    assert etag(queries, 'json', 'v', key='a') != etag(queries, 'json', 'v', key='b')
+
+
+@pytest.mark.parametrize('body', [
+    {'soil_types': 'dense', 'normal_stresses': [100]},
+    {'soil_types': ['dense'], 'normal_stresses': 100},
+    {'queries': [['clay', 100]]},
+    {'queries': [['dense', -1]]},
+    {'queries': [['dense', 5000]]},
+    {'queries': [['dense', 'NaN']]},
+    {'soil_types': ['dense'], 'normal_stresses': [k + 0.5 for k in range(MAX_COMPUTED_QUERIES + 1)]},
+    [],
+])
+def test_invalid_requests(client, body):
+    response = client.post('/api/curves', json=body)
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_unknown_format(client):
+    assert client.get('/api/curves?soil=dense&stress=100&format=xml').status_code == 400
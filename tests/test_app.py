@@ -0,0 +1,93 @@
+import pytest
+
+from benchmark import callback_payload
+from direct_shear import MAX_STRESS_LEVELS, create_app, parse_stress_list
+from loadtest import layout_values
+from shear_model import MODELS, TABLE_STRESSES
+
+# Inputs turning on every optional part of the figures
+ALL_OPTIONS = {
+    'normal-stress-checklist.value': ['sigma_n1', 'sigma_n2', 'sigma_n3'],
+    'normal-stress-list.value': '20, 250:300:25',
+    'overlay-checklist.value': ['measured'],
+    'envelope-checklist.value': ['peak', 'critical'],
+    'uncertainty-checklist.value': ['monte_carlo'],
+}
+
+
+class Page:
+    """One browser session: the layout's values and every server callback posted through the test client."""
+
+    def __init__(self, app):
+        self.client = app.server.test_client()
+        assert self.client.get('/').status_code == 200
+        self.values = layout_values(self.client.get('/_dash-layout').get_json())
+        self.dependencies = [item for item in self.client.get('/_dash-dependencies').get_json()
+                             if not item.get('clientside_function')]
+
+    def post(self, dependency, prop=None):
+        response = self.client.post('/_dash-update-component',
+                                    json=callback_payload(dependency, self.values, prop, self.values))
+        assert response.status_code in (200, 204), (dependency['output'], response.data[:500])
+        result = response.get_json() if response.status_code == 200 else {}
+        for component, props in result.get('response', {}).items():
+            self.values.update({f'{component}.{name}': value for name, value in props.items()})
+        return result
+
+    def trigger(self, prop, value):
+        # Set a property and post every server callback it is an input of
+        self.values[prop] = value
+        return [self.post(dependency, prop) for dependency in self.dependencies
+                if prop in (f'{item["id"]}.{item["property"]}' for item in dependency['inputs'])]
+
+
+@pytest.fixture(params=['client', 'server'])
+def page(request):
+    return Page(create_app({'PLAYBACK_MODE': request.param, 'WARM_CACHE': False}))
+
+
+def test_callbacks(page):
+    # Initial calls, as on page load
+    for dependency in page.dependencies:
+        if not dependency.get('prevent_initial_call'):
+            page.post(dependency)
+
+    for prop, value in ALL_OPTIONS.items():
+        page.trigger(prop, value)
+    for soil_type in MODELS:
+        page.trigger('soil-type-checklist.value', [soil_type])
+    page.trigger('soil-type-checklist.value', list(MODELS))
+
+    # Playback ticks (server playback redraws the curves and the shear box on each)
+    for step in range(1, 6):
+        page.trigger('animation-state.data', {'running': True, 'step': step})
+    page.trigger('animation-state.data', {'running': False, 'step': 0})
+
+    page.trigger('soil-type-checklist.value', ['dense', 'loose'])
+    result, = page.trigger('download-button.n_clicks', 1)
+    assert result['response']['download-animation']['data']['filename'] == 'direct_shear_animation.html'
+
+
+def test_measured_overlay_of_unmeasured_soil_type(page):
+    page.values.update({'overlay-checklist.value': ['measured'], 'soil-type-checklist.value': ['mc-dense']})
+    for dependency in page.dependencies:
+        if not dependency.get('prevent_initial_call'):
+            page.post(dependency, 'overlay-checklist.value')
+
+
+def test_stress_list_is_snapped_to_table_rows():
+    stresses = parse_stress_list('12.5:300:2.5, 7.4; 400 -3 nan inf')
+    assert stresses[:3] == [13.0, 15.0, 18.0] and stresses[-1] == 7.0
+    assert set(stresses) <= set(TABLE_STRESSES.tolist()) and len(set(stresses)) == len(stresses)
+    assert parse_stress_list('0:1:0.5') == [0.0, 1.0]
+    assert len(parse_stress_list('0:300:1e-9, 0:300:0.1')) <= MAX_STRESS_LEVELS
+    assert parse_stress_list('5:1:1, 1:5:0, 1:5:-1, a:b:c') == []
+
+
+def test_no_peak_fit_through_a_single_defined_test(page):
+    # The dense peak is undefined at sigma = 0, its critical state is not
+    page.values.update({'normal-stress-1.value': 0, 'normal-stress-2.value': 1, 'normal-stress-3.value': 0,
+                        'normal-stress-list.value': '', 'soil-type-checklist.value': ['dense']})
+    result, = page.trigger('envelope-checklist.value', ['peak', 'critical'])
+    names = [trace.get('name') or '' for trace in result['response']['mohr-coulomb-graph']['figure']['data']]
+    assert 'CS fit' in ' '.join(names) and 'Peak fit' not in ' '.join(names)
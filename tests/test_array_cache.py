@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+import array_cache
+import shear_model
+from array_cache import cached_arrays
+from shear_model import MODELS, ModelTables, register_model
+
+
+def test_arrays_are_computed_once_per_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(array_cache, 'CACHE_DIR', str(tmp_path))
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return {'values': np.full(3, value)}
+
+    first = cached_arrays('table', 'a' * 16, lambda: compute(1.0))
+    assert isinstance(first['values'], np.ndarray) and not first['values'].flags.writeable
+    np.testing.assert_array_equal(cached_arrays('table', 'a' * 16, lambda: compute(2.0))['values'], 1.0)
+    other = cached_arrays('table-fine', 'b' * 16, lambda: compute(3.0))
+
+    # A new version replaces the older versions of its name only
+    np.testing.assert_array_equal(cached_arrays('table', 'c' * 16, lambda: compute(4.0))['values'], 4.0)
+    assert calls == [1.0, 3.0, 4.0]
+    assert sorted(os.listdir(tmp_path)) == ['table-' + 'c' * 16, 'table-fine-' + 'b' * 16]
+    np.testing.assert_array_equal(other['values'], 3.0)
+
+
+def test_editing_a_model_rebuilds_only_its_table(monkeypatch):
+    monkeypatch.setattr(shear_model, 'MODELS', dict(MODELS))
+    register_model('edited', 'loose', {'residual_factor': 0.6})
+    tables = ModelTables(shear_model.strain_grid(21))
+    before = tables.select(['edited', 'dense'], [100])
+    dense = tables.table('dense')
+
+    register_model('edited', 'loose', {'residual_factor': 0.7})
+    after = tables.select(['edited', 'dense'], [100])
+    assert tables.table('dense') is dense
+    np.testing.assert_allclose(after.critical_stress[0] / before.critical_stress[0], 0.7 / 0.6, rtol=1e-3)
+    np.testing.assert_array_equal(after.critical_stress[1], before.critical_stress[1])
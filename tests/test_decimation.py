@@ -0,0 +1,28 @@
+import numpy as np
+
+from decimation import decimate, lttb_indices
+
+
+def test_lttb_keeps_ends_and_spikes():
+    x = np.linspace(0, 1, 1001)
+    y = np.zeros((2, len(x)))
+    y[0, 437] = 5
+    y[1, 612] = -3
+    indices = lttb_indices(x, y, 50)
+    assert indices.shape == (2, 50)
+    assert (indices[:, 0] == 0).all() and (indices[:, -1] == 1000).all()
+    assert (np.diff(indices, axis=1) > 0).all()
+    assert 437 in indices[0] and 612 in indices[1]
+
+
+def test_lttb_returns_every_point_when_within_budget():
+    np.testing.assert_array_equal(lttb_indices(np.arange(10), np.ones((1, 10)), 20), [np.arange(10)])
+
+
+def test_decimate_merges_curves_and_keeps_index():
+    x = np.linspace(0, 1, 501)
+    stress, height = np.zeros((1, 501)), np.zeros((1, 501))
+    stress[0, 100], height[0, 400] = 1, 1
+    indices, = decimate(x, [stress, height], 20, keep=[250])
+    assert {0, 100, 250, 400, 500} <= set(indices.tolist())
+    assert (np.diff(indices) > 0).all()
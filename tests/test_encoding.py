@@ -0,0 +1,36 @@
+import base64
+
+import numpy as np
+import plotly.graph_objects as go
+
+from encoding import MIN_ENCODED_POINTS, display_values, encode_array, encode_figure, is_typed_array
+
+
+def decode(spec):
+    return np.frombuffer(base64.b64decode(spec['bdata']), dtype=np.dtype(spec['dtype']).newbyteorder('<'))
+
+
+def test_typed_arrays_round_trip_as_little_endian_float32():
+    values = np.linspace(-1, 1, 101) * 123.456
+    spec = encode_array(values.astype('>f8'))
+    assert spec['dtype'] == 'f4' and is_typed_array(spec)
+    np.testing.assert_allclose(decode(spec), values, rtol=1e-7)
+    np.testing.assert_array_equal(decode(encode_array([1, 2, 3], 'i2')), [1, 2, 3])
+    assert display_values(np.array([0.123456, 2, 1e-5], dtype='f4')) == [0.1235, 2.0, 0.0]
+
+
+def test_figures_encode_long_numeric_trace_arrays_only():
+    long = np.arange(MIN_ENCODED_POINTS, dtype=float)
+    fig = go.Figure([
+        go.Scatter(x=long, y=long * 2),
+        go.Scatter(x=long[:MIN_ENCODED_POINTS - 1], y=[str(k) for k in range(MIN_ENCODED_POINTS)]),
+        go.Scatter(x=long, y=long),
+    ])
+    figure = encode_figure(fig, traces={0, 1})
+    first, second, third = figure['data']
+    np.testing.assert_array_equal(decode(first['x']), long)
+    np.testing.assert_array_equal(decode(first['y']), long * 2)
+    assert not is_typed_array(second['x']) and not is_typed_array(second['y'])
+    # Traces left out stay plain for extendData; encoding twice keeps the typed arrays
+    assert not is_typed_array(third['x'])
+    assert encode_figure(figure)['data'][0]['x'] is first['x'] and is_typed_array(figure['data'][2]['y'])
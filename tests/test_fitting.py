@@ -0,0 +1,44 @@
+import numpy as np
+
+from fitting import fit_many, fit_specimens, pad_curves
+from shear_model import DENSE_PARAMS, LOOSE_PARAMS, dense_curves, loose_curves
+
+STRAIN = np.linspace(0, 0.8, 81)
+
+
+def test_loose_parameters_are_recovered_from_exact_curves():
+    truth = {'residual_factor': 0.7, 'rise_rate': -4.0, 'contraction_factor': 0.6, 'contraction_rate': -3.0}
+    shear_stress, height_change = loose_curves(np.array([[100.0]]), STRAIN, {**LOOSE_PARAMS, **truth})
+    result = fit_specimens('loose', STRAIN, shear_stress, height_change)
+    assert result.converged.all() and result.iterations < 100 and result.cost[0] < 1e-12
+    for name, value in truth.items():
+        np.testing.assert_allclose(result.params[name], value, rtol=1e-5)
+
+
+def test_dense_fit_frees_identifiable_parameters_and_converges():
+    # Specimens with scaled peak and residual stress, tested at 100 kPa
+    factors = np.array([0.9, 1.0, 1.1, 1.2])
+    params = dict(DENSE_PARAMS, rise_factor=1.16 * factors[:, None], residual_factor=0.65 * factors[:, None])
+    shear_stress, height_change = np.broadcast_arrays(*dense_curves(100.0, STRAIN, params))
+    result = fit_specimens('dense', np.broadcast_to(STRAIN, shear_stress.shape), shear_stress, height_change)
+    # rise_rate_high is unused at 100 kPa and switch_factor moves the branch switch
+    assert set(result.params) == set(DENSE_PARAMS) - {'rise_rate_high', 'switch_factor'}
+    assert result.converged.all() and result.iterations < 100
+    np.testing.assert_allclose(result.params['rise_factor'], 1.16 * factors, rtol=1e-4)
+    np.testing.assert_allclose(result.params['residual_factor'], 0.65 * factors, rtol=1e-4)
+
+
+def test_fit_many_matches_one_batch_of_padded_curves():
+    curves = []
+    for k, length in enumerate([81, 60, 41]):
+        params = dict(LOOSE_PARAMS, residual_factor=0.6 + k / 10)
+        shear_stress, height_change = loose_curves(100.0, STRAIN[:length], params)
+        curves.append((STRAIN[:length], shear_stress, height_change))
+    strain, shear_stress, height_change, weights = pad_curves(curves)
+    assert weights.sum(axis=1).tolist() == [81, 60, 41] and (strain[2, 41:] == STRAIN[40]).all()
+
+    batch = fit_specimens('loose', strain, shear_stress, height_change, weights=weights)
+    chunked = fit_many('loose', curves, workers=1, chunk_size=2)
+    for name in batch.params:
+        np.testing.assert_allclose(chunked.params[name], batch.params[name], rtol=1e-6)
+    np.testing.assert_allclose(chunked.params['residual_factor'], [0.6, 0.7, 0.8], rtol=1e-5)
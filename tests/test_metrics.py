@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+
+import pytest
+
+from direct_shear import create_app
+from metrics import Metrics, trigger_type
+
+
+def test_trigger_types():
+    assert [trigger_type(name) for name in (None, 'interval-component', 'animation-state', 'start-button',
+                                            'cohesion')] == ['initial', 'tick', 'tick', 'button', 'input']
+
+
+def test_summaries_in_prometheus_format():
+    metrics = Metrics(window=4, directory=None)
+    metrics.describe('latency', 'Request time')
+    for value in (1, 2, 3, 4, 100):
+        metrics.observe('latency', {'callback': 'a'}, value)
+    text = metrics.render()
+    assert '# HELP latency Request time' in text and '# TYPE latency summary' in text
+    assert 'latency_count{callback="a"} 5' in text and 'latency_sum{callback="a"} 110' in text
+    # Quantiles over the last window only
+    assert 'latency{callback="a",quantile="0.5"} 3.5' in text
+
+
+def _worker(directory, value, observed, done):
+    metrics = Metrics(directory=directory, group='test')
+    metrics.observe('latency', {'callback': 'a'}, value)
+    metrics.flush()
+    observed.release()
+    done.wait()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_workers_are_merged(tmp_path):
+    context = multiprocessing.get_context('fork')
+    observed, done = context.Semaphore(0), context.Event()
+    workers = [context.Process(target=_worker, args=(str(tmp_path), value, observed, done)) for value in (1, 3)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        observed.acquire()
+
+    # Any process of the group serves the observations of all of them
+    text = Metrics(directory=str(tmp_path), group='test').render()
+    assert 'latency_count{callback="a"} 2' in text and 'latency_sum{callback="a"} 4' in text
+    assert 'latency_count' not in Metrics(directory=str(tmp_path), group='other').render()
+
+    # Logs of exited workers are dropped
+    done.set()
+    for worker in workers:
+        worker.join()
+    assert 'latency_count' not in Metrics(directory=str(tmp_path), group='test').render()
+
+
+def test_compacted_log_keeps_summaries(tmp_path, monkeypatch):
+    monkeypatch.setattr('metrics.METRICS_LOG_BYTES', 100)
+    metrics = Metrics(window=3, directory=str(tmp_path), group='test')
+    for value in range(10):
+        metrics.observe('latency', {'callback': 'a'}, value)
+        metrics.flush()
+    assert len((tmp_path / f'test-{os.getpid()}.jsonl').read_text().splitlines()) == 1
+    text = Metrics(window=3, directory=str(tmp_path), group='test').render()
+    assert 'latency_count{callback="a"} 10' in text and 'latency{callback="a",quantile="0.5"} 8' in text
+
+
+def test_endpoint_follows_config_and_is_local_only():
+    enabled = create_app({'METRICS': True, 'WARM_CACHE': False}).server.test_client()
+    response = enabled.post('/api/curves', json={'soil_types': ['loose'], 'normal_stresses': [100]})
+    assert 'total;dur=' in response.headers['Server-Timing']
+    assert enabled.get('/metrics').status_code == 200
+    assert enabled.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.5'}).status_code == 403
+
+    disabled = create_app({'METRICS': False, 'WARM_CACHE': False}).server.test_client()
+    response = disabled.post('/api/curves', json={'soil_types': ['loose'], 'normal_stresses': [100]})
+    assert 'Server-Timing' not in response.headers
@@ -0,0 +1,64 @@
+import json
+from importlib.metadata import EntryPoint
+
+import numpy as np
+import pytest
+
+import shear_model
+from shear_model import LOOSE_PARAMS, MODELS, SoilModel, discover_models, load_model_files, register_model
+
+PLUGIN = '''
+import numpy as np
+
+from shear_model import SoilModel
+
+
+def linear_curves(normal_stress, strain, params):
+    return normal_stress / 100 * params['slope'] * strain, np.zeros_like(strain * normal_stress)
+
+
+MODELS = lambda: [SoilModel('linear', linear_curves, {'slope': 2.0}, 'Linear')]
+'''
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # Plugins register into a copy, so other tests see the built-in models only
+    monkeypatch.setattr(shear_model, 'MODELS', dict(MODELS))
+    return shear_model.MODELS
+
+
+def test_model_files_register_parameter_sets_and_plugins(tmp_path, registry):
+    (tmp_path / 'fitted-loose.json').write_text(json.dumps(
+        {'name': 'fitted-loose', 'kind': 'loose', 'params': {'rise_rate': -5.0}, 'label': 'Fitted'}))
+    (tmp_path / 'linear.py').write_text(PLUGIN)
+    (tmp_path / '_helpers.py').write_text('raise ImportError')
+    assert load_model_files(tmp_path) == ['fitted-loose', 'linear']
+
+    fitted = registry['fitted-loose']
+    assert fitted.kind == 'loose' and fitted.params == {**LOOSE_PARAMS, 'rise_rate': -5.0}
+    assert fitted.version != registry['loose'].version
+    shear_stress, height_change = registry['linear'].evaluate([100, 200], [0, 0.5])
+    np.testing.assert_array_equal(shear_stress, [[0, 1], [0, 2]])
+    assert load_model_files(tmp_path / 'missing') == []
+
+
+def test_directory_models_replace_entry_point_models(tmp_path, monkeypatch, registry):
+    module = tmp_path / 'shear_plugin.py'
+    module.write_text(PLUGIN)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    entry_point = EntryPoint('linear', 'shear_plugin:MODELS', shear_model.ENTRY_POINT_GROUP)
+    monkeypatch.setattr(shear_model.importlib.metadata, 'entry_points',
+                        lambda group: [entry_point] if group == shear_model.ENTRY_POINT_GROUP else [])
+    (tmp_path / 'models').mkdir()
+    (tmp_path / 'models' / 'linear.json').write_text(json.dumps(
+        {'name': 'linear', 'kind': 'loose', 'params': {}}))
+
+    assert discover_models(tmp_path / 'models') == ['linear', 'linear']
+    assert registry['linear'].kind == 'loose'
+
+
+def test_unknown_parameters_are_rejected():
+    with pytest.raises(ValueError, match='rise_rate_typo'):
+        register_model('typo', 'loose', {'rise_rate_typo': 1.0})
+    assert isinstance(shear_model.MODELS['loose'], SoilModel) and 'typo' not in shear_model.MODELS
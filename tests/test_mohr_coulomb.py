@@ -0,0 +1,43 @@
+import numpy as np
+
+from mohr_coulomb import ENVELOPE_SIGMA, bootstrap_envelope, model_envelope, monte_carlo_envelope
+
+TAN_30 = np.tan(np.radians(30))
+
+
+def test_monte_carlo_percentiles_of_a_normal_cohesion():
+    distribution = monte_carlo_envelope(('normal', 50, 5), ('normal', 30, 0))
+    np.testing.assert_array_equal(distribution.sigma, ENVELOPE_SIGMA)
+    mean = 50 + ENVELOPE_SIGMA * TAN_30
+    np.testing.assert_allclose(distribution.bands, [mean - 1.645 * 5, mean, mean + 1.645 * 5], atol=0.1)
+
+
+def test_monte_carlo_percentiles_of_a_uniform_cohesion():
+    distribution = monte_carlo_envelope(('uniform', 0, 20), ('uniform', 30, 30), percentiles=(5, 50, 95))
+    base = ENVELOPE_SIGMA * TAN_30
+    np.testing.assert_allclose(distribution.bands, [base + 1, base + 10, base + 19], atol=0.1)
+
+
+def test_monte_carlo_clips_to_physical_parameters_and_is_cached():
+    distribution = monte_carlo_envelope(('normal', 0, 10), ('normal', 30, 2))
+    # Half of the cohesion samples are clipped to zero, so the lower band is the frictional envelope alone
+    assert (distribution.bands[0] >= 0).all()
+    assert monte_carlo_envelope(('normal', 0, 10), ('normal', 30, 2)) is distribution
+    assert (np.diff(distribution.bands, axis=0) >= 0).all()
+
+
+def test_bootstrap_recovers_an_exact_envelope_and_drops_undefined_tests():
+    sigma = np.array([0, 50, 100, 150, 200, 250.0])
+    tau = 10 + sigma * TAN_30
+    tau[0] = np.nan
+    fit = bootstrap_envelope(sigma, tau, n_resamples=200, sigma=[0, 100])
+    assert fit.n_stresses == 5
+    np.testing.assert_allclose([fit.cohesion, fit.friction_angle], [10, 30])
+    np.testing.assert_allclose([fit.lower, fit.upper], [[10, 10 + 100 * TAN_30]] * 2)
+    assert len(fit.cohesion_samples) == 200
+
+
+def test_dense_envelope_over_one_defined_stress_has_no_fit():
+    fit = model_envelope(['dense'], [0, 1])
+    assert fit.n_stresses == 1 and np.isnan(fit.cohesion)
+    assert model_envelope(['dense', 'loose'], [0, 1]).n_stresses == 2
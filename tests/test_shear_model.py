@@ -0,0 +1,149 @@
+import numpy as np
+import pytest
+
+from shear_model import (
+    MARKER_EVENTS, CurveTable, adaptive_strain_grid, compute_curves, curve_events, dense_curves, dense_switch_strain,
+    events_between, find_peaks, loose_curves, refine_maximum, strain_grid, summarize_curves,
+)
+
+# Grid and stress range of the original app
+STRAIN = np.linspace(0, 80, 81) / 100
+STRESSES = np.arange(0, 301)
+
+
+def scalar_dense(normal_stress):
+    # The per-point loops the app used before the vectorized models
+    shear_stress = np.zeros_like(STRAIN)
+    height_change = np.zeros_like(STRAIN)
+    for i, strain in enumerate(STRAIN):
+        if strain < 0.19*(normal_stress/100)**0.25:
+            s_y0 = (normal_stress / 100) * 1.16
+            s_A = -s_y0
+            if normal_stress > 100:
+                s_R0 = -15
+            else:
+                s_R0 = -20
+            shear_stress[i] = s_y0 + s_A * np.exp(s_R0 * strain)
+        else:
+            s_y0 = (normal_stress / 100) * 0.65
+            s_A1 = -s_y0 * 100
+            s_t1 = 0.09 *(normal_stress / 100) ** 0.25
+            s_A2 = -s_A1 * 0.92
+            s_t2 = s_t1 * 1.072
+            shear_stress[i] = s_y0 + s_A1 * np.exp(-strain / s_t1) + s_A2 * np.exp(-strain / s_t2)
+
+    for i, strain in enumerate(STRAIN):
+        v_A = -0.6 * (normal_stress / 100) **0.01
+        if normal_stress > 100:
+            v_xc = 0.084 * (normal_stress / 100) ** 0.6
+            v_w = 0.327 * (normal_stress / 100) ** 0.2
+        else:
+            v_xc = 0.084 * (normal_stress / 100) ** 0.9
+            v_w = 0.327 * (normal_stress / 100) ** 0.01
+        v_y0 = -v_A / (v_w * np.sqrt(np.pi / (4 * np.log(2)))) * np.exp(-4 * np.log(2) * (0 - v_xc) ** 2 / v_w ** 2)
+        height_change[i] = v_y0 + v_A / (v_w * np.sqrt(np.pi / (4 * np.log(2)))) * np.exp(
+            -4 * np.log(2) * (strain - v_xc)**2 / (v_w**2)
+        )
+        height_change[i] += 0.2 * height_change[i] **2
+    return shear_stress, height_change
+
+
+def scalar_loose(normal_stress):
+    shear_stress = np.zeros_like(STRAIN)
+    height_change = np.zeros_like(STRAIN)
+    for i, strain in enumerate(STRAIN):
+        s_y0 = (normal_stress / 100) * 0.65
+        s_A = -s_y0
+        s_R0 = -3.107
+        shear_stress[i] = s_y0 + s_A * np.exp(s_R0 * strain)
+
+    for i, strain in enumerate(STRAIN):
+        v_y0 = -(normal_stress / 100) * 0.81
+        v_A = -v_y0
+        v_R0 = -3.9
+        height_change[i] = v_y0 + v_A * np.exp(v_R0 * strain)
+    return shear_stress, height_change
+
+
+@pytest.mark.parametrize('vectorized, scalar', [(dense_curves, scalar_dense), (loose_curves, scalar_loose)])
+def test_curves_match_scalar_loops(vectorized, scalar):
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        shear_stress, height_change = vectorized(STRESSES[:, None], STRAIN[None, :])
+        expected = [scalar(float(normal_stress)) for normal_stress in STRESSES]
+    np.testing.assert_allclose(shear_stress, [values[0] for values in expected], rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(height_change, [values[1] for values in expected], rtol=1e-12, atol=1e-12)
+
+
+def test_select_computes_only_stresses_off_the_table():
+    table = CurveTable(soil_types=('dense', 'loose'))
+    stresses = np.array([12.5, 50, 0, 12.5, 300, 301.7])
+    selected = table.select(['loose', 'dense'], stresses)
+    computed = summarize_curves(['loose', 'dense'], stresses, table.strain,
+                                *compute_curves(['loose', 'dense'], stresses, table.strain))
+    for field, expected in zip(selected, computed):
+        np.testing.assert_array_equal(field, expected)
+
+
+def test_refine_maximum_of_many_curves():
+    centers = np.array([[0.123456, 0.5], [0.9, 0.31]])
+    strain, value = refine_maximum(lambda x: 2 - (x - centers[..., None]) ** 2, np.zeros((2, 2)), 1, iterations=6)
+    np.testing.assert_allclose(strain, centers, atol=1e-6)
+    np.testing.assert_allclose(value, 2, atol=1e-12)
+    assert np.isnan(refine_maximum(lambda x: np.full_like(x, np.nan), 0, 1)).all()
+
+
+def test_peaks_are_refined_off_the_grid():
+    stresses = np.array([0, 25, 100, 250])
+    shear_stress, _ = compute_curves(['dense', 'softening'], stresses, STRAIN)
+    peak_strain, peak_stress, _ = find_peaks(['dense', 'softening'], stresses, STRAIN, shear_stress)
+    fine = np.linspace(0, 0.8, 200001)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fine_stress = compute_curves(['dense', 'softening'], stresses, fine)[0]
+    assert np.isnan(peak_strain[0, 0]) and np.isnan(peak_stress[0, 0])
+    np.testing.assert_allclose(peak_stress[:, 1:], fine_stress[:, 1:].max(axis=-1), rtol=1e-5)
+    np.testing.assert_allclose(peak_strain[:, 1:], fine[fine_stress[:, 1:].argmax(axis=-1)], atol=1e-5)
+    assert (peak_stress[:, 1:] >= np.nanmax(shear_stress[:, 1:], axis=-1)).all()
+
+
+def test_adaptive_grid_rows_are_refined_per_stress():
+    stresses = [50, 150]
+    rows = adaptive_strain_grid(['dense', 'loose'], stresses, resolution=41)
+    assert rows.shape[0] == 2 and (np.diff(rows, axis=1) >= 0).all()
+    coarse = strain_grid(41)
+    for row, stress in zip(rows, stresses):
+        assert np.isin(coarse, row).all() and rows.shape[1] < 41 + 3 * 2 * 9 + 2
+        # Refined around the branch switch, with a point just before it
+        switch = dense_switch_strain(stress)
+        spacing = coarse[1]
+        assert ((row >= switch - spacing) & (row <= switch + spacing)).sum() >= 9
+        np.testing.assert_allclose(row[row < switch].max(), switch, rtol=1e-6)
+        # A stress refined alone gets the same points
+        alone = adaptive_strain_grid(['dense', 'loose'], [stress], resolution=41)[0]
+        np.testing.assert_array_equal(np.unique(alone), np.unique(row))
+    # The row length does not grow with the number of stresses
+    assert adaptive_strain_grid(['dense', 'loose'], np.arange(10, 300, 10), resolution=41).shape[1] <= rows.shape[1] + 4
+
+
+def test_each_event_shows_once_after_the_curve_passes_it():
+    table = CurveTable(soil_types=('dense', 'loose'))
+    curves = table.select(['dense', 'loose'], [0, 40, 100, 300])
+    events = curve_events(curves, table.strain)
+    last = len(table.strain) - 1
+
+    # Ticks of three steps each: every event is shown by exactly one tick
+    shown = {name: np.zeros(curves.peak_index.shape, dtype=int) for name in MARKER_EVENTS}
+    for start in range(-1, last, 3):
+        for name, selected in events_between(events, start, min(start + 3, last)).items():
+            shown[name] += selected
+    # Peaks at the end of the curve (loose) coincide with the critical state, which is drawn instead
+    np.testing.assert_array_equal(shown['peak'], events['peak'].step <= last)
+    assert shown['peak'][0, 0] == 0 and shown['peak'][0, 1:].all()
+    assert (shown['critical'] == 1).all() and (events['critical'].step == last).all()
+    assert set(events_between(events, last - 1, last, names=('dilation',))) == {'dilation'}
+
+    # The peak shows from the step whose curve first reaches past the peak strain
+    defined = np.isfinite(curves.peak_strain)
+    step = events['peak'].step[defined]
+    assert (table.strain[step - 1] >= curves.peak_strain[defined]).all()
+    assert ((step == 1) | (table.strain[np.maximum(step - 2, 0)] < curves.peak_strain[defined])).all()
+    assert (events['peak'].step[~defined] > last).all()
@@ -0,0 +1,56 @@
+import numpy as np
+
+from simulation import (
+    MC_DENSE_PARAMS, MC_LOOSE_PARAMS, ShearTest, constant_rate, mohr_coulomb_curves, stress_controlled, variable_rate,
+)
+
+STRESSES = np.array([50.0, 100.0, 200.0])
+
+
+def test_perfectly_plastic_plateau_and_softening_to_critical_state():
+    loose = ShearTest(STRESSES, MC_LOOSE_PARAMS, constant_rate(0.01, 80)).run()
+    np.testing.assert_allclose(loose.shear_stress[:, -1], STRESSES * np.tan(np.radians(33.0)), rtol=1e-9)
+    assert (np.diff(loose.shear_stress, axis=-1) >= -1e-9).all()
+    assert (loose.height_change[:, -1] < 0).all() and not loose.failed.any()
+
+    dense = ShearTest(STRESSES, MC_DENSE_PARAMS, constant_rate(0.01, 300)).run()
+    peak = dense.shear_stress.max(axis=-1)
+    assert (peak <= STRESSES * np.tan(np.radians(MC_DENSE_PARAMS['peak_friction'])) + 1e-9).all()
+    assert (peak > dense.shear_stress[:, -1]).all()
+    np.testing.assert_allclose(dense.shear_stress[:, -1], STRESSES * np.tan(np.radians(33.0)), rtol=0.01)
+    assert (dense.height_change[:, -1] > dense.height_change.min(axis=-1)).all()
+
+
+def test_constant_and_variable_rate():
+    constant = ShearTest(STRESSES, MC_DENSE_PARAMS, constant_rate(0.005, 80, dt=2.0)).run()
+    steps = ShearTest(STRESSES, MC_DENSE_PARAMS, variable_rate(np.full(80, 0.005), dt=2.0)).run()
+    function = ShearTest(STRESSES, MC_DENSE_PARAMS, variable_rate(lambda time: np.full_like(time, 0.005), 2.0, 80)).run()
+    for field in ('strain', 'shear_stress', 'height_change'):
+        np.testing.assert_array_equal(getattr(steps, field), getattr(constant, field))
+        np.testing.assert_array_equal(getattr(function, field), getattr(constant, field))
+    np.testing.assert_allclose(constant.time, np.arange(81) * 2.0)
+
+    # A faster second half reaches the same states at the same strains: the material is rate independent
+    varying = ShearTest(STRESSES, MC_DENSE_PARAMS, variable_rate(np.r_[np.full(40, 0.005), np.full(20, 0.02)])).run()
+    np.testing.assert_allclose(varying.strain[:, -1], 0.6)
+    np.testing.assert_allclose(varying.shear_stress[:, 40], constant.shear_stress[:, 20], rtol=1e-6)
+    np.testing.assert_allclose(varying.shear_stress[:, -1], constant.shear_stress[:, 60], rtol=0.01)
+
+
+def test_stress_control_fails_beyond_the_peak_strength():
+    ratios = np.linspace(0, 1, 21)[1:]
+    result = ShearTest(STRESSES, MC_LOOSE_PARAMS, stress_controlled(ratios)).run()
+    peak_tan = np.tan(np.radians(MC_LOOSE_PARAMS['peak_friction']))
+    reachable = ratios <= peak_tan
+
+    # Targets below the strength are met exactly; the first one beyond it fails and the stress stays capped
+    np.testing.assert_allclose(result.shear_stress[:, 1:][:, reachable], STRESSES[:, None] * ratios[reachable])
+    assert not result.failed[:, 1:][:, reachable].any() and result.failed[:, 1:][:, ~reachable].all()
+    assert (result.shear_stress <= STRESSES[:, None] * peak_tan * (1 + 1e-9)).all()
+
+
+def test_engine_curves_follow_the_test():
+    strain = np.linspace(0, 0.8, 81)
+    shear_stress, height_change = mohr_coulomb_curves(STRESSES[:, None], strain[None, :], MC_LOOSE_PARAMS)
+    assert shear_stress.shape == height_change.shape == (3, 81)
+    np.testing.assert_allclose(shear_stress[:, -1] * 100, STRESSES * np.tan(np.radians(33.0)), rtol=1e-9)